@@ -0,0 +1,301 @@
+"""
+Cliente asyncio de market data con suscripciones repartidas en varias conexiones.
+
+La lista de tópicos (Matriz) o símbolos (Primary) se reparte en ``shards``
+conexiones websocket. Cada conexión tiene su propia tarea que recibe y
+decodifica sus frames (``TopicParser.decode_frame`` / ``SymbolRegistry.decode``)
+y deja el resultado en una cola acotada. Una única tarea escritora vacía la
+cola, escribe en el QuoteBook y publica un solo ``commit()`` por lote drenado,
+así que el libro sigue teniendo un solo escritor.
+
+Contrapresión: si el escritor se atrasa la cola se llena, los lectores quedan
+esperando en ``put`` y dejan de leer del socket; el buffer de ``websockets``
+(``max_queue``) también se llena y el kernel frena al servidor por TCP. No se
+descarta ningún frame.
+
+Uso desde los scripts sincrónicos::
+
+    client = AsyncMarketDataClient(url, MatrizDialect(parser), shards=4)
+    client.start()  # loop asyncio en un hilo aparte
+    ...
+    client.stop()
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import websockets
+
+from mdparser import SymbolRegistry, TopicParser
+from quotebook import QuoteBook
+from tape import MD_TYPES, TapeWriter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARDS = 4
+DEFAULT_QUEUE_SIZE = 1000  # frames decodificados pendientes de escribir
+DEFAULT_MAX_BATCH = 256  # frames por commit del escritor
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+
+def shard(keys: Sequence[str], shards: int) -> List[List[str]]:
+    """Reparte ``keys`` en hasta ``shards`` grupos no vacíos, alternando."""
+    shards = max(1, min(shards, len(keys)))
+    return [list(keys[i::shards]) for i in range(shards)]
+
+
+# ====================== DIALECTOS ======================
+class MatrizDialect:
+    """Tópicos ``md.bm_MERV_...`` y frames con pipes de Matriz."""
+
+    def __init__(self, parser: TopicParser) -> None:
+        self.parser = parser
+        self.book: QuoteBook = parser.book
+
+    def keys(self) -> List[str]:
+        return self.parser.topics()
+
+    def subscription(self, keys: List[str]) -> str:
+        return json.dumps(
+            {"_req": "S", "topicType": "md", "topics": keys, "replace": False},
+            separators=(",", ":"),
+        )
+
+    def decode(self, message: str) -> List[Any]:
+        return self.parser.decode_frame(message)
+
+    def write(self, updates: List[Any]) -> None:
+        write = self.parser.write
+        for tick in updates:
+            write(tick)
+
+
+class PrimaryDialect:
+    """Símbolos ``MERV - XMEV - ...`` y mensajes JSON ``Md`` de Primary."""
+
+    def __init__(
+        self,
+        registry: SymbolRegistry,
+        entries: str = "LA,BI,OF",
+        depth: int = 1,
+    ) -> None:
+        self.registry = registry
+        self.book: QuoteBook = registry.book
+        self.entries = entries.split(",")
+        self.depth = depth
+
+    def keys(self) -> List[str]:
+        return self.registry.symbols()
+
+    def subscription(self, keys: List[str]) -> str:
+        return json.dumps(
+            {
+                "type": "smd",
+                "level": 1,
+                "entries": self.entries,
+                "products": [{"symbol": s, "marketId": "ROFX"} for s in keys],
+                "depth": self.depth,
+            }
+        )
+
+    def decode(self, message: str) -> List[Any]:
+        data = json.loads(message)
+        if data.get("type") not in MD_TYPES:
+            logger.warning(f"WS Msg (control/error): {data}")
+            return []
+        cells = self.registry.decode(data)
+        return cells or []
+
+    def write(self, updates: List[Any]) -> None:
+        self.registry.write(updates)
+
+
+# ====================== CLIENTE ======================
+class AsyncMarketDataClient:
+    """Varias conexiones de market data que alimentan un QuoteBook."""
+
+    def __init__(
+        self,
+        url: str,
+        dialect: Any,
+        shards: int = DEFAULT_SHARDS,
+        headers: Union[Dict[str, str], Callable[[], Dict[str, str]], None] = None,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        recorder: Optional[TapeWriter] = None,
+    ) -> None:
+        """
+        Args:
+            url: URL del websocket
+            dialect: MatrizDialect o PrimaryDialect
+            shards: Cantidad de conexiones entre las que se reparte la suscripción
+            headers: Headers del handshake (ej. ``x-auth-token`` en Primary), o
+                una función que los devuelve; se evalúa en cada (re)conexión
+                para que un token renovado llegue a las reconexiones
+            queue_size: Frames decodificados que pueden esperar al escritor
+                antes de que los lectores dejen de leer
+            max_batch: Frames que el escritor aplica antes de cada commit
+            recorder: Grabación opcional de los frames crudos (ver tape.py)
+        """
+        self.url = url
+        self.dialect = dialect
+        self.book: QuoteBook = dialect.book
+        self.groups = shard(dialect.keys(), shards)
+        self.headers = headers
+        self.queue_size = queue_size
+        self.max_batch = max_batch
+        self.recorder = recorder
+        # Contadores por conexión y del escritor (ver stats)
+        self.frames = [0] * len(self.groups)
+        self.reconnects = [0] * len(self.groups)
+        self.connected = [False] * len(self.groups)
+        self.batches = 0
+        self.writes = 0
+        self.queue_high = 0
+        self.blocked = 0  # veces que un lector esperó por la cola llena
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    # ---------- tareas ----------
+    async def _reader(self, index: int, keys: List[str]) -> None:
+        """Una conexión: suscribe su grupo, decodifica y encola; reconecta."""
+        queue = self._queue
+        decode = self.dialect.decode
+        delay = RECONNECT_DELAY
+        while not self._stopping:
+            try:
+                headers = self.headers() if callable(self.headers) else self.headers
+                async with websockets.connect(
+                    self.url, additional_headers=headers
+                ) as ws:
+                    await ws.send(self.dialect.subscription(keys))
+                    self.connected[index] = True
+                    delay = RECONNECT_DELAY
+                    logger.info(f"Shard {index}: suscripto a {len(keys)} instrumentos")
+                    async for message in ws:
+                        if self.recorder is not None:
+                            self.recorder.write(message)
+                        self.frames[index] += 1
+                        try:
+                            updates = decode(message)
+                        except (ValueError, KeyError, TypeError) as e:
+                            logger.error(f"Shard {index}: frame inválido: {e}")
+                            continue
+                        if not updates:
+                            continue
+                        if queue.full():  # type: ignore
+                            self.blocked += 1
+                        await queue.put(updates)  # type: ignore
+            except asyncio.CancelledError:
+                raise
+            except (OSError, websockets.exceptions.WebSocketException) as e:
+                logger.warning(f"Shard {index}: conexión perdida: {e}")
+            finally:
+                self.connected[index] = False
+            if self._stopping:
+                break
+            self.reconnects[index] += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def _writer(self) -> None:
+        """Único escritor del libro: drena la cola y publica un commit por lote."""
+        queue = self._queue
+        write = self.dialect.write
+        book = self.book
+        while True:
+            updates = await queue.get()  # type: ignore
+            depth = queue.qsize()  # type: ignore
+            if depth + 1 > self.queue_high:
+                self.queue_high = depth + 1
+            write(updates)
+            n = 1
+            while n < self.max_batch and not queue.empty():  # type: ignore
+                write(queue.get_nowait())  # type: ignore
+                n += 1
+            book.commit()
+            self.batches += 1
+            self.writes += n
+
+    async def run(self) -> None:
+        """Corre las conexiones y el escritor hasta que se cancelan."""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        tasks = [
+            asyncio.create_task(self._reader(i, keys))
+            for i, keys in enumerate(self.groups)
+        ]
+        tasks.append(asyncio.create_task(self._writer()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ---------- uso desde código sincrónico ----------
+    def start(self) -> threading.Thread:
+        """Corre ``run()`` en un loop propio dentro de un hilo daemon."""
+        self._stopping = False
+        self._loop = asyncio.new_event_loop()
+
+        def target() -> None:
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_until_complete(self.run())  # type: ignore
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._loop.close()  # type: ignore
+
+        self._thread = threading.Thread(target=target, name="aio-md", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Market data asyncio: {len(self.groups)} conexiones a {self.url}"
+        )
+        return self._thread
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Cancela las tareas, espera el hilo y cierra la grabación."""
+        self._stopping = True
+        loop = self._loop
+        if loop is not None and loop.is_running():
+
+            def cancel_all() -> None:
+                for task in asyncio.all_tasks(loop):
+                    task.cancel()
+
+            loop.call_soon_threadsafe(cancel_all)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores para logs: frames por conexión, lotes y ocupación de cola."""
+        return {
+            "frames": list(self.frames),
+            "connected": sum(self.connected),
+            "reconnects": sum(self.reconnects),
+            "batches": self.batches,
+            "frames_per_commit": self.writes / self.batches if self.batches else 0.0,
+            "queue": self._queue.qsize() if self._queue is not None else 0,
+            "queue_high": self.queue_high,
+            "blocked": self.blocked,
+        }
+
+
+def wait_connected(client: AsyncMarketDataClient, timeout: float = 10.0) -> bool:
+    """Espera a que todas las conexiones estén suscriptas."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(client.connected):
+            return True
+        time.sleep(0.05)
+    return False
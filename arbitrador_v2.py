@@ -1,19 +1,33 @@
 import math
 import time
-import numpy as np
-from tabulate import tabulate
 import websocket
 import pandas as pd
 import json
 import threading
 import logging
-from typing import Dict, List, Optional, Callable
-import requests
+from typing import Dict, List, Mapping, Optional, Callable, Union
 from datetime import datetime
 import base64
 import os
 import configparser
 
+from aioclient import AsyncMarketDataClient, PrimaryDialect
+from dashboard import Dashboard, TablePrinter, open_dashboard
+from httppool import PRIMARY_TIMEOUTS, get_session
+from instruments import get_universe
+from mdparser import SymbolRegistry, Target
+from quotebook import PRICE_COLUMNS, QuoteBook, Snapshot
+from ratios import CROSS_RATIOS, RATIOS, RatioEvaluator
+from scheduler import open_scheduler
+from store import StoreWriter, open_store
+from tape import TapeWriter, open_recorder
+from tokens import PRIMARY_TOKEN_TTL, TokenManager
+
+# Columnas que se guardan con [store] (ver store.py)
+STORED_QUOTES = ["tickerD", *PRICE_COLUMNS]
+STORED_RATIOS = [r[0] for r in RATIOS + CROSS_RATIOS]
+AUTH_TIMEOUT = 15
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s  %(levelname)-7s  %(message)s",
@@ -44,102 +58,82 @@ class CocosMatrizClient:
         self.basic_auth = base64.b64encode(
             f"{username}:{password}".encode()
         ).decode()  # Para endpoints de riesgo
+        # Sesión keep-alive compartida (ver httppool.py)
+        self.http = get_session(self.base_url, PRIMARY_TIMEOUTS)
+        # Token en memoria renovado antes de las 24 h (ver tokens.py)
+        self.tokens = TokenManager(
+            self._fetch_token, "X-Auth-Token", PRIMARY_TOKEN_TTL, name="Primary"
+        )
+        self.tokens.listeners.append(self._set_token)
         self.login()
+        self.tokens.start()
 
-    def login(self) -> bool:
-        """Login a la Primary API"""
+    def _fetch_token(self) -> str:
+        """Pide un token nuevo (lo usa el TokenManager)."""
         url = f"{self.base_url}/auth/getToken"
         headers = {"X-Username": self.username, "X-Password": self.password}
+        response = self.http.post(
+            url, endpoint="login", headers=headers, timeout=AUTH_TIMEOUT
+        )
+        response.raise_for_status()
+        token = response.headers.get("X-Auth-Token")
+        if not token:
+            raise ValueError("no se recibió token")
+        return token
+
+    def _set_token(self, token: str) -> None:
+        self.token = token
+        self.headers["X-Auth-Token"] = token
+
+    def login(self) -> bool:
+        """Login a la Primary API"""
         try:
-            response = requests.post(url, headers=headers, timeout=15)
-            response.raise_for_status()
-            self.token = response.headers.get("X-Auth-Token")
-            if self.token:
-                self.headers["X-Auth-Token"] = self.token
-                logger.info(
-                    f"✅ Login exitoso - Token válido por 24h: {datetime.now()}"
-                )
-                return True
-            else:
-                logger.error("❌ Login falló: no se recibió token")
-                return False
+            self.tokens.refresh()
+            logger.info(f"✅ Login exitoso - Token válido por 24h: {datetime.now()}")
+            return True
         except Exception as e:
             logger.error(f"❌ Error en login: {e}")
             return False
 
 
 class DataFrameHandler:
-    def __init__(self, instrumentos):
+    def __init__(self, instrumentos, targets: Optional[Mapping[str, Target]] = None):
         self.instrumentos = instrumentos
-        self.df = self.create_df()
-
-    def create_df(self):
-        return pd.DataFrame(
-            data=self.instrumentos,
-            columns=[
-                "ticker",
-                "tickerD",
-                "prCompraPesosCI",
-                "prVentaPesosCI",
-                "prCompraPesos",
-                "prVentaPesos",
-                "prCompraDolarCI",
-                "prVentaDolarCI",
-                "prCompraDolar",
-                "prVentaDolar",
-            ],
+        self.book = QuoteBook([inst[0] for inst in instrumentos], PRICE_COLUMNS)
+        self._labels = {
+            "ticker": [inst[0] for inst in instrumentos],
+            "tickerD": [inst[1] for inst in instrumentos],
+        }
+        # Símbolo completo de Primary → (fila, columnas) para ambas patas y plazos.
+        # Una punta vacía no pisa el último precio conocido. targets: símbolos ya
+        # compilados por instruments.py (Universe.symbols)
+        self.registry = SymbolRegistry(
+            self.book,
+            instrumentos,
+            plazos=("24hs", "CI"),
+            clear_missing=False,
+            targets=targets,
         )
 
+    @property
+    def df(self):
+        return self.frame()
+
+    def frame(self, snapshot: Optional[Snapshot] = None):
+        """DataFrame sin copia sobre un snapshot (o el libro vivo), con los tickers."""
+        source = snapshot if snapshot is not None else self.book
+        return source.frame(self._labels)
+
     def update_df(self, data):
-        if "marketData" in data and data["marketData"]:
-            md = data["marketData"]
-            symbol = data["instrumentId"]["symbol"]
-            bid = md.get("BI", [{}])[0].get("price") if md.get('BI') is not None and md.get('BI') != [] else None
-            offer = md.get("OF", [{}])[0].get("price") if md.get('OF') is not None and md.get('OF') != [] else None
-
-
-            if symbol.__contains__("- 24hs"):
-                ticker = symbol.removeprefix("MERV - XMEV - ").removesuffix("- 24hs").strip()
-                if bid:
-                    self.df.loc[
-                        self.df.ticker == ticker, ["prCompraPesos"]
-                    ] = np.array([bid]).astype(float)
-                    self.df.loc[
-                        self.df.tickerD == ticker, ["prCompraDolar"]
-                    ] = np.array([bid]).astype(float)
-
-                if offer:
-                    self.df.loc[
-                        self.df.ticker == ticker, ["prVentaPesos"]
-                    ] = np.array([offer]).astype(float)
-                    self.df.loc[
-                        self.df.tickerD == ticker, ["prVentaDolar"]
-                    ] = np.array([offer]).astype(float)
-
-            elif symbol.__contains__("- CI"):
-                ticker = symbol.removeprefix("MERV - XMEV - ").removesuffix("- CI").strip()
-                if bid:
-                    self.df.loc[
-                        self.df.ticker == ticker, ["prCompraPesosCI"]
-                    ] = np.array([bid]).astype(float)
-                    self.df.loc[
-                        self.df.tickerD == ticker, ["prCompraDolarCI"]
-                    ] = np.array([bid]).astype(float)
-
-                if offer:
-                    self.df.loc[
-                        self.df.ticker == ticker, ["prVentaPesosCI"]
-                    ] = np.array([offer]).astype(float)
-                    self.df.loc[
-                        self.df.tickerD == ticker, ["prVentaDolarCI"]
-                    ] = np.array([offer]).astype(float)
-
-        #print(self.df[["ticker","prCompraPesosCI","prVentaPesosCI","prCompraPesos","prVentaPesos","prCompraDolarCI","prVentaDolarCI","prCompraDolar","prVentaDolar"]])
+        self.registry.apply(data)
 
 
 class WebSocketClient:
-    def __init__(self, token: Optional[str] = None):
+    def __init__(
+        self, token: Optional[str] = None, recorder: Optional[TapeWriter] = None
+    ):
         self.token = token
+        self.recorder = recorder  # graba los frames crudos (ver tape.py)
         self.retries = 0
         self.max_retries = 5
 
@@ -178,6 +172,8 @@ class WebSocketClient:
 
         def on_message(ws, message):
             # logger.info(f"WS Msg (raw): {message}")
+            if self.recorder is not None:
+                self.recorder.write(message)
             try:
                 data = json.loads(message)
                 msg_type = data.get("type")
@@ -240,13 +236,32 @@ class Executer:
         mis_activos: List[str],
         ratio: float = 1.0008,
         ratio_ci: float = 1.0015,
+        evaluator: Optional[RatioEvaluator] = None,
+        display: Optional[Union[TablePrinter, Dashboard]] = None,
+        store: Optional[StoreWriter] = None,
     ):
         self.mis_activos = mis_activos
         self.df = df
         self.ratio = ratio
         self.ratio_ci = ratio_ci
+        self.evaluator = evaluator
+        # Tablas de cada ciclo: impresas en el momento o al tablero (dashboard.py)
+        self.display = display or TablePrinter()
+        # Ratios de cada ciclo a disco desde otro hilo, si hay [store]
+        self.store = store
+        # Ids de mis_activos en el libro, para filtrar los rankings del evaluador
+        self._mis_ids = (
+            {evaluator.book.ids[t] for t in mis_activos if t in evaluator.book.ids}
+            if evaluator is not None
+            else set()
+        )
 
     def calculate_ratios(self) -> None:
+        if self.evaluator is not None:
+            # Los ratios ya los mantiene el evaluador de forma incremental
+            for name in self.evaluator.names:
+                self.df[name] = self.evaluator.column(name)
+            return
         self.df["USD_a_pesos"] = self.df.prCompraPesos / self.df.prVentaDolar
         self.df["USDCI_a_pesos"] = self.df.prCompraPesos / self.df.prVentaDolarCI
         self.df["pesos_a_USD"] = self.df.prVentaPesos / self.df.prCompraDolar
@@ -257,113 +272,133 @@ class Executer:
         self.df["pesosCI_a_USD"] = self.df.prVentaPesosCI / self.df.prCompraDolar
         self.df["pesosCI_a_USDCI"] = self.df.prVentaPesosCI / self.df.prCompraDolarCI
 
+        self.df["USDCI_a_USD"] = self.df.prCompraDolar / self.df.prVentaDolarCI
+        self.df["pesosCI_a_pesos"] = self.df.prCompraPesos / self.df.prVentaPesosCI
+        self.df["USD_a_USDCI"] = self.df.prCompraDolarCI / self.df.prVentaDolar
+        self.df["pesos_a_pesosCI"] = self.df.prCompraPesosCI / self.df.prVentaPesos
+
+
+    def _ratio_max(self, name: str, only_mis_activos: bool = False) -> float:
+        """Maximum of a ratio column, taken from the evaluator when available."""
+        if self.evaluator is not None:
+            return self.evaluator.best_value(name)
+        df = self.df
+        if only_mis_activos:
+            df = df.loc[df["ticker"].isin(self.mis_activos), :]
+        return df[name].max()
+
+    def _ratio_min(self, name: str) -> float:
+        """Minimum of a ratio column among values > 1."""
+        if self.evaluator is not None:
+            return self.evaluator.worst_value(name)
+        return self.df[self.df[name] > 1][name].min()
+
+    def _top(
+        self,
+        name: str,
+        k: int,
+        above: float = float("-inf"),
+        only_mis_activos: bool = False,
+    ) -> pd.DataFrame:
+        """Las k filas con mayor ratio (> above), de mayor a menor."""
+        if self.evaluator is not None:
+            rows = self._mis_ids if only_mis_activos else None
+            return self.df.iloc[self.evaluator.top(name, k, above, rows)]
+        df = self.df[self.df[name] > above]
+        if only_mis_activos:
+            df = df.loc[df["ticker"].isin(self.mis_activos), :]
+        return df.sort_values(by=[name], ascending=False).iloc[0:k]
+
+    def _bottom(
+        self,
+        name: str,
+        k: int,
+        below: float = float("inf"),
+        only_mis_activos: bool = False,
+    ) -> pd.DataFrame:
+        """Las k filas con menor ratio entre 1 y below, de menor a mayor."""
+        if self.evaluator is not None:
+            rows = self._mis_ids if only_mis_activos else None
+            return self.df.iloc[self.evaluator.bottom(name, k, below, rows)]
+        df = self.df[(self.df[name] > 1) & (self.df[name] < below)]
+        if only_mis_activos:
+            df = df.loc[df["ticker"].isin(self.mis_activos), :]
+        return df.sort_values(by=[name], ascending=True).iloc[0:k]
 
     def detect_main_arbitrage(self) -> None:
-        print(
+        self.display.text(
             "\n##############################################################################################\n"
         )
 
-        USD_a_pesos_MAX = self.df.USD_a_pesos.max()
-        USDCI_a_pesos_MAX = (
-            self.df.USDCI_a_pesos.max()
-            if not math.isnan(self.df.USDCI_a_pesos.max())
-            else 0
-        )
-        pesos_a_USD_Min = self.df[self.df.pesos_a_USD > 1].pesos_a_USD.min()
+        USD_a_pesos_MAX = self._ratio_max("USD_a_pesos")
+        USDCI_a_pesos_MAX = self._ratio_max("USDCI_a_pesos")
+        if math.isnan(USDCI_a_pesos_MAX):
+            USDCI_a_pesos_MAX = 0
+        pesos_a_USD_Min = self._ratio_min("pesos_a_USD")
 
         # Verifico que el maximo entre "USD a pesos" o "USDCI a pesos" sea mayor a "pesos a USD" (multiplicado por el ratio)
         if pesos_a_USD_Min * self.ratio < max(USD_a_pesos_MAX, USDCI_a_pesos_MAX / self.ratio):
             # Si la condición es verdadera, verifico cual de los dos es mayor e imprimo la tabla
             if USD_a_pesos_MAX * self.ratio >= USDCI_a_pesos_MAX:
-                self.df_USD_a_p = self.df.sort_values(
-                    by=["USD_a_pesos"], ascending=False
-                ).iloc[0:2]
-                print("USD 24hs")
-                print(
-                    tabulate(
-                        self.df_USD_a_p[
-                            ["ticker", "prCompraPesos", "prVentaDolar", "USD_a_pesos"]
-                        ],  # type: ignore
-                        headers="keys",
-                        tablefmt="mixed_outline",
-                        floatfmt=".2f",
-                    ),
+                self.df_USD_a_p = self._top("USD_a_pesos", 2)
+                self.display.text("USD 24hs")
+                self.display.table(
+                    self.df_USD_a_p[
+                        ["ticker", "prCompraPesos", "prVentaDolar", "USD_a_pesos"]
+                    ],
+                    floatfmt=".2f",
                 )
             else:
-                self.df_USDCI_a_p = self.df.sort_values(
-                    by=["USDCI_a_pesos"], ascending=False
-                ).iloc[0:2]
-                print("USD CI")
-                print(
-                    tabulate(
-                        self.df_USDCI_a_p[
-                            [
-                                "ticker",
-                                "prCompraPesos",
-                                "prVentaDolarCI",
-                                "USDCI_a_pesos",
-                            ]
-                        ],  # type: ignore
-                        headers="keys",
-                        tablefmt="mixed_outline",
-                        floatfmt=".2f",
-                    ),
+                self.df_USDCI_a_p = self._top("USDCI_a_pesos", 2)
+                self.display.text("USD CI")
+                self.display.table(
+                    self.df_USDCI_a_p[
+                        [
+                            "ticker",
+                            "prCompraPesos",
+                            "prVentaDolarCI",
+                            "USDCI_a_pesos",
+                        ]
+                    ],
+                    floatfmt=".2f",
                 )
 
             # Imprimo la tabla de "pesos a USD" ya que será utilizada en cualquiera de los dos casos
-            self.df_p_a_USD = (
-                self.df[self.df.pesos_a_USD > 1]
-                .sort_values(by=["pesos_a_USD"], ascending=True)
-                .iloc[0:2]
-            )
-            print(
-                tabulate(
-                    self.df_p_a_USD[
-                        ["ticker", "prVentaPesos", "prCompraDolar", "pesos_a_USD"]
-                    ],  # type: ignore
-                    headers="keys",
-                    tablefmt="mixed_outline",
-                    floatfmt=".2f",
-                )
+            self.df_p_a_USD = self._bottom("pesos_a_USD", 2)
+            self.display.table(
+                self.df_p_a_USD[
+                    ["ticker", "prVentaPesos", "prCompraDolar", "pesos_a_USD"]
+                ],
+                floatfmt=".2f",
             )
         else:
-            print("NO HAY ARBITRAJE PRINCIPAL")
+            self.display.text("NO HAY ARBITRAJE PRINCIPAL")
 
         # Muestro la tabla de "pesos a USDCI" solo en caso de que sea menor a "pesos a USD", ya que no es un arbitraje tan recurrente
-        self.df_p_a_USDCI = (
-            self.df[
-                (self.df.pesos_a_USDCI > 1) & (self.df.pesos_a_USDCI < pesos_a_USD_Min)
-            ]
-            .loc[self.df["ticker"].isin(self.mis_activos), :]
-            .sort_values(by=["pesos_a_USDCI"], ascending=True)
+        self.df_p_a_USDCI = self._bottom(
+            "pesos_a_USDCI", 2, below=pesos_a_USD_Min, only_mis_activos=True
         )
         if not self.df_p_a_USDCI.empty:
-            print("\nPesos a USDCI (Mis activos)")
-            print(
-                tabulate(
-                    self.df_p_a_USDCI[
-                        ["ticker", "prVentaPesos", "prCompraDolarCI", "pesos_a_USDCI"]
-                    ].iloc[0:2],  # type: ignore
-                    headers="keys",
-                    tablefmt="mixed_outline",
-                    floatfmt=".2f",
-                ),
+            self.display.text("\nPesos a USDCI (Mis activos)")
+            self.display.table(
+                self.df_p_a_USDCI[
+                    ["ticker", "prVentaPesos", "prCompraDolarCI", "pesos_a_USDCI"]
+                ],
+                floatfmt=".2f",
             )
         else:
-            print("No hay arbitraje Pesos a DolarCI.")
+            self.display.text("No hay arbitraje Pesos a DolarCI.")
 
 
     def detect_ci_arbitrage(self) -> None:
-        print(
+        self.display.text(
             "-----------------------------------------CI--------------------------------------------------"
         )
 
-        USDCI_a_pesosCI_MAX = self.df.USDCI_a_pesosCI.max()
-        USD_a_pesosCI_MAX = self.df.loc[
-            self.df["ticker"].isin(self.mis_activos), :
-        ].USD_a_pesosCI.max()
-        pesosCI_a_USDCI_Min = self.df[self.df.pesosCI_a_USDCI > 1].pesosCI_a_USDCI.min()
-        pesosCI_a_USD_Min = self.df[self.df.pesosCI_a_USD > 1].pesosCI_a_USD.min()
+        USDCI_a_pesosCI_MAX = self._ratio_max("USDCI_a_pesosCI")
+        USD_a_pesosCI_MAX = self._ratio_max("USD_a_pesosCI", only_mis_activos=True)
+        pesosCI_a_USDCI_Min = self._ratio_min("pesosCI_a_USDCI")
+        pesosCI_a_USD_Min = self._ratio_min("pesosCI_a_USD")
 
         # Verifico que el maximo entre "USDCI a pesosCI" o "USD a pesosCI" sea mayor que el minimo entre "pesosCI a USDCI" y "pesosCI a USD" (multiplicado por el ratio)
         if min(pesosCI_a_USDCI_Min, pesosCI_a_USD_Min) * self.ratio_ci < max(
@@ -371,401 +406,140 @@ class Executer:
         ):
             # Si la condición es verdadera, verifico cual de los dos USD a pesos es mayor, e imprimo la tabla
             if USDCI_a_pesosCI_MAX >= USD_a_pesosCI_MAX:
-                self.df_USDCI_a_pCI = self.df.sort_values(
-                    by=["USDCI_a_pesosCI"], ascending=False
-                ).iloc[0:2]
-                print("\nUSD CI a Pesos CI")
-                print(
-                    tabulate(
-                        self.df_USDCI_a_pCI[
-                            [
-                                "ticker",
-                                "prCompraPesosCI",
-                                "prVentaDolarCI",
-                                "USDCI_a_pesosCI",
-                            ]
-                        ],  # type: ignore
-                        headers="keys",
-                        tablefmt="mixed_outline",
-                        floatfmt=".2f",
-                    ),
+                self.df_USDCI_a_pCI = self._top("USDCI_a_pesosCI", 2)
+                self.display.text("\nUSD CI a Pesos CI")
+                self.display.table(
+                    self.df_USDCI_a_pCI[
+                        [
+                            "ticker",
+                            "prCompraPesosCI",
+                            "prVentaDolarCI",
+                            "USDCI_a_pesosCI",
+                        ]
+                    ],
+                    floatfmt=".2f",
                 )
             else:
-                self.df_USD_a_pCI = (
-                    self.df[self.df.USD_a_pesosCI > USDCI_a_pesosCI_MAX]
-                    .loc[self.df["ticker"].isin(self.mis_activos), :]
-                    .sort_values(by=["USD_a_pesosCI"], ascending=False)
+                self.df_USD_a_pCI = self._top(
+                    "USD_a_pesosCI",
+                    len(self.df),
+                    above=USDCI_a_pesosCI_MAX,
+                    only_mis_activos=True,
                 )
-                print("\nUSD 24hs a Pesos CI (Mis activos)")
-                print(
-                    tabulate(
-                        self.df_USD_a_pCI[
-                            [
-                                "ticker",
-                                "prCompraPesosCI",
-                                "prVentaDolar",
-                                "USD_a_pesosCI",
-                            ]
-                        ],  # type: ignore
-                        headers="keys",
-                        tablefmt="mixed_outline",
-                        floatfmt=".2f",
-                    ),
+                self.display.text("\nUSD 24hs a Pesos CI (Mis activos)")
+                self.display.table(
+                    self.df_USD_a_pCI[
+                        [
+                            "ticker",
+                            "prCompraPesosCI",
+                            "prVentaDolar",
+                            "USD_a_pesosCI",
+                        ]
+                    ],
+                    floatfmt=".2f",
                 )
 
             # Si la condición es verdadera, verifico cual de los dos pesos a USD es menor e imprimo la tabla
             if pesosCI_a_USDCI_Min <= pesosCI_a_USD_Min:
-                self.df_pCI_a_USDCI = (
-                    self.df[self.df.pesosCI_a_USDCI > 1]
-                    .sort_values(by=["pesosCI_a_USDCI"], ascending=True)
-                    .iloc[0:2]
-                )
-                print("\nPesos CI a USD CI")
-                print(
-                    tabulate(
-                        self.df_pCI_a_USDCI[
-                            [
-                                "ticker",
-                                "prVentaPesosCI",
-                                "prCompraDolarCI",
-                                "pesosCI_a_USDCI",
-                            ]
-                        ],  # type: ignore
-                        headers="keys",
-                        tablefmt="mixed_outline",
-                        floatfmt=".2f",
-                    ),
+                self.df_pCI_a_USDCI = self._bottom("pesosCI_a_USDCI", 2)
+                self.display.text("\nPesos CI a USD CI")
+                self.display.table(
+                    self.df_pCI_a_USDCI[
+                        [
+                            "ticker",
+                            "prVentaPesosCI",
+                            "prCompraDolarCI",
+                            "pesosCI_a_USDCI",
+                        ]
+                    ],
+                    floatfmt=".2f",
                 )
             else:
-                self.df_pCI_a_USD = self.df[self.df.pesosCI_a_USD > 1].sort_values(
-                    by=["pesosCI_a_USD"], ascending=True
-                )
-                print("\nPesos CI a USD 24hs")
-                print(
-                    tabulate(
-                        self.df_pCI_a_USD[
-                            [
-                                "ticker",
-                                "prVentaPesosCI",
-                                "prCompraDolar",
-                                "pesosCI_a_USD",
-                            ]
-                        ].iloc[0:3],  # type: ignore
-                        headers="keys",
-                        tablefmt="mixed_outline",
-                        floatfmt=".2f",
-                    ),
+                self.df_pCI_a_USD = self._bottom("pesosCI_a_USD", 3)
+                self.display.text("\nPesos CI a USD 24hs")
+                self.display.table(
+                    self.df_pCI_a_USD[
+                        [
+                            "ticker",
+                            "prVentaPesosCI",
+                            "prCompraDolar",
+                            "pesosCI_a_USD",
+                        ]
+                    ],
+                    floatfmt=".2f",
                 )
 
         else:
-            print("NO HAY ARBITRAJE EN CI")
+            self.display.text("NO HAY ARBITRAJE EN CI")
 
 
     def detect_ci_to_24hs(self) -> None:
-        print(
+        self.display.text(
             "---------------------------------------------------------------------------------------------"
         )
 
-        self.df_dolares = self.df.copy()[
-            (self.df.prVentaDolarCI < self.df.prCompraDolar)
-            & (self.df.prVentaDolarCI > 1)
-        ]
-        self.df_dolares["%"] = (
-            (self.df_dolares.prCompraDolar / self.df_dolares.prVentaDolarCI) - 1
-        ) * 100
+        dolares = self._top("USDCI_a_USD", len(self.df), above=1)
+        self.df_dolares = dolares.assign(**{"%": (dolares.USDCI_a_USD - 1) * 100})
         if not self.df_dolares[self.df_dolares["%"] > 0.20].empty:
-            print(
-                tabulate(
-                    self.df_dolares[["ticker", "prVentaDolarCI", "prCompraDolar", "%"]],  # type: ignore
-                    headers="keys",
-                    tablefmt="mixed_outline",
-                )
+            self.display.table(
+                self.df_dolares[["ticker", "prVentaDolarCI", "prCompraDolar", "%"]]
             )
         else:
-            print("No hay arbitraje DolarCI por Dolar.")
-
-        self.df_pesos = self.df.copy()[
-            (self.df.prVentaPesosCI < self.df.prCompraPesos)
-            & (self.df.prVentaPesosCI > 1)
-        ]
-        self.df_pesos["%"] = (
-            (self.df_pesos.prCompraPesos / self.df_pesos.prVentaPesosCI) - 1
-        ) * 36500
+            self.display.text("No hay arbitraje DolarCI por Dolar.")
+
+        pesos = self._top("pesosCI_a_pesos", 2, above=1)
+        self.df_pesos = pesos.assign(**{"%": (pesos.pesosCI_a_pesos - 1) * 36500})
         if not self.df_pesos.empty:
-            print(
-                tabulate(
-                    self.df_pesos[["ticker", "prVentaPesosCI", "prCompraPesos", "%"]]
-                    .sort_values(by=["%"], ascending=False)
-                    .iloc[0:2],  # type: ignore
-                    headers="keys",
-                    tablefmt="mixed_outline",
-                    floatfmt=".2f",
-                )
+            self.display.table(
+                self.df_pesos[["ticker", "prVentaPesosCI", "prCompraPesos", "%"]],
+                floatfmt=".2f",
             )
         else:
-            print("No hay arbitraje PesosCI por Pesos.")
+            self.display.text("No hay arbitraje PesosCI por Pesos.")
 
     def detect_24hs_to_ci(self) -> None:
-        print(
+        self.display.text(
             "---------------------------------------------------------------------------------------------"
         )
-        self.df_dolares = self.df.copy()[
-            (self.df.prVentaDolar < self.df.prCompraDolarCI)
-            & (self.df.prVentaDolar > 1)
-        ].loc[self.df["ticker"].isin(self.mis_activos), :]
-        self.df_dolares["%"] = (
-            (self.df_dolares.prCompraDolarCI / self.df_dolares.prVentaDolar) - 1
-        ) * 100
+        dolares = self._top("USD_a_USDCI", len(self.df), above=1, only_mis_activos=True)
+        self.df_dolares = dolares.assign(**{"%": (dolares.USD_a_USDCI - 1) * 100})
         if not self.df_dolares[self.df_dolares["%"] > 0.20].empty:
-            print(
-                tabulate(
-                    self.df_dolares[["ticker", "prVentaDolar", "prCompraDolarCI", "%"]],  # type: ignore
-                    headers="keys",
-                    tablefmt="mixed_outline",
-                )
+            self.display.table(
+                self.df_dolares[["ticker", "prVentaDolar", "prCompraDolarCI", "%"]]
             )
         else:
-            print("No hay arbitraje Dolar a DolarCI.")
-
-        self.df_pesos = self.df.copy()[
-            (self.df.prVentaPesos <= self.df.prCompraPesosCI)
-            & (self.df.prVentaPesos > 1)
-        ].loc[self.df["ticker"].isin(self.mis_activos), :]
-        self.df_pesos["%"] = (
-            (self.df_pesos.prCompraPesosCI / self.df_pesos.prVentaPesos) - 1
-        ) * 100
+            self.display.text("No hay arbitraje Dolar a DolarCI.")
+
+        pesos = self._top(
+            "pesos_a_pesosCI", len(self.df), above=1, only_mis_activos=True
+        )
+        self.df_pesos = pesos.assign(**{"%": (pesos.pesos_a_pesosCI - 1) * 100})
         if not self.df_pesos.empty:
-            print(
-                tabulate(
-                    self.df_pesos[["ticker", "prVentaPesos", "prCompraPesosCI", "%"]],  # type: ignore
-                    headers="keys",
-                    tablefmt="mixed_outline",
-                )
+            self.display.table(
+                self.df_pesos[["ticker", "prVentaPesos", "prCompraPesosCI", "%"]]
             )
         else:
-            print("No hay arbitraje Pesos a PesosCI.")
+            self.display.text("No hay arbitraje Pesos a PesosCI.")
 
-        print(
+        self.display.text(
             "\n##############################################################################################\n"
         )
 
     def execute(self):
         self.calculate_ratios()
+        if self.store is not None:
+            self.store.record("ratios", self.df, STORED_RATIOS)
         self.detect_main_arbitrage()
         self.detect_ci_arbitrage()
         self.detect_ci_to_24hs()
         self.detect_24hs_to_ci()
+        self.display.flush()
 
 if __name__ == "__main__":
-    mis_activos = [
-        "ARC1O",
-        "CO35",
-        "CS39O",
-        "GN49O",
-        "IRCPO",
-        "MGCOO",
-        "MGCRO",
-        "MSSEO",
-        "NPCCO",
-        "TLCMO",
-        "TLCPO",
-        "VSCTO",
-        "YFCJO",
-        "YM34O",
-        "YMCXO",
-    ]
-
-    instrumentos = [
-        ["YMCIO", "YMCID", None, None, None, None, None, None, None, None],
-        ["YMCXO", "YMCXD", None, None, None, None, None, None, None, None],
-        ["TLC1O", "TLC1D", None, None, None, None, None, None, None, None],
-        ["TLCMO", "TLCMD", None, None, None, None, None, None, None, None],
-        ["MTCGO", "MTCGD", None, None, None, None, None, None, None, None],
-        ["ARC1O", "ARC1D", None, None, None, None, None, None, None, None],
-        ["BOL1O", "BOL1D", None, None, None, None, None, None, None, None],
-        ["DNC3O", "DNC3D", None, None, None, None, None, None, None, None],
-        ["DNC5O", "DNC5D", None, None, None, None, None, None, None, None],
-        ["MSSEO", "MSSED", None, None, None, None, None, None, None, None],
-        ["VSCRO", "VSCRD", None, None, None, None, None, None, None, None],
-        ["SNABO", "SNABD", None, None, None, None, None, None, None, None],
-        ["RUCDO", "RUCDD", None, None, None, None, None, None, None, None],
-        ["YFCJO", "YFCJD", None, None, None, None, None, None, None, None],
-        ["YM34O", "YM34D", None, None, None, None, None, None, None, None],
-        ["IRCPO", "IRCPD", None, None, None, None, None, None, None, None],
-        ["YMCJO", "YMCJD", None, None, None, None, None, None, None, None],
-        ["IRCFO", "IRCFD", None, None, None, None, None, None, None, None],
-        ["IRCJO", "IRCJD", None, None, None, None, None, None, None, None],
-        ["PNDCO", "PNDCD", None, None, None, None, None, None, None, None],
-        ["CS44O", "CS44D", None, None, None, None, None, None, None, None],
-        ["CAC5O", "CAC5D", None, None, None, None, None, None, None, None],
-        ["LMS7O", "LMS7D", None, None, None, None, None, None, None, None],
-        ["LMS8O", "LMS8D", None, None, None, None, None, None, None, None],
-        ["CP34O", "CP34D", None, None, None, None, None, None, None, None],
-        ["PNWCO", "PNWCD", None, None, None, None, None, None, None, None],
-        ["GN43O", "GN43D", None, None, None, None, None, None, None, None],
-        ["RAC6O", "RAC6D", None, None, None, None, None, None, None, None],
-        ["PNXCO", "PNXCD", None, None, None, None, None, None, None, None],
-        ["OTS2O", "OTS2D", None, None, None, None, None, None, None, None],
-        ["TSC3O", "TSC3D", None, None, None, None, None, None, None, None],
-        ["VSCPO", "VSCPD", None, None, None, None, None, None, None, None],
-        ["HJCBO", "HJCBD", None, None, None, None, None, None, None, None],
-        ["IRCLO", "IRCLD", None, None, None, None, None, None, None, None],
-        ["LMS9O", "LMS9D", None, None, None, None, None, None, None, None],
-        ["YFCIO", "YFCID", None, None, None, None, None, None, None, None],
-        ["LIC6O", "LIC6D", None, None, None, None, None, None, None, None],
-        ["PN35O", "PN35D", None, None, None, None, None, None, None, None],
-        ["BYCHO", "BYCHD", None, None, None, None, None, None, None, None],
-        ["MGCMO", "MGCMD", None, None, None, None, None, None, None, None],
-        ["MGCNO", "MGCND", None, None, None, None, None, None, None, None],
-        ["YMCYO", "YMCYD", None, None, None, None, None, None, None, None],
-        ["YMCZO", "YMCZD", None, None, None, None, None, None, None, None],
-        ["HJCFO", "HJCFD", None, None, None, None, None, None, None, None],
-        ["HJCGO", "HJCGD", None, None, None, None, None, None, None, None],
-        ["GN47O", "GN47D", None, None, None, None, None, None, None, None],
-        ["DNC7O", "DNC7D", None, None, None, None, None, None, None, None],
-        ["IRCNO", "IRCND", None, None, None, None, None, None, None, None],
-        ["IRCOO", "IRCOD", None, None, None, None, None, None, None, None],
-        ["PQCRO", "PQCRD", None, None, None, None, None, None, None, None],
-        ["TTC9O", "TTC9D", None, None, None, None, None, None, None, None],
-        ["GYC4O", "GYC4D", None, None, None, None, None, None, None, None],
-        ["OTS3O", "OTS3D", None, None, None, None, None, None, None, None],
-        ["XMC1O", "XMC1D", None, None, None, None, None, None, None, None],
-        ["CIC7O", "CIC7D", None, None, None, None, None, None, None, None],
-        ["PN36O", "PN36D", None, None, None, None, None, None, None, None],
-        ["PN37O", "PN37D", None, None, None, None, None, None, None, None],
-        ["CS47O", "CS47D", None, None, None, None, None, None, None, None],
-        ["YFCKO", "YFCKD", None, None, None, None, None, None, None, None],
-        ["YFCLO", "YFCLD", None, None, None, None, None, None, None, None],
-        ["OZC3O", "OZC3D", None, None, None, None, None, None, None, None],
-        ["TLCOO", "TLCOD", None, None, None, None, None, None, None, None],
-        ["VSCTO", "VSCTD", None, None, None, None, None, None, None, None],
-        ["SIC1O", "SIC1D", None, None, None, None, None, None, None, None],
-        ["MGCOO", "MGCOD", None, None, None, None, None, None, None, None],
-        ["HJCHO", "HJCHD", None, None, None, None, None, None, None, None],
-        ["OT41O", "OT41D", None, None, None, None, None, None, None, None],
-        ["OT42O", "OT42D", None, None, None, None, None, None, None, None],
-        ["TTCAO", "TTCAD", None, None, None, None, None, None, None, None],
-        ["PLC1O", "PLC1D", None, None, None, None, None, None, None, None],
-        ["PLC2O", "PLC2D", None, None, None, None, None, None, None, None],
-        ["SNSDO", "SNSDD", None, None, None, None, None, None, None, None],
-        ["LDCGO", "LDCGD", None, None, None, None, None, None, None, None],
-        ["PN38O", "PN38D", None, None, None, None, None, None, None, None],
-        ["PQCSO", "PQCSD", None, None, None, None, None, None, None, None],
-        ["DEC2O", "DEC2D", None, None, None, None, None, None, None, None],
-        ["ZZC1O", "ZZC1D", None, None, None, None, None, None, None, None],
-        ["YM35O", "YM35D", None, None, None, None, None, None, None, None],
-        ["PUC2O", "PUC2D", None, None, None, None, None, None, None, None],
-        ["GYC5O", "GYC5D", None, None, None, None, None, None, None, None],
-        ["GN48O", "GN48D", None, None, None, None, None, None, None, None],
-        ["CP37O", "CP37D", None, None, None, None, None, None, None, None],
-        ["MCC1O", "MCC1D", None, None, None, None, None, None, None, None],
-        ["MCC2O", "MCC2D", None, None, None, None, None, None, None, None],
-        ["VBC1O", "VBC1D", None, None, None, None, None, None, None, None],
-        ["MSSGO", "MSSGD", None, None, None, None, None, None, None, None],
-        ["PLC3O", "PLC3D", None, None, None, None, None, None, None, None],
-        ["YM37O", "YM37D", None, None, None, None, None, None, None, None],
-        ["RCCRO", "RCCRD", None, None, None, None, None, None, None, None],
-        ["YFCMO", "YFCMD", None, None, None, None, None, None, None, None],
-        ["HJCIO", "HJCID", None, None, None, None, None, None, None, None],
-        ["TLCPO", "TLCPD", None, None, None, None, None, None, None, None],
-        ["CIC9O", "CIC9D", None, None, None, None, None, None, None, None],
-        ["PLC4O", "PLC4D", None, None, None, None, None, None, None, None],
-        ["BF35O", "BF35D", None, None, None, None, None, None, None, None],
-        ["ZPC2O", "ZPC2D", None, None, None, None, None, None, None, None],
-        ["VSCVO", "VSCVD", None, None, None, None, None, None, None, None],
-        ["OLC5O", "OLC5D", None, None, None, None, None, None, None, None],
-        ["CACBO", "CACBD", None, None, None, None, None, None, None, None],
-        ["TLCQO", "TLCQD", None, None, None, None, None, None, None, None],
-        ["EMC1O", "EMC1D", None, None, None, None, None, None, None, None],
-        ["CS48O", "CS48D", None, None, None, None, None, None, None, None],
-        ["HVS1O", "HVS1D", None, None, None, None, None, None, None, None],
-        ["BACGO", "BACGD", None, None, None, None, None, None, None, None],
-        ["PFC2O", "PFC2D", None, None, None, None, None, None, None, None],
-        ["YM38O", "YM38D", None, None, None, None, None, None, None, None],
-        ["YM39O", "YM39D", None, None, None, None, None, None, None, None],
-        ["LOC5O", "LOC5D", None, None, None, None, None, None, None, None],
-        ["HJCJO", "HJCJD", None, None, None, None, None, None, None, None],
-        ["MGCQO", "MGCQD", None, None, None, None, None, None, None, None],
-        ["RC1CO", "RC1CD", None, None, None, None, None, None, None, None],
-        ["BYCVO", "BYCVD", None, None, None, None, None, None, None, None],
-        ["BF37O", "BF37D", None, None, None, None, None, None, None, None],
-        ["YM40O", "YM40D", None, None, None, None, None, None, None, None],
-        ["NPCCO", "NPCCD", None, None, None, None, None, None, None, None],
-        ["PN41O", "PN41D", None, None, None, None, None, None, None, None],
-        ["CS49O", "CS49D", None, None, None, None, None, None, None, None],
-        ["T652O", "T652D", None, None, None, None, None, None, None, None],
-        ["AERBO", "AERBD", None, None, None, None, None, None, None, None],
-        ["NBS1O", "NBS1D", None, None, None, None, None, None, None, None],
-        ["VSCOO", "VSCOD", None, None, None, None, None, None, None, None],
-        ["VSCUO", "VSCUD", None, None, None, None, None, None, None, None],
-        ["ZPC3O", "ZPC3D", None, None, None, None, None, None, None, None],
-        ["SBC1O", "SBC1D", None, None, None, None, None, None, None, None],
-        ["RC2CO", "RC2CD", None, None, None, None, None, None, None, None],
-        ["JNC6O", "JNC6D", None, None, None, None, None, None, None, None],
-        ["YM41O", "YM41D", None, None, None, None, None, None, None, None],
-        ["PN42O", "PN42D", None, None, None, None, None, None, None, None],
-        ["OTS5O", "OTS5D", None, None, None, None, None, None, None, None],
-        ["VSCWO", "VSCWD", None, None, None, None, None, None, None, None],
-        ["TTCDO", "TTCDD", None, None, None, None, None, None, None, None],
-        ["MIC3O", "MIC3D", None, None, None, None, None, None, None, None],
-        ["AFCIO", "AFCID", None, None, None, None, None, None, None, None],
-        ["BGC4O", "BGC4D", None, None, None, None, None, None, None, None],
-        ["PLC5O", "PLC5D", None, None, None, None, None, None, None, None],
-        ["MGCRO", "MGCRD", None, None, None, None, None, None, None, None],
-        ["TSC4O", "TSC4D", None, None, None, None, None, None, None, None],
-        ["GN49O", "GN49D", None, None, None, None, None, None, None, None],
-        ["CICAO", "CICAD", None, None, None, None, None, None, None, None],
-        ["YM42O", "YM42D", None, None, None, None, None, None, None, None],
-        ["BF39O", "BF39D", None, None, None, None, None, None, None, None],
-        ["BPCUO", "BPCUD", None, None, None, None, None, None, None, None],
-        ["CS50O", "CS50D", None, None, None, None, None, None, None, None],
-        ["OLC6O", "OLC6D", None, None, None, None, None, None, None, None],
-        ["YFCOO", "YFCOD", None, None, None, None, None, None, None, None],
-        ["PN43O", "PN43D", None, None, None, None, None, None, None, None],
-        ["CS51O", "CS51D", None, None, None, None, None, None, None, None],
-        ["TLCTO", "TLCTD", None, None, None, None, None, None, None, None],
-        ["BACHO", "BACHD", None, None, None, None, None, None, None, None],
-        ["LOC6O", "LOC6D", None, None, None, None, None, None, None, None],
-        ["FO4AO", "FO4AD", None, None, None, None, None, None, None, None],
-        ["SNEBO", "SNEBD", None, None, None, None, None, None, None, None],
-        ["MIC4O", "MIC4D", None, None, None, None, None, None, None, None],
-        ["CACDO", "CACDD", None, None, None, None, None, None, None, None],
-        ["RUCEO", "RUCED", None, None, None, None, None, None, None, None],
-        ["AFCJO", "AFCJD", None, None, None, None, None, None, None, None],
-        ["AFCKO", "AFCKD", None, None, None, None, None, None, None, None],
-        ["AFCLO", "AFCLD", None, None, None, None, None, None, None, None],
-        ["SXC2O", "SXC2D", None, None, None, None, None, None, None, None],
-        ["MJC1O", "MJC1D", None, None, None, None, None, None, None, None],
-        ["OLC7O", "OLC7D", None, None, None, None, None, None, None, None],
-        ["HBCFO", "HBCFD", None, None, None, None, None, None, None, None],
-        ["BA37D", "BA7DD", None, None, None, None, None, None, None, None],
-        ["NDT25", "NDT5D", None, None, None, None, None, None, None, None],
-        ["CO26", "CO26D", None, None, None, None, None, None, None, None],
-        ["CO35", "CO35D", None, None, None, None, None, None, None, None],
-        ["PMM29", "PM29D", None, None, None, None, None, None, None, None],
-        ["SA24D", "S24DD", None, None, None, None, None, None, None, None],
-        ["AL30", "AL30D", None, None, None, None, None, None, None, None],
-        ["GD30", "GD30D", None, None, None, None, None, None, None, None],
-        ["AL35", "AL35D", None, None, None, None, None, None, None, None],
-        ["GD35", "GD35D", None, None, None, None, None, None, None, None],
-        ["BPY26", "BPY6D", None, None, None, None, None, None, None, None],
-        ["BPOD7", "BPD7D", None, None, None, None, None, None, None, None],
-        ["GGAL", "GGALD", None, None, None, None, None, None, None, None],
-        ["YPFD", "YPFDD", None, None, None, None, None, None, None, None],
-        ["PAMP", "PAMPD", None, None, None, None, None, None, None, None],
-        ["TGSU2", "TGSUD", None, None, None, None, None, None, None, None],
-        ["BYMA", "BYMAD", None, None, None, None, None, None, None, None],
-        ["ALUA", "ALUAD", None, None, None, None, None, None, None, None],
-        ["BBAR", "BBARD", None, None, None, None, None, None, None, None],
-        ["TXAR", "TXARD", None, None, None, None, None, None, None, None],
-    ]
-    symbols_to_subscribe = (
-        ["MERV - XMEV - {0} - 24hs".format(inst[0]) for inst in instrumentos]
-        + ["MERV - XMEV - {0} - 24hs".format(inst[1]) for inst in instrumentos]
-        + ["MERV - XMEV - {0} - CI".format(inst[0]) for inst in instrumentos]
-        + ["MERV - XMEV - {0} - CI".format(inst[1]) for inst in instrumentos]
-    )
-
+    universe = get_universe("arbitrador_v2")
+    mis_activos = universe.tagged("mis_activos")
+    # Fila por par: tickers pesos/dólares y las 8 puntas, vacías hasta el primer tick
+    instrumentos = [[ticker, tickerD] + [None] * 8 for ticker, tickerD in universe.pairs]
     PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
     CONFIG_FILE_PATH = os.path.join(PROJECT_ROOT, "config.ini")
     if not os.path.exists(CONFIG_FILE_PATH):
@@ -779,21 +553,86 @@ if __name__ == "__main__":
 
     client = CocosMatrizClient(username=usuario, password=password)
 
-    dataframehandler = DataFrameHandler(instrumentos)
-    websocket_client = WebSocketClient(token=client.token)
-    websocket_client.start_market_data_websocket(
-        symbols=symbols_to_subscribe,
-        on_data_callback=dataframehandler.update_df,
-        depth=1,  # 1 = solo top of book
-        entries="LA,BI,OF",  # Last, Bid, Offer
+    dataframehandler = DataFrameHandler(instrumentos, universe.symbols)
+    symbols_to_subscribe = dataframehandler.registry.symbols()
+    # [marketdata] shards = N reparte los símbolos en N conexiones asyncio
+    shards = config.getint("marketdata", "shards", fallback=0)
+    if shards > 0:
+        websocket_client = AsyncMarketDataClient(
+            "wss://api.cocos.xoms.com.ar/",
+            PrimaryDialect(dataframehandler.registry, entries="LA,BI,OF", depth=1),
+            shards=shards,
+            # Se evalúa en cada reconexión: toma el token renovado
+            headers=lambda: {"x-auth-token": client.token},
+            recorder=open_recorder("arbitrador_v2"),
+        )
+        websocket_client.start()
+    else:
+        websocket_client = WebSocketClient(
+            token=client.token, recorder=open_recorder("arbitrador_v2")
+        )
+        # Al reconectar, el websocket usa el token renovado
+        client.tokens.listeners.append(
+            lambda token: setattr(websocket_client, "token", token)
+        )
+        websocket_client.start_market_data_websocket(
+            symbols=symbols_to_subscribe,
+            on_data_callback=dataframehandler.update_df,
+            depth=1,  # 1 = solo top of book
+            entries="LA,BI,OF",  # Last, Bid, Offer
+        )
+
+    # Los extremos de "USD a pesosCI" solo se buscan entre mis activos
+    evaluator = RatioEvaluator(
+        dataframehandler.book,
+        restricted={
+            "USD_a_pesosCI": [
+                dataframehandler.book.ids[t]
+                for t in mis_activos
+                if t in dataframehandler.book.ids
+            ]
+        },
     )
 
+    # [schedule] enabled = true deja de evaluar fuera del horario de BYMA
+    scheduler = open_scheduler(3.5)
+    # [dashboard] enabled = true dibuja las tablas desde otro hilo
+    display = open_dashboard("arbitrador_v2")
+    # [store] dir = store guarda puntas y ratios en Parquet (ver store.py)
+    store = open_store("arbitrador_v2")
+
     try:
         # Keep the main thread alive while the WebSocket listens
         while True:
-            time.sleep(3.5)
-            executer = Executer(dataframehandler.df.copy(), mis_activos)
-            executer.execute()
+            # Fuera de rueda no se evalúa: se duerme hasta la apertura
+            if not scheduler.is_open():
+                scheduler.sleep()
+                continue
+            # Se evalúa en cada lote de ticks; solo se imprime si cambió un extremo
+            if not dataframehandler.book.wait(timeout=scheduler.interval()):
+                continue
+            with dataframehandler.book.snapshot() as snap:
+                # Las puntas, a lo sumo una vez por intervalo del scheduler
+                if store is not None and store.due("quotes", scheduler.interval()):
+                    store.record("quotes", dataframehandler.frame(snap), STORED_QUOTES)
+                if evaluator.refresh(snap):
+                    executer = Executer(
+                        dataframehandler.frame(snap),
+                        mis_activos,
+                        evaluator=evaluator,
+                        display=display,
+                        store=store,
+                    )
+                    executer.execute()
     except KeyboardInterrupt:
         print("Exiting...")
-        websocket_client.ws.close()
+        display.close()
+        if store is not None:
+            store.close()
+            print(f"Store: {store.stats()}")
+        if isinstance(websocket_client, AsyncMarketDataClient):
+            websocket_client.stop()
+        else:
+            websocket_client.ws.close()
+            if websocket_client.recorder is not None:
+                websocket_client.recorder.close()
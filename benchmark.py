@@ -0,0 +1,434 @@
+"""
+Benchmarks de los handlers de market data y de los Executer.
+
+Alimenta cada ``DataFrameHandler.update_df`` / ``DataManager.update_instrument_data``
+con un feed sintético determinístico (ver feedgen.py) y mide ticks/s, latencia
+p50/p99 por llamada y bytes asignados por llamada (tracemalloc). Los Executer se
+miden por ciclo (``ops_per_s`` son ciclos/s): se aplica un lote de ticks sin
+medir y se cronometra el snapshot + evaluación + ``execute``. La salida por
+consola y los logs se descartan mientras se mide, así que el costo de imprimir
+no entra en el número. Cada caso se repite ``--repeat`` veces y se queda la
+corrida más rápida.
+
+Los resultados se pueden guardar en JSON junto con el commit y las versiones,
+y comparar contra una corrida anterior:
+
+    python benchmark.py --size 100 --ticks 50000 --out bench/base.json
+    python benchmark.py --size 100 --ticks 50000 --compare bench/base.json
+"""
+
+import argparse
+import contextlib
+import functools
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+
+from feedgen import SyntheticFeed, make_universe
+from latency import LatencyTracer, now_ns
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+METRICS = ["ops_per_s", "p50_us", "p99_us", "alloc_bytes_per_call"]
+
+
+class PaperClient:
+    """Cliente de órdenes que no envía nada; solo cuenta las llamadas."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __getattr__(self, name: str) -> Callable[..., None]:
+        def call(*args: Any, **kwargs: Any) -> None:
+            self.calls += 1
+
+        return call
+
+
+# ====================== MEDICIÓN ======================
+def measure(
+    fn: Callable[..., Any],
+    inputs: Sequence[Any],
+    ticks_per_call: float = 1.0,
+    prepare: Optional[Callable[[Any], Any]] = None,
+    warmup: int = 100,
+    alloc_samples: int = 1000,
+    repeat: int = 3,
+) -> Dict[str, float]:
+    """
+    Mide ``fn`` sobre cada input.
+
+    Args:
+        fn: Función a medir; recibe el input, o nada si hay ``prepare``
+        inputs: Un elemento por llamada
+        ticks_per_call: Ticks que representa cada llamada (1 = llamadas/s)
+        prepare: Si se pasa, se llama con el input fuera de la medición y
+            ``fn`` se llama sin argumentos
+        warmup: Llamadas previas que no se miden
+        alloc_samples: Llamadas que se repiten bajo tracemalloc
+        repeat: Pasadas completas; se reporta la de menor tiempo total
+
+    Returns:
+        Dict[str, float]: Métricas de la corrida
+    """
+
+    def call(x: Any) -> None:
+        if prepare is None:
+            fn(x)
+        else:
+            prepare(x)
+            fn()
+
+    for x in inputs[:warmup]:
+        call(x)
+
+    clock = time.perf_counter_ns
+    best: Optional[np.ndarray] = None
+    for _ in range(max(1, repeat)):
+        lat = np.empty(len(inputs), dtype=np.int64)
+        for i, x in enumerate(inputs):
+            if prepare is None:
+                start = clock()
+                fn(x)
+            else:
+                prepare(x)
+                start = clock()
+                fn()
+            lat[i] = clock() - start
+        if best is None or lat.sum() < best.sum():
+            best = lat
+    lat = best  # type: ignore
+    total = int(lat.sum())
+
+    alloc: List[int] = []
+    tracemalloc.start()
+    try:
+        for x in inputs[:alloc_samples]:
+            if prepare is not None:
+                prepare(x)
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            if prepare is None:
+                fn(x)
+            else:
+                fn()
+            alloc.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "calls": len(inputs),
+        "ops_per_s": len(inputs) * ticks_per_call / (total / 1e9) if total else 0,
+        "p50_us": float(np.percentile(lat, 50)) / 1e3,
+        "p99_us": float(np.percentile(lat, 99)) / 1e3,
+        "max_us": float(lat.max()) / 1e3,
+        "alloc_bytes_per_call": float(np.mean(alloc)) if alloc else 0.0,
+    }
+
+
+def _batches(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+# ====================== CASOS ======================
+def _list_instruments(pairs: Sequence[Sequence[str]]) -> List[List]:
+    return [[p[0], p[1], None, None, None, None, None, None, None, None] for p in pairs]
+
+
+def _dict_instruments(pairs: Sequence[Sequence[str]]) -> List[Dict]:
+    from example_v1 import create_instrument
+
+    return [create_instrument(p[0], p[1]) for p in pairs]
+
+
+def handler_cases(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """Ticks/s y latencia de los handlers del websocket."""
+    import arbitrador_v1
+    import arbitrador_v2
+    import arbitradorC
+    import example_v1
+    import example_v2
+
+    bench = functools.partial(measure, repeat=args.repeat)
+    pairs = make_universe(args.size)
+    lists = _list_instruments(pairs)
+    dicts = _dict_instruments(pairs)
+    both = ("24hs", "CI")
+    only_24 = ("24hs",)
+
+    def pipe(plazos: Sequence[str]) -> List[List[str]]:
+        feed = SyntheticFeed(pairs, plazos=plazos, seed=args.seed)
+        return _batches(feed.pipe_records(args.ticks), args.batch)
+
+    def md(plazos: Sequence[str]) -> List[Dict]:
+        return SyntheticFeed(pairs, plazos=plazos, seed=args.seed).md_messages(
+            args.ticks
+        )
+
+    v1 = arbitrador_v1.DataFrameHandler(lists)
+    frames_24 = SyntheticFeed(pairs, plazos=only_24, seed=args.seed).pipe_frames(
+        args.ticks, batch=args.batch
+    )
+    traced_v1 = example_v1.DataManager(dicts, LatencyTracer())
+    traced_v2 = example_v2.DataManager(dicts, LatencyTracer())
+    frames = SyntheticFeed(pairs, plazos=both, seed=args.seed).pipe_frames(
+        args.ticks, batch=args.batch
+    )
+    return {
+        "arbitradorC.update_df": bench(
+            arbitradorC.DataFrameHandler(lists).update_df, pipe(only_24), args.batch
+        ),
+        "arbitrador_v1.update_df": bench(v1.update_df, pipe(both), args.batch),
+        "arbitrador_v1.update_frame": bench(v1.update_frame, frames, args.batch),
+        "arbitrador_v2.update_df": bench(
+            arbitrador_v2.DataFrameHandler(lists).update_df, md(both)
+        ),
+        "example_v1.update_instrument_data": bench(
+            example_v1.DataManager(dicts).update_instrument_data,
+            pipe(only_24),
+            args.batch,
+        ),
+        "example_v2.update_instrument_data": bench(
+            example_v2.DataManager(dicts).update_instrument_data, md(only_24)
+        ),
+        "example_v1.update_frame": bench(
+            example_v1.DataManager(dicts).update_frame, frames_24, args.batch
+        ),
+        # Mismo camino con estampas de latencia (ver latency.py)
+        "example_v1.update_frame+tracer": bench(
+            lambda f: traced_v1.update_frame(f, now_ns()), frames_24, args.batch
+        ),
+        "example_v2.update_instrument_data+tracer": bench(
+            lambda m: traced_v2.update_instrument_data(m, now_ns()), md(only_24)
+        ),
+    }
+
+
+def executer_cases(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """Duración de un ciclo de estrategia sobre el libro ya cargado."""
+    import arbitrador_v1
+    import arbitrador_v2
+    import arbitradorC
+    import example_v1
+    import example_v2
+    from ratios import RatioEvaluator
+
+    bench = functools.partial(measure, repeat=args.repeat)
+    pairs = make_universe(args.size)
+    lists = _list_instruments(pairs)
+    dicts = _dict_instruments(pairs)
+    mis_activos = [p[0] for p in pairs[::5]]
+    per_cycle = max(1, args.ticks // args.cycles)
+    both = ("24hs", "CI")
+    results: Dict[str, Dict[str, float]] = {}
+
+    def run(
+        name: str, apply: Callable, cycle: Callable, plazos: Sequence[str], md: bool
+    ) -> None:
+        feed = SyntheticFeed(pairs, plazos=plazos, seed=args.seed)
+        if md:
+            ticks = feed.md_messages(per_cycle * (args.cycles + 1) + 20 * len(pairs))
+            prime, rest = ticks[: 20 * len(pairs)], ticks[20 * len(pairs) :]
+            for m in prime:
+                apply(m)
+            inputs = _batches(rest, per_cycle)
+
+            def prepare(batch: List[Dict]) -> None:
+                for m in batch:
+                    apply(m)
+
+        else:
+            ticks = feed.pipe_records(per_cycle * (args.cycles + 1) + 20 * len(pairs))
+            apply(ticks[: 20 * len(pairs)])
+            inputs = _batches(ticks[20 * len(pairs) :], per_cycle)
+            prepare = apply
+        results[name] = bench(
+            cycle,
+            inputs[: args.cycles],
+            prepare=prepare,
+            warmup=min(10, args.cycles),
+            alloc_samples=min(50, args.cycles),
+        )
+
+    # arbitradorC
+    hC = arbitradorC.DataFrameHandler(lists)
+
+    def cycle_c() -> None:
+        with hC.book.snapshot() as snap:
+            arbitradorC.Executer(hC.frame(snap)).execute()
+
+    run("arbitradorC.Executer.execute", hC.update_df, cycle_c, ("24hs",), md=False)
+
+    # arbitrador_v1 / v2 con evaluador incremental
+    for mod, md in ((arbitrador_v1, False), (arbitrador_v2, True)):
+        h = mod.DataFrameHandler(lists)
+        ids = [h.book.ids[t] for t in mis_activos]
+        ev = RatioEvaluator(h.book, restricted={"USD_a_pesosCI": ids})
+
+        def cycle_v(h: Any = h, ev: RatioEvaluator = ev, mod: Any = mod) -> None:
+            with h.book.snapshot() as snap:
+                ev.refresh(snap)
+                mod.Executer(h.frame(snap), mis_activos, evaluator=ev).execute()
+
+        run(f"{mod.__name__}.Executer.execute", h.update_df, cycle_v, both, md=md)
+
+    # example_v1 / v2 con un cliente que no envía órdenes
+    client = PaperClient()
+    d1 = example_v1.DataManager(dicts)
+    ex1 = example_v1.Executer(account="bench", client=client)  # type: ignore
+
+    def cycle_e1() -> None:
+        with d1.snapshot() as snap:
+            ex1.execute(snap.records(dicts), dolarizadores=set(), pesificadores=set())
+
+    run(
+        "example_v1.Executer.execute",
+        d1.update_instrument_data,
+        cycle_e1,
+        ("24hs",),
+        md=False,
+    )
+
+    d2 = example_v2.DataManager(dicts)
+    ex2 = example_v2.Executer(account="bench", client=client)  # type: ignore
+
+    def cycle_e2() -> None:
+        with d2.snapshot() as snap:
+            ex2.execute(snap.records(dicts))
+
+    run(
+        "example_v2.Executer.execute",
+        d2.update_instrument_data,
+        cycle_e2,
+        ("24hs",),
+        md=True,
+    )
+    if client.calls:
+        logging.getLogger(__name__).warning(
+            "El feed generó %d llamadas al cliente de órdenes", client.calls
+        )
+    return results
+
+
+# ====================== REPORTE ======================
+def _git_commit() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                cwd=PROJECT_ROOT,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": "unknown", "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    """Corre los casos pedidos y devuelve métricas con metadatos de la corrida."""
+    # Los scripts abren logs/<script>.log al importarse
+    os.makedirs("logs", exist_ok=True)
+    results: Dict[str, Dict[str, float]] = {}
+    logging.disable(logging.CRITICAL)
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            if args.suite in ("all", "handlers"):
+                results.update(handler_cases(args))
+            if args.suite in ("all", "executers"):
+                results.update(executer_cases(args))
+    finally:
+        logging.disable(logging.NOTSET)
+    if args.only:
+        results = {k: v for k, v in results.items() if args.only in k}
+    return {
+        "meta": {
+            **_git_commit(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+
+def print_report(run: Dict[str, Any], base: Optional[Dict[str, Any]] = None) -> None:
+    def delta(new: float, old: Optional[float], higher_is_better: bool) -> str:
+        if not old:
+            return "-"
+        change = new / old - 1 if higher_is_better else 1 - new / old
+        return f"{change * 100:+.1f}%"
+
+    rows = []
+    for name, m in run["results"].items():
+        row = [name] + [m[k] for k in METRICS]
+        if base is not None:
+            # Positivo = mejor (más operaciones/s, menos latencia)
+            b = base["results"].get(name, {})
+            row.append(delta(m["ops_per_s"], b.get("ops_per_s"), True))
+            row.append(delta(m["p99_us"], b.get("p99_us"), False))
+        rows.append(row)
+    headers = ["caso"] + METRICS
+    if base is not None:
+        headers += [f"Δ ops/s vs {base['meta']['commit']}", "Δ p99"]
+    meta = run["meta"]
+    print(
+        f"commit {meta['commit']}{' (con cambios)' if meta['dirty'] else ''}"
+        f" · python {meta['python']} · numpy {meta['numpy']} · pandas {meta['pandas']}"
+    )
+    print(tabulate(rows, headers=headers, tablefmt="mixed_outline", floatfmt=",.1f"))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=50, help="pares del universo")
+    parser.add_argument("--ticks", type=int, default=20000, help="ticks por caso")
+    parser.add_argument("--batch", type=int, default=1, help="registros por llamada")
+    parser.add_argument("--cycles", type=int, default=200, help="ciclos de Executer")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="pasadas por caso")
+    parser.add_argument(
+        "--suite", choices=("all", "handlers", "executers"), default="all"
+    )
+    parser.add_argument("--only", help="solo casos cuyo nombre contenga este texto")
+    parser.add_argument("--out", help="guardar resultados en este JSON")
+    parser.add_argument("--compare", help="JSON de una corrida anterior")
+    args = parser.parse_args(argv)
+
+    run = run_suite(args)
+    base = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+    print_report(run, base)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
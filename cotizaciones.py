@@ -0,0 +1,70 @@
+"""
+Cotizaciones de los paneles de Balanz como tabla indexada por ticker y plazo.
+
+Los paneles devuelven una lista de diccionarios (``ticker``, ``plazo``, ``pc``,
+``pv``, ...). Buscar cada pata de cada par con ``filter`` recorre la lista
+entera cuatro veces por par; acá la lista se carga una sola vez en un
+DataFrame pivoteado por plazo y las patas de todos los pares salen de dos
+``reindex`` (pesos y dólares), con columnas float64 y NaN donde no hay precio.
+"""
+
+from typing import Dict, Iterable, Mapping, Sequence, Tuple
+
+import pandas as pd
+
+PRICE_SCALE = 100  # Balanz cotiza por nominal; los ratios usan precio por 100
+PLAZOS = ("CI", "24hs")
+
+# Columna → (pata, campo, plazo); pata 0 = primer ticker del par (pesos), 1 =
+# segundo (dólares); campo pc = compra, pv = venta
+Column = Tuple[int, str, str]
+
+# Columnas de dolarMEP.create_df
+PAIR_COLUMNS: Dict[str, Column] = {
+    "prCompraPesosCI": (0, "pc", "CI"),
+    "prVentaPesosCI": (0, "pv", "CI"),
+    "prCompraPesos": (0, "pc", "24hs"),
+    "prVentaPesos": (0, "pv", "24hs"),
+    "prCompraDolarCI": (1, "pc", "CI"),
+    "prVentaDolarCI": (1, "pv", "CI"),
+    "prCompraDolar": (1, "pc", "24hs"),
+    "prVentaDolar": (1, "pv", "24hs"),
+}
+
+
+def quote_table(cotizaciones: Iterable[Mapping]) -> pd.DataFrame:
+    """
+    Precios de un panel por ticker, con columnas (pc|pv, plazo) ya × PRICE_SCALE.
+
+    Si un (ticker, plazo) aparece repetido se queda la primera fila, como hacía
+    la búsqueda con ``filter``.
+    """
+    q = pd.DataFrame(list(cotizaciones), columns=["ticker", "plazo", "pc", "pv"])
+    q = q.drop_duplicates(["ticker", "plazo"]).set_index(["ticker", "plazo"])
+    wide = q.astype(float).unstack("plazo")
+    columns = pd.MultiIndex.from_product([["pc", "pv"], PLAZOS])
+    return wide.reindex(columns=columns) * PRICE_SCALE
+
+
+def join_pairs(
+    table: pd.DataFrame,
+    pairs: Sequence[Sequence[str]],
+    columns: Mapping[str, Column] = PAIR_COLUMNS,
+    keys: Sequence[str] = ("ticker",),
+) -> pd.DataFrame:
+    """
+    Una fila por par, en el orden de ``pairs``, con las columnas de precio
+    pedidas.
+
+    Args:
+        table: Resultado de quote_table
+        pairs: Pares (ticker pesos, ticker dólares)
+        columns: Columna de salida → (pata, campo, plazo)
+        keys: Columnas de texto con los tickers de cada pata (la primera es la
+            pata en pesos)
+    """
+    legs = [table.reindex([p[leg] for p in pairs]) for leg in (0, 1)]
+    data = {key: [p[leg] for p in pairs] for leg, key in enumerate(keys)}
+    for name, (leg, field, plazo) in columns.items():
+        data[name] = legs[leg][(field, plazo)].to_numpy()
+    return pd.DataFrame(data)
@@ -0,0 +1,288 @@
+"""
+Tablero de terminal redibujado por diferencias en un hilo propio.
+
+Los scripts imprimían en cada ciclo hasta diez tablas ``tabulate`` desde el
+hilo que decide: formatear y escribir todo ese texto en stdout era parte del
+ciclo y la salida se iba de pantalla enseguida. Con ``Dashboard`` el hilo de
+decisión solo encola referencias a los frames ya recortados (``table``/``text``)
+y las publica al cerrar el ciclo (``flush``). Un hilo aparte, a lo sumo ``fps``
+veces por segundo y solo si hubo un ciclo nuevo:
+
+- formatea el último ciclo publicado (los intermedios se saltean);
+- lo compara carácter a carácter con la pantalla anterior y escribe solo los
+  tramos que cambiaron, con movimientos de cursor ANSI;
+- si stdout no es una terminal, escribe el ciclo completo.
+
+``TablePrinter`` tiene la misma interfaz e imprime en el momento, como antes.
+``open_dashboard`` elige uno u otro según config.ini::
+
+    [dashboard]
+    enabled = true
+    fps = 4
+"""
+
+import configparser
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, TextIO, Tuple, Union
+
+import pandas as pd
+from tabulate import tabulate
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_FPS = 4.0
+MERGE_GAP = 8  # iguales entre dos tramos distintos que conviene reescribir
+HIDE_CURSOR = "\x1b[?25l"
+SHOW_CURSOR = "\x1b[?25h"
+CLEAR_SCREEN = "\x1b[2J"
+CLEAR_LINE = "\x1b[K"
+
+# Elemento de un ciclo: ("text", línea, None) o ("table", frame, floatfmt)
+Item = Tuple[str, Any, Optional[str]]
+
+
+def format_table(frame: pd.DataFrame, floatfmt: str = "g") -> str:
+    """Tabla como la imprimían los scripts."""
+    return tabulate(
+        frame,  # type: ignore
+        headers="keys",
+        tablefmt="mixed_outline",
+        floatfmt=floatfmt,
+    )
+
+
+def _move(row: int, col: int) -> str:
+    return f"\x1b[{row + 1};{col + 1}H"
+
+
+def diff_line(row: int, old: str, new: str) -> str:
+    """
+    Secuencia que convierte la línea ``old`` en ``new`` en pantalla.
+
+    Los tramos distintos separados por menos de MERGE_GAP caracteres iguales se
+    escriben juntos (mover el cursor cuesta más que reescribirlos).
+    """
+    if old == new:
+        return ""
+    width = max(len(old), len(new))
+    old, new = old.ljust(width), new.ljust(width)
+    out = []
+    i = 0
+    while i < width:
+        if old[i] == new[i]:
+            i += 1
+            continue
+        start = end = i
+        j = i
+        while j < width:
+            if old[j] != new[j]:
+                end = j + 1
+            elif j - end >= MERGE_GAP:
+                break
+            j += 1
+        out.append(_move(row, start) + new[start:end])
+        i = end
+    return "".join(out)
+
+
+# ====================== SALIDA DIRECTA ======================
+class TablePrinter:
+    """Imprime cada tabla en el momento desde el hilo que decide."""
+
+    def text(self, line: str) -> None:
+        print(line)
+
+    def table(self, frame: pd.DataFrame, floatfmt: str = "g") -> None:
+        print(format_table(frame, floatfmt))
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, float]:
+        return {}
+
+
+# ====================== TABLERO ======================
+class Dashboard:
+    """Último ciclo publicado, dibujado por diferencias desde un hilo aparte."""
+
+    def __init__(
+        self,
+        title: str,
+        fps: float = DEFAULT_FPS,
+        stream: Optional[TextIO] = None,
+    ) -> None:
+        """
+        Args:
+            title: Nombre que encabeza la pantalla
+            fps: Redibujados por segundo como máximo
+            stream: Salida; por defecto sys.stdout
+        """
+        self.title = title
+        self.fps = fps
+        self.stream = stream or sys.stdout
+        self.tty = self.stream.isatty()
+        # Ciclo en curso: solo lo toca el hilo de decisión
+        self._pending: List[Item] = []
+        # Último ciclo publicado
+        self._lock = threading.Lock()
+        self._published: List[Item] = []
+        self._published_at = 0.0
+        self._version = 0
+        self._rendered = 0
+        self._screen: List[str] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Estadísticas
+        self.frames = 0
+        self.skipped = 0  # ciclos publicados que nunca llegaron a dibujarse
+        self.bytes = 0
+        self.render_time = 0.0
+
+    # ---------- hilo de decisión ----------
+    def text(self, line: str) -> None:
+        self._pending.append(("text", line, None))
+
+    def table(self, frame: pd.DataFrame, floatfmt: str = "g") -> None:
+        """Encola el frame sin formatearlo; no se debe modificar después."""
+        self._pending.append(("table", frame, floatfmt))
+
+    def flush(self) -> None:
+        """Publica el ciclo en curso para el próximo redibujado."""
+        items, self._pending = self._pending, []
+        with self._lock:
+            self._published = items
+            self._published_at = time.time()
+            self._version += 1
+
+    # ---------- hilo de dibujo ----------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        if self.tty:
+            self._write(HIDE_CURSOR + CLEAR_SCREEN)
+        self._thread = threading.Thread(target=self._run, name="dashboard", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        period = 1.0 / self.fps
+        while not self._stop.wait(period):
+            self.render()
+
+    def render(self) -> bool:
+        """
+        Dibuja el último ciclo si hay uno nuevo.
+
+        Returns:
+            bool: True si se dibujó
+        """
+        with self._lock:
+            version, items = self._version, self._published
+            published_at = self._published_at
+        if version == self._rendered:
+            return False
+        start = time.perf_counter()
+        self.skipped += version - self._rendered - 1
+        self._rendered = version
+        lines = self.compose(items, version, published_at)
+        if self.tty:
+            out = self._diff(lines)
+        else:
+            out = "\n".join(lines) + "\n"
+        self._write(out)
+        self.frames += 1
+        self.render_time += time.perf_counter() - start
+        return True
+
+    def compose(
+        self, items: List[Item], version: int, published_at: float
+    ) -> List[str]:
+        """Líneas de pantalla de un ciclo, con una línea de estado arriba."""
+        stamp = datetime.fromtimestamp(published_at) if published_at else None
+        lines = [
+            f"{self.title} | ciclo {version}"
+            + (f" | {stamp:%H:%M:%S.%f}"[:-3] if stamp else "")
+        ]
+        for kind, value, floatfmt in items:
+            if kind == "table":
+                text = format_table(value, floatfmt or "g")
+            else:
+                text = value
+            lines.extend(text.split("\n"))
+        return lines
+
+    def _diff(self, lines: List[str]) -> str:
+        size = shutil.get_terminal_size()
+        lines = [line[: size.columns] for line in lines[: size.lines - 1]]
+        old = self._screen
+        out = [
+            diff_line(row, old[row] if row < len(old) else "", line)
+            for row, line in enumerate(lines)
+        ]
+        # Líneas que sobran del ciclo anterior
+        for row in range(len(lines), len(old)):
+            out.append(_move(row, 0) + CLEAR_LINE)
+        self._screen = lines
+        if any(out):
+            out.append(_move(len(lines), 0))
+        return "".join(out)
+
+    def _write(self, out: str) -> None:
+        if not out:
+            return
+        self.stream.write(out)
+        self.stream.flush()
+        self.bytes += len(out)
+
+    def close(self) -> None:
+        """Dibuja el último ciclo, frena el hilo y devuelve el cursor."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.render()
+        if self.tty:
+            self._write(_move(len(self._screen), 0) + SHOW_CURSOR)
+
+    def stats(self) -> Dict[str, float]:
+        """Contadores para logs."""
+        return {
+            "cycles": self._version,
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "bytes": self.bytes,
+            "render_ms": 1e3 * self.render_time / self.frames if self.frames else 0.0,
+        }
+
+
+def open_dashboard(
+    name: str, config_path: Optional[str] = None
+) -> Union[TablePrinter, Dashboard]:
+    """
+    Tablero iniciado si config.ini tiene ``[dashboard] enabled = true``.
+
+    Args:
+        name: Título de la pantalla (nombre del script)
+        config_path: Ruta de config.ini; por defecto la del proyecto
+
+    Returns:
+        Union[TablePrinter, Dashboard]: TablePrinter si no está configurado
+    """
+    config = configparser.ConfigParser()
+    config.read(config_path or os.path.join(PROJECT_ROOT, "config.ini"))
+    if not config.getboolean("dashboard", "enabled", fallback=False):
+        return TablePrinter()
+    dashboard = Dashboard(
+        name, config.getfloat("dashboard", "fps", fallback=DEFAULT_FPS)
+    )
+    dashboard.start()
+    return dashboard
@@ -0,0 +1,304 @@
+"""
+Libro L2: varios niveles por punta para dimensionar arbitrajes.
+
+Con solo la mejor punta, la cantidad de cada operación queda limitada al primer
+nivel de cada pata (``min(siCompraDolar, siVentaPesos, max_quant)``) aunque el
+segundo o tercer nivel todavía dejen ganancia contra AL30. ``DepthBook`` guarda
+los N mejores niveles de compra y venta de cada pata en dos arrays, precios y
+tamaños, de forma (instrumentos, 2 patas, 2 lados, N), y con ellos calcula:
+
+- ``vwap``: precio promedio ejecutable de una cantidad recorriendo niveles.
+- ``max_quantity``: la mayor cantidad para la que lo que se recibe en una pata
+  supera ``k`` veces lo que se paga en la otra. Recibido y pagado son lineales
+  por tramos en la cantidad (cóncavo y convexo), así que su diferencia es
+  cóncava y vale 0 en 0: alcanza con evaluarla en los quiebres y resolver el
+  último tramo positivo.
+- ``DepthBook.dolarizar`` / ``pesificar``: cantidad, ratio VWAP y precios
+  límite de un arbitraje contra la cobertura con AL30 a su propio VWAP.
+
+Solo el dialecto Primary (``Md`` con ``depth`` > 1) trae niveles: los registros
+con pipes de Matriz tienen únicamente la mejor punta.
+"""
+
+import math
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from mdparser import SYMBOL_FORMAT
+
+DEFAULT_DEPTH = 5
+PESOS, DOLAR = 0, 1  # pata
+BID, ASK = 0, 1  # lado
+
+# Curva acumulada de un lado: (nominales, monto) en cada quiebre, desde (0, 0)
+Curve = Tuple[np.ndarray, np.ndarray]
+
+
+def _curve(prices: np.ndarray, sizes: np.ndarray) -> Curve:
+    valid = (sizes > 0) & np.isfinite(prices)
+    qty = np.concatenate(([0.0], np.cumsum(sizes[valid])))
+    amount = np.concatenate(([0.0], np.cumsum(prices[valid] * sizes[valid])))
+    return qty, amount
+
+
+def vwap(prices: np.ndarray, sizes: np.ndarray, qty: float) -> float:
+    """
+    Precio promedio de ``qty`` nominales recorriendo los niveles en orden.
+
+    Returns:
+        float: NaN si ``qty`` no es positiva o supera la profundidad
+    """
+    q, amount = _curve(prices, sizes)
+    if qty <= 0 or qty > q[-1]:
+        return math.nan
+    return float(np.interp(qty, q, amount)) / qty
+
+
+def limit_price(prices: np.ndarray, sizes: np.ndarray, qty: float) -> float:
+    """Precio del último nivel que toca una orden de ``qty`` nominales."""
+    valid = (sizes > 0) & np.isfinite(prices)
+    p, cum = prices[valid], np.cumsum(sizes[valid])
+    if qty <= 0 or p.size == 0 or qty > cum[-1]:
+        return math.nan
+    return float(p[np.searchsorted(cum, qty)])
+
+
+def max_quantity(
+    receive: Tuple[np.ndarray, np.ndarray],
+    pay: Tuple[np.ndarray, np.ndarray],
+    k: float,
+    cap: float = math.inf,
+) -> int:
+    """
+    Mayor cantidad entera con monto recibido > ``k`` × monto pagado.
+
+    Args:
+        receive: (precios, tamaños) del lado contra el que se vende
+        pay: (precios, tamaños) del lado contra el que se compra
+        k: Relación mínima entre lo recibido y lo pagado
+        cap: Tope de nominales
+
+    Returns:
+        int: 0 si ni el primer nominal cumple la condición
+    """
+    q_recv, a_recv = _curve(*receive)
+    q_pay, a_pay = _curve(*pay)
+    limit = min(q_recv[-1], q_pay[-1], cap)
+    if limit <= 0:
+        return 0
+    qs = np.union1d(q_recv, q_pay)
+    qs = np.append(qs[qs < limit], limit)
+    f = np.interp(qs, q_recv, a_recv) - k * np.interp(qs, q_pay, a_pay)
+    below = np.flatnonzero(f[1:] <= 0)
+    if below.size == 0:
+        return int(limit)
+    i = int(below[0]) + 1
+    if i == 1:
+        return 0
+    # Raíz del tramo (qs[i-1], qs[i]); la condición es estricta
+    root = qs[i - 1] + f[i - 1] * (qs[i] - qs[i - 1]) / (f[i - 1] - f[i])
+    return max(math.ceil(root) - 1, 0)
+
+
+class Sizing:
+    """Cantidades, ratios VWAP y precios límite de un arbitraje."""
+
+    __slots__ = (
+        "quant",
+        "ratio",
+        "buy_price",
+        "sell_price",
+        "quant_al30",
+        "ratio_al30",
+        "amount",
+    )
+
+    def __init__(
+        self,
+        quant: int,
+        ratio: float,
+        buy_price: float,
+        sell_price: float,
+        quant_al30: int,
+        ratio_al30: float,
+        amount: float,
+    ) -> None:
+        self.quant = quant
+        self.ratio = ratio  # pesos por dólar al VWAP de las dos patas
+        self.buy_price = buy_price  # límite de la pata que se compra
+        self.sell_price = sell_price  # límite de la pata que se vende
+        self.quant_al30 = quant_al30
+        self.ratio_al30 = ratio_al30  # pesos por dólar de la cobertura al VWAP
+        self.amount = amount  # monto en dólares de la pata en dólares
+
+    def __repr__(self) -> str:
+        return (
+            f"Sizing(quant={self.quant}, ratio={self.ratio:.4f}, "
+            f"quant_al30={self.quant_al30}, ratio_al30={self.ratio_al30:.4f})"
+        )
+
+
+class DepthBook:
+    """N niveles por lado y pata de cada par, en arrays preasignados."""
+
+    def __init__(
+        self,
+        pairs: Sequence[Sequence[str]],
+        depth: int = DEFAULT_DEPTH,
+        plazo: str = "24hs",
+    ) -> None:
+        """
+        Args:
+            pairs: Pares (ticker pesos, ticker dólares); su posición es el id
+            depth: Niveles que se guardan por lado
+            plazo: Plazo de los símbolos suscriptos
+        """
+        self.keys: List[str] = [p[0] for p in pairs]
+        self.ids: Dict[str, int] = {k: i for i, k in enumerate(self.keys)}
+        self.depth = depth
+        shape = (len(self.keys), 2, 2, depth)
+        self.prices = np.full(shape, np.nan)
+        self.sizes = np.zeros(shape)
+        # Símbolo completo de Primary → (fila, pata)
+        self.routes: Dict[str, Tuple[int, int]] = {}
+        for row, pair in enumerate(pairs):
+            for leg in (PESOS, DOLAR):
+                key = SYMBOL_FORMAT.format(ticker=pair[leg], plazo=plazo)
+                self.routes.setdefault(key, (row, leg))
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    # ====================== ESCRITURA (hilo del websocket) ======================
+    def apply(self, data: Dict) -> bool:
+        """
+        Escribe los niveles ``BI``/``OF`` de un mensaje ``Md``; un lado ausente
+        queda vacío.
+
+        Returns:
+            bool: True si el símbolo estaba registrado y traía market data
+        """
+        md = data.get("marketData")
+        if not md:
+            return False
+        route = self.routes.get(data["instrumentId"]["symbol"])
+        if route is None:
+            return False
+        row, leg = route
+        depth = self.depth
+        with self._lock:
+            for side, entries in ((BID, md.get("BI")), (ASK, md.get("OF"))):
+                prices = self.prices[row, leg, side]
+                sizes = self.sizes[row, leg, side]
+                prices.fill(np.nan)
+                sizes.fill(0.0)
+                for n, level in enumerate((entries or [])[:depth]):
+                    price, size = level.get("price"), level.get("size")
+                    if price and size:
+                        prices[n], sizes[n] = price, size
+        return True
+
+    # ====================== LECTURA ======================
+    def levels(self, ticker: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Copia de (precios, tamaños) del par, forma (2 patas, 2 lados, N)."""
+        row = self.ids.get(ticker)
+        if row is None:
+            return None
+        with self._lock:
+            return self.prices[row].copy(), self.sizes[row].copy()
+
+    def _size(
+        self,
+        ticker: str,
+        al30: str,
+        threshold: float,
+        cap: float,
+        cap_al30: float,
+        dolarizar: bool,
+    ) -> Optional[Sizing]:
+        item, hedge = self.levels(ticker), self.levels(al30)
+        if item is None or hedge is None:
+            return None
+        # Compra/venta de cada pata; la cobertura va en sentido inverso
+        buy_leg, sell_leg = (PESOS, DOLAR) if dolarizar else (DOLAR, PESOS)
+        buy = (item[0][buy_leg, ASK], item[1][buy_leg, ASK])
+        sell = (item[0][sell_leg, BID], item[1][sell_leg, BID])
+        h_pesos = (hedge[0][PESOS, buy_leg], hedge[1][PESOS, buy_leg])
+        h_dolar = (hedge[0][DOLAR, 1 - buy_leg], hedge[1][DOLAR, 1 - buy_leg])
+        cap_al30 = min(cap_al30, _curve(*h_pesos)[0][-1], _curve(*h_dolar)[0][-1])
+        dollar_leg = sell if dolarizar else buy
+
+        def hedge_ratio(quant_al30: float) -> float:
+            quant_al30 = max(quant_al30, 1)
+            return vwap(*h_pesos, quant_al30) / vwap(*h_dolar, quant_al30)
+
+        def hedge_quant(quant: int) -> int:
+            amount = quant * vwap(*dollar_leg, quant)
+            top = h_dolar[0][0]
+            return min(int(amount / top), int(cap_al30)) if top == top else 0
+
+        # Primero contra la cobertura a su mejor punta y después contra su VWAP
+        # para la cobertura resultante (que solo puede empeorar el ratio)
+        ratio_al30 = hedge_ratio(1)
+        quant = 0
+        for _ in range(2):
+            if ratio_al30 != ratio_al30:
+                return None
+            if dolarizar:
+                # pesos_a_USD × umbral < USD_a_pesos de AL30
+                quant = max_quantity(sell, buy, threshold / ratio_al30, cap)
+            else:
+                # pesos_a_USD de AL30 × umbral < USD_a_pesos
+                quant = max_quantity(sell, buy, threshold * ratio_al30, cap)
+            if quant <= 0:
+                return None
+            ratio_al30 = hedge_ratio(hedge_quant(quant))
+        pesos = buy if dolarizar else sell
+        ratio = vwap(*pesos, quant) / vwap(*dollar_leg, quant)
+        return Sizing(
+            quant,
+            ratio,
+            limit_price(*buy, quant),
+            limit_price(*sell, quant),
+            hedge_quant(quant),
+            ratio_al30,
+            quant * vwap(*dollar_leg, quant),
+        )
+
+    def dolarizar(
+        self,
+        ticker: str,
+        threshold: float,
+        cap: float = math.inf,
+        cap_al30: float = math.inf,
+        al30: str = "AL30",
+    ) -> Optional[Sizing]:
+        """
+        Mayor dolarización con ``ticker`` cuyo ``pesos_a_USD`` al VWAP, por el
+        umbral, sigue debajo del ``USD_a_pesos`` de AL30 al VWAP de la cobertura.
+
+        Args:
+            ticker: Ticker en pesos del par
+            threshold: Umbral de la estrategia (ej. 1.0007)
+            cap: Tope de nominales del instrumento (max_quant)
+            cap_al30: Tope de nominales de la cobertura
+            al30: Ticker en pesos de la cobertura
+
+        Returns:
+            Optional[Sizing]: None si no hay profundidad o ni un nominal conviene
+        """
+        return self._size(ticker, al30, threshold, cap, cap_al30, dolarizar=True)
+
+    def pesificar(
+        self,
+        ticker: str,
+        threshold: float,
+        cap: float = math.inf,
+        cap_al30: float = math.inf,
+        al30: str = "AL30",
+    ) -> Optional[Sizing]:
+        """Como dolarizar, en sentido inverso (``USD_a_pesos`` contra AL30)."""
+        return self._size(ticker, al30, threshold, cap, cap_al30, dolarizar=False)
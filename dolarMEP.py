@@ -1,222 +1,46 @@
 import configparser
 import os
-import requests
 import simplejson
 import pandas as pd
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
 import numpy as np
 from tabulate import tabulate
 
 from dash import Dash, dash_table, html
 from dash.dash_table import DataTable, FormatTemplate
 
-mis_activos = [
-    "YMCIO",
-    "YMCXO",
-    "GNCXO",
-    "TLC1O",
-    "TLCMO",
-    "MTCGO",
-    "ARC1O",
-    "CRCJO",
-    "RUCAO",
-    "MRCAO",
-    "MR35O",
-    "MSSEO",
-    "LECGO",
-    "IRCIO",
-    "VSCRO",
-    "VSCTO",
-    "PECGO",
-    "SNABO",
-    "YFCJO",
-    "YM34O",
-    "NPCBO",
-    "IRCPO",
-]
-
-soberanos = [
-    ["AL30", "AL30D"],
-    ["GD30", "GD30D"],
-    ["AL35", "AL35D"],
-    ["GD35", "GD35D"],
-    ["BPJ25", "BPJ5D"],
-    ["BPY26", "BPY6D"],
-    ["BPOA7", "BPA7D"],
-    ["BPOB7", "BPB7D"],
-    ["BPOC7", "BPC7D"],
-    ["BPOD7", "BPD7D"],
-]
-
-ons = [
-    ["YMCIO", "YMCID"],
-    ["YMCXO", "YMCXD"],
-    ["GNCXO", "GNCXD"],
-    ["TLC1O", "TLC1D"],
-    ["TLCMO", "TLCMD"],
-    ["MTCGO", "MTCGD"],
-    ["ARC1O", "ARC1D"],
-    ["BOL1O", "BOL1D"],
-    ["CRCJO", "CRCJD"],
-    ["DNC3O", "DNC3D"],
-    ["DNC5O", "DNC5D"],
-    ["RUCAO", "RUCAD"],
-    ["MSSEO", "MSSED"],
-    ["IRCIO", "IRCID"],
-    ["AEC1O", "AEC1D"],
-    ["VSCRO", "VSCRD"],
-    ["PECGO", "PECGD"],
-    ["SNABO", "SNABD"],
-    ["RUCDO", "RUCDD"],
-    ["YFCJO", "YFCJD"],
-    ["YM34O", "YM34D"],
-    ["NPCBO", "NPCBD"],
-    ["IRCPO", "IRCPD"],
-    ["CLSIO", "CLSID"],
-    ["YMCHO", "YMCHD"],
-    ["YMCJO", "YMCJD"],
-    ["YMCQO", "YMCQD"],
-    ["GN40O", "GN40D"],
-    ["TLC5O", "TLC5D"],
-    ["IRCFO", "IRCFD"],
-    ["IRCHO", "IRCHD"],
-    ["IRCJO", "IRCJD"],
-    ["MGCHO", "MGCHD"],
-    ["MGCJO", "MGCJD"],
-    ["PNDCO", "PNDCD"],
-    ["MGC9O", "MGC9D"],
-    ["RCCJO", "RCCJD"],
-    ["CS44O", "CS44D"],
-    ["CAC5O", "CAC5D"],
-    ["CAC8O", "CAC8D"],
-    ["NPCAO", "NPCAD"],
-    ["VSCLO", "VSCLD"],
-    ["SNS9O", "SNS9D"],
-    ["LMS7O", "LMS7D"],
-    ["LMS8O", "LMS8D"],
-    ["CP34O", "CP34D"],
-    ["PNWCO", "PNWCD"],
-    ["GN43O", "GN43D"],
-    ["RAC6O", "RAC6D"],
-    ["TTC7O", "TTC7D"],
-    ["PNXCO", "PNXCD"],
-    ["PECAO", "PECAD"],
-    ["PECBO", "PECBD"],
-    ["OTS2O", "OTS2D"],
-    ["VSCPO", "VSCPD"],
-    ["HJCBO", "HJCBD"],
-    ["IRCLO", "IRCLD"],
-    ["LMS9O", "LMS9D"],
-    ["YFCIO", "YFCID"],
-    ["RZ9BO", "RZ9BD"],
-    ["LIC6O", "LIC6D"],
-    ["CRCLO", "CRCLD"],
-    ["PN35O", "PN35D"],
-    ["SNSBO", "SNSBD"],
-    ["BYCHO", "BYCHD"],
-    ["MGCMO", "MGCMD"],
-    ["MGCNO", "MGCND"],
-    ["YMCYO", "YMCYD"],
-    ["YMCZO", "YMCZD"],
-    ["HJCFO", "HJCFD"],
-    ["HJCGO", "HJCGD"],
-    ["GN47O", "GN47D"],
-    ["DNC7O", "DNC7D"],
-    ["IRCNO", "IRCND"],
-    ["IRCOO", "IRCOD"],
-    ["PQCRO", "PQCRD"],
-    ["TTC8O", "TTC8D"],
-    ["TTC9O", "TTC9D"],
-    ["GYC4O", "GYC4D"],
-    ["OTS3O", "OTS3D"],
-    ["XMC1O", "XMC1D"],
-    ["CIC7O", "CIC7D"],
-    ["CIC8O", "CIC8D"],
-    ["PN36O", "PN36D"],
-    ["PN37O", "PN37D"],
-    ["CS47O", "CS47D"],
-    ["YFCKO", "YFCKD"],
-    ["YFCLO", "YFCLD"],
-    ["TN63O", "TN63D"],
-    ["RZABO", "RZABD"],
-    ["OZC3O", "OZC3D"],
-    ["TLCOO", "TLCOD"],
-    ["BPCIO", "BPCID"],
-    ["BYCKO", "BYCKD"],
-    ["VSCTO", "VSCTD"],
-    ["SIC1O", "SIC1D"],
-    ["MGCOO", "MGCOD"],
-    ["MTC1O", "MTC1D"],
-    ["EAC3O", "EAC3D"],
-    ["HJCHO", "HJCHD"],
-    ["OT41O", "OT41D"],
-    ["OT42O", "OT42D"],
-    ["TTCAO", "TTCAD"],
-    ["PLC1O", "PLC1D"],
-    ["PLC2O", "PLC2D"],
-    ["PECIO", "PECID"],
-    ["SNSDO", "SNSDD"],
-    ["LDCGO", "LDCGD"],
-    ["PN38O", "PN38D"],
-    ["PQCSO", "PQCSD"],
-    ["DEC2O", "DEC2D"],
-    ["ZZC1O", "ZZC1D"],
-    ["YM35O", "YM35D"],
-    ["PUC2O", "PUC2D"],
-    ["GYC5O", "GYC5D"],
-    ["GN48O", "GN48D"],
-    ["CP37O", "CP37D"],
-    ["MCC1O", "MCC1D"],
-    ["VBC1O", "VBC1D"],
-    ["MSSGO", "MSSGD"],
-    ["PLC3O", "PLC3D"],
-    ["YM37O", "YM37D"],
-    ["RCCRO", "RCCRD"],
-    ["YFCMO", "YFCMD"],
-    ["MR36O", "MR36D"],
-    ["LECHO", "LECHD"],
-    ["MRCAO", "MRCAD"],
-    ["MR35O", "MR35D"],
-    ["LECBO", "LECBD"],
-    ["LECGO", "LECGD"],
-    ["MRCLO", "MRCLD"],
-    ["MRCQO", "MRCQD"],
-    ["MRCOO", "MROCD"],
-    ["LECAO", "LECAD"],
-    ["LECEO", "LECED"],
-    ["MRCUO", "MRCUD"],
-    ["MRCYO", "MRCYD"],
-    ["MR39O", "MR39D"],
-]
-
-
-cedears = [
-    ["SPY", "SPYD"],
-    ["IWM", "IWMD"],
-    ["EEM", "EEMD"],
-    ["AAPL", "AAPLD"],
-    ["GOOGL", "GOGLD"],
-    ["AMZN", "AMZND"],
-    ["JNJ", "JNJD"],
-    ["TSLA", "TSLAD"],
-    ["DISN", "DISND"],
-    ["PYPL", "PYPLD"],
-    ["PFE", "PFED"],
-    ["NVDA", "NVDAD"],
-    ["BRKB", "BRKBD"],
-    ["KO", "KOD"],
-    ["BABA", "BABAD"],
-    ["WMT", "WMTD"],
-    ["BA.C", "BA.CD"],
-]
-
-provinciales = [
-    ["BA37D", "BA7DD"],
-    ["NDT25", "NDT5D"],
-    ["CO26", "CO26D"],
-    ["PMM29", "PM29D"],
-    ["SA24D", "S24DD"],
-]
+from aioclient import DEFAULT_SHARDS, AsyncMarketDataClient, MatrizDialect
+from cotizaciones import join_pairs, quote_table
+from dashboard import open_dashboard
+from httppool import BALANZ_TIMEOUTS, format_all_stats, get_session
+from instruments import load_registry
+from mdparser import TopicParser
+from quotebook import PRICE_COLUMNS, QuoteBook
+from ratios import CROSS_RATIOS, RATIOS, RatioEvaluator, RatioRanking
+from scheduler import open_scheduler, relative_spread
+from store import open_store
+from tape import open_recorder
+from tokens import BALANZ_TOKEN_TTL, TokenManager
+
+BALANZ_URL = "https://clientes.balanz.com"
+PANEL_DEADLINE = 5.0  # segundos que un ciclo espera a los paneles
+MATRIZ_WS_URL = "wss://matriz.cocos.xoms.com.ar/ws"
+STREAM_WAIT = 15.0  # segundos sin ticks antes de volver a esperar
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE_PATH = os.path.join(PROJECT_ROOT, "config.ini")
+# Sesión keep-alive compartida por get_token, get_data y run (ver httppool.py)
+balanz = get_session(BALANZ_URL, BALANZ_TIMEOUTS)
+
+# Pares de cada panel y mis_activos, de instruments.json (ver instruments.py)
+paneles = load_registry().prefixed("dolarMEP")
+soberanos = paneles["soberanos"].pairs
+ons = paneles["ons"].pairs
+cedears = paneles["cedears"].pairs
+provinciales = paneles["provinciales"].pairs
+mis_activos = [t for panel in paneles.values() for t in panel.tagged("mis_activos")]
 
 to_get_data = [
     [
@@ -238,28 +62,33 @@ to_get_data = [
 ]
 
 
-def get_token():
-    PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
-    CONFIG_FILE_PATH = os.path.join(PROJECT_ROOT, "config.ini")
+def load_config():
     if not os.path.exists(CONFIG_FILE_PATH):
         raise FileNotFoundError(
             f"Credentials file not found at {CONFIG_FILE_PATH}. Please create it."
         )
     config = configparser.ConfigParser()
     config.read(CONFIG_FILE_PATH)
+    return config
+
+
+def get_token():
+    config = load_config()
     usuario = config['credentials']['balanz_username']
     password = config['credentials']['balanz_password']
 
-    r = requests.post(
+    r = balanz.post(
         "https://clientes.balanz.com/api/v1/auth/init?avoidAuthRedirect=true",
+        endpoint="auth",
         headers={"Accept": "application/json"},
         json={"user": usuario, "source": "WebV2"},
     )
     data = simplejson.loads(r.text)
     nonce = data["nonce"]
 
-    r = requests.post(
+    r = balanz.post(
         "https://clientes.balanz.com/api/v1/auth/login?avoidAuthRedirect=true",
+        endpoint="auth",
         headers={"Accept": "application/json"},
         json={
             "user": usuario,
@@ -279,95 +108,139 @@ def get_token():
     return data["AccessToken"]
 
 
-def get_data(token):
-    for_df = []
-    for index in to_get_data:
-        r = requests.get(
-            index[0],
+# Token en memoria con renovación antes de vencer; token.csv solo se lee al
+# arrancar y se reescribe con cada token nuevo (ver tokens.py)
+balanz_tokens = TokenManager(
+    get_token, "Authorization", BALANZ_TOKEN_TTL, name="Balanz", path="token.csv"
+)
+
+
+def parse_panel(data, pairs):
+    """Filas de create_df para los pares de un panel, en el orden de ``pairs``."""
+    return join_pairs(quote_table(data), pairs)
+
+
+class Panel:
+    """Un panel de cotizaciones de Balanz con sus últimas filas y contadores."""
+
+    __slots__ = (
+        "name",
+        "url",
+        "pairs",
+        "rows",
+        "digest",
+        "future",
+        "requests",
+        "failures",
+        "unchanged",
+        "stale",
+        "elapsed",
+    )
+
+    def __init__(self, url, pairs):
+        self.name = urlsplit(url).path.rsplit("/cotizaciones/", 1)[-1]
+        self.url = url
+        self.pairs = pairs
+        # Hasta la primera respuesta, filas vacías: create_df mantiene el orden
+        self.rows = parse_panel([], pairs)
+        self.digest = None
+        self.future = None
+        self.requests = 0
+        self.failures = 0
+        self.unchanged = 0  # respuestas idénticas a la anterior (no se parsean)
+        self.stale = 0  # ciclos que usaron filas viejas por un request en curso
+        self.elapsed = 0.0
+
+
+panels = [Panel(url, pairs) for url, pairs in to_get_data]
+# Un hilo por panel: los requests salen juntos y el ciclo tarda lo que el más
+# lento, no la suma
+panel_pool = ThreadPoolExecutor(max_workers=len(panels), thread_name_prefix="panel")
+# [schedule] enabled = true: cada 15 s en rueda (entre 5 y 60 según cuántos
+# paneles cambian y cuánto se mueve el spread) y casi nada fuera de rueda
+scheduler = open_scheduler(15, min_interval=5, max_interval=60)
+# [dashboard] enabled = true: run() solo publica las tablas y otro hilo las
+# dibuja por diferencias (ver dashboard.py)
+display = open_dashboard("dolarMEP")
+# [store] dir = store: cotizaciones y ratios de cada ciclo a Parquet, escritos
+# desde otro hilo (ver store.py)
+store = open_store("dolarMEP")
+
+
+def fetch_panel(panel):
+    start = time.perf_counter()
+    panel.requests += 1
+    try:
+        r = balanz.get(
+            panel.url,
+            endpoint="panel",
+            tokens=balanz_tokens,
             headers={
                 "Content-Type": "application/json",
                 "Accept": "application/json",
-                "Authorization": token,
             },
         )
-        data = simplejson.loads(r.text)
-        data = data["cotizaciones"]
-
-        for instrumento in index[1]:
-            prCompraPesosCI = prVentaPesosCI = prCompraDolarCI = prVentaDolarCI = (
-                prCompraPesos
-            ) = prVentaPesos = prCompraDolar = prVentaDolar = None
-
-            # CI
-            result = list(
-                filter(
-                    lambda x: (x["ticker"] == instrumento[0] and x["plazo"] == "CI"),
-                    data,
-                )
-            )
-            if result != []:
-                prCompraPesosCI = result[0]["pc"] * 100
-                prVentaPesosCI = result[0]["pv"] * 100
-            result = list(
-                filter(
-                    lambda x: (x["ticker"] == instrumento[1] and x["plazo"] == "CI"),
-                    data,
-                )
-            )
-            if result != []:
-                prCompraDolarCI = result[0]["pc"] * 100
-                prVentaDolarCI = result[0]["pv"] * 100
-
-            # 24hs
-            result = list(
-                filter(
-                    lambda x: (x["ticker"] == instrumento[0] and x["plazo"] == "24hs"),
-                    data,
-                )
-            )
-            if result != []:
-                prCompraPesos = result[0]["pc"] * 100
-                prVentaPesos = result[0]["pv"] * 100
-            result = list(
-                filter(
-                    lambda x: (x["ticker"] == instrumento[1] and x["plazo"] == "24hs"),
-                    data,
-                )
-            )
-            if result != []:
-                prCompraDolar = result[0]["pc"] * 100
-                prVentaDolar = result[0]["pv"] * 100
-            for_df.append(
-                [
-                    instrumento[0],
-                    prCompraPesosCI,
-                    prVentaPesosCI,
-                    prCompraPesos,
-                    prVentaPesos,
-                    prCompraDolarCI,
-                    prVentaDolarCI,
-                    prCompraDolar,
-                    prVentaDolar,
-                ]
-            )
-    return for_df
+        r.raise_for_status()
+        digest = hash(r.content)
+        if digest == panel.digest:
+            panel.unchanged += 1
+            return
+        panel.rows = parse_panel(simplejson.loads(r.text)["cotizaciones"], panel.pairs)
+        panel.digest = digest
+    except Exception as e:
+        panel.failures += 1
+        print(f"Panel {panel.name}: error ({e}), se usan las últimas cotizaciones")
+    finally:
+        panel.elapsed += time.perf_counter() - start
+
+
+def get_data():
+    """
+    Pide todos los paneles en paralelo y espera hasta PANEL_DEADLINE. Un panel
+    que falla o no llega a tiempo aporta sus últimas filas; si su request sigue
+    en curso no se repite en este ciclo.
+    """
+    digests = [panel.digest for panel in panels]
+    submitted = []
+    for panel in panels:
+        if panel.future is not None and not panel.future.done():
+            panel.stale += 1
+            continue
+        panel.future = panel_pool.submit(fetch_panel, panel)
+        submitted.append(panel.future)
+    wait(submitted, timeout=PANEL_DEADLINE)
+    data = pd.concat([panel.rows for panel in panels], ignore_index=True)
+    changed = sum(p.digest != d for p, d in zip(panels, digests))
+    scheduler.observe(
+        changed,
+        relative_spread(data.prCompraPesos.to_numpy(), data.prVentaPesos.to_numpy()),
+    )
+    return data
+
+
+def format_panel_stats():
+    rows = [
+        [
+            p.name,
+            p.requests,
+            p.failures,
+            p.unchanged,
+            p.stale,
+            1e3 * p.elapsed / p.requests if p.requests else 0.0,
+        ]
+        for p in panels
+    ]
+    return tabulate(
+        rows,
+        headers=["panel", "n", "errores", "sin_cambios", "demorado", "ms"],
+        floatfmt=".1f",
+        tablefmt="simple",
+    )
 
 
 def create_df(data):
-    df = pd.DataFrame(
-        data=data,
-        columns=[
-            "ticker",
-            "prCompraPesosCI",
-            "prVentaPesosCI",
-            "prCompraPesos",
-            "prVentaPesos",
-            "prCompraDolarCI",
-            "prVentaDolarCI",
-            "prCompraDolar",
-            "prVentaDolar",
-        ],
-    )
+    """Ratios sobre las columnas float de get_data (una fila por par)."""
+    df = data
     df["USD_a_pesos"] = df.prCompraPesos / df.prVentaDolar
     df["USDCI_a_pesos"] = df.prCompraPesos / df.prVentaDolarCI
     df["pesos_a_USD"] = df.prVentaPesos / df.prCompraDolar
@@ -377,29 +250,48 @@ def create_df(data):
     df["USD_a_pesosCI"] = df.prCompraPesosCI / df.prVentaDolar
     df["pesosCI_a_USD"] = df.prVentaPesosCI / df.prCompraDolar
     df["pesosCI_a_USDCI"] = df.prVentaPesosCI / df.prCompraDolarCI
+
+    df["USDCI_a_USD"] = df.prCompraDolar / df.prVentaDolarCI
+    df["pesosCI_a_pesos"] = df.prCompraPesos / df.prVentaPesosCI
+    df["USD_a_USDCI"] = df.prCompraDolarCI / df.prVentaDolar
+    df["pesos_a_pesosCI"] = df.prCompraPesosCI / df.prVentaPesos
     # print(tabulate(df, headers="keys", tablefmt="mixed_outline"))  # type: ignore
     return df
 
 
-def run():
-    token = open("token.csv", "r").read()
-    r = requests.get(
-        "https://clientes.balanz.com/api/v1/notificaciones?avoidAuthRedirect=true",
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Authorization": token,
-        },
-    )
-    if r.status_code != 200:
-        token = get_token()
-        open("token.csv", "w").write(token)
+# Top/bottom de cada ratio entre ciclos. Las filas de create_df siguen el orden
+# fijo de to_get_data, así que cada ciclo solo reingresa las filas que cambiaron.
+RANKED_RATIOS = [r[0] for r in RATIOS + CROSS_RATIOS]
+ranking = None
+
+
+def update_ranking(df):
+    global ranking
+    if ranking is None or ranking.n != len(df):
+        ranking = RatioRanking(RANKED_RATIOS, len(df))
+    ranking.update_values(df[RANKED_RATIOS].to_numpy(dtype=float))
+    return ranking
+
+
+def run(data=None):
+    """
+    Imprime las tablas de arbitraje de un ciclo.
 
-    data = get_data(token)
+    Args:
+        data: Filas con las columnas de precio de get_data (ej. un snapshot del
+            libro en modo streaming); si no se pasa, se piden los paneles
+    """
+    if data is None:
+        data = get_data()
 
     df = create_df(data)
+    if store is not None:
+        store.record("quotes", df, PRICE_COLUMNS)
+        store.record("ratios", df, RANKED_RATIOS)
+    rk = update_ranking(df)
+    mis_ids = set(np.flatnonzero(df["ticker"].isin(mis_activos)).tolist())
 
-    print(
+    display.text(
         "\n##############################################################################################\n"
     )
 
@@ -414,78 +306,52 @@ def run():
     if pesos_a_USD_Min * ratio < max(USD_a_pesos_MAX, USDCI_a_pesos_MAX):
         # Si la condición es verdadera, verifico cual de los dos es mayor e imprimo la tabla
         if USD_a_pesos_MAX >= USDCI_a_pesos_MAX:
-            df_USD_a_p = df.sort_values(by=["USD_a_pesos"], ascending=False).iloc[0:2]
-            print("USD 24hs")
-            print(
-                tabulate(
-                    df_USD_a_p[
-                        ["ticker", "prCompraPesos", "prVentaDolar", "USD_a_pesos"]
-                    ],  # type: ignore
-                    headers="keys",
-                    tablefmt="mixed_outline",
-                    floatfmt=".2f",
-                ),
+            df_USD_a_p = df.iloc[rk.top("USD_a_pesos", 2)]
+            display.text("USD 24hs")
+            display.table(
+                df_USD_a_p[["ticker", "prCompraPesos", "prVentaDolar", "USD_a_pesos"]],
+                floatfmt=".2f",
             )
         else:
-            df_USDCI_a_p = df.sort_values(by=["USDCI_a_pesos"], ascending=False).iloc[
-                0:2
-            ]
-            print("USD CI")
-            print(
-                tabulate(
-                    df_USDCI_a_p[
-                        [
-                            "ticker",
-                            "prCompraPesos",
-                            "prVentaDolarCI",
-                            "USDCI_a_pesos",
-                        ]
-                    ],  # type: ignore
-                    headers="keys",
-                    tablefmt="mixed_outline",
-                    floatfmt=".2f",
-                ),
+            df_USDCI_a_p = df.iloc[rk.top("USDCI_a_pesos", 2)]
+            display.text("USD CI")
+            display.table(
+                df_USDCI_a_p[
+                    [
+                        "ticker",
+                        "prCompraPesos",
+                        "prVentaDolarCI",
+                        "USDCI_a_pesos",
+                    ]
+                ],
+                floatfmt=".2f",
             )
 
         # Imprimo la tabla de "pesos a USD" ya que será utilizada en cualquiera de los dos casos
-        df_p_a_USD = (
-            df[df.pesos_a_USD > 1]
-            .sort_values(by=["pesos_a_USD"], ascending=True)
-            .iloc[0:2]
-        )
-        print(
-            tabulate(
-                df_p_a_USD[["ticker", "prVentaPesos", "prCompraDolar", "pesos_a_USD"]],  # type: ignore
-                headers="keys",
-                tablefmt="mixed_outline",
-                floatfmt=".2f",
-            )
+        df_p_a_USD = df.iloc[rk.bottom("pesos_a_USD", 2)]
+        display.table(
+            df_p_a_USD[["ticker", "prVentaPesos", "prCompraDolar", "pesos_a_USD"]],
+            floatfmt=".2f",
         )
     else:
-        print("NO HAY ARBITRAJE PRINCIPAL")
+        display.text("NO HAY ARBITRAJE PRINCIPAL")
 
     # Muestro la tabla de "pesos a USDCI" solo en caso de que sea menor a "pesos a USD", ya que no es un arbitraje tan recurrente
-    df_p_a_USDCI = (
-        df[(df.pesos_a_USDCI > 1) & (df.pesos_a_USDCI < pesos_a_USD_Min)]
-        .loc[df["ticker"].isin(mis_activos), :]
-        .sort_values(by=["pesos_a_USDCI"], ascending=True)
-    ) # type: ignore
+    df_p_a_USDCI = df.iloc[
+        rk.bottom("pesos_a_USDCI", 2, below=pesos_a_USD_Min, rows=mis_ids)
+    ]
     if not df_p_a_USDCI.empty:
-        print("\nPesos a USDCI (Mis activos)")
-        print(
-            tabulate(
-                df_p_a_USDCI[
-                    ["ticker", "prVentaPesos", "prCompraDolarCI", "pesos_a_USDCI"]
-                ].iloc[0:2],  # type: ignore
-                headers="keys",
-                tablefmt="mixed_outline",
-                floatfmt=".2f",
-            ),
+        display.text("\nPesos a USDCI (Mis activos)")
+        display.table(
+            df_p_a_USDCI[
+                ["ticker", "prVentaPesos", "prCompraDolarCI", "pesos_a_USDCI"]
+            ],
+            floatfmt=".2f",
         )
     else:
-        print("No hay arbitraje Pesos a DolarCI.")
+        display.text("No hay arbitraje Pesos a DolarCI.")
 
-    print(
+    display.text(
         "-----------------------------------------CI--------------------------------------------------"
     )
 
@@ -500,169 +366,191 @@ def run():
     ):
         # Si la condición es verdadera, verifico cual de los dos USD a pesos es mayor, e imprimo la tabla
         if USDCI_a_pesosCI_MAX >= USD_a_pesosCI_MAX:
-            df_USDCI_a_pCI = df.sort_values(
-                by=["USDCI_a_pesosCI"], ascending=False
-            ).iloc[0:2]
-            print("\nUSD CI a Pesos CI")
-            print(
-                tabulate(
-                    df_USDCI_a_pCI[
-                        [
-                            "ticker",
-                            "prCompraPesosCI",
-                            "prVentaDolarCI",
-                            "USDCI_a_pesosCI",
-                        ]
-                    ],  # type: ignore
-                    headers="keys",
-                    tablefmt="mixed_outline",
-                    floatfmt=".2f",
-                ),
+            df_USDCI_a_pCI = df.iloc[rk.top("USDCI_a_pesosCI", 2)]
+            display.text("\nUSD CI a Pesos CI")
+            display.table(
+                df_USDCI_a_pCI[
+                    [
+                        "ticker",
+                        "prCompraPesosCI",
+                        "prVentaDolarCI",
+                        "USDCI_a_pesosCI",
+                    ]
+                ],
+                floatfmt=".2f",
             )
         else:
-            df_USD_a_pCI = (
-                df[df.USD_a_pesosCI > USDCI_a_pesosCI_MAX]
-                .loc[df["ticker"].isin(mis_activos), :]
-                .sort_values(by=["USD_a_pesosCI"], ascending=False)
-            ) # type: ignore
-            print("\nUSD 24hs a Pesos CI (Mis activos)")
-            print(
-                tabulate(
-                    df_USD_a_pCI[
-                        ["ticker", "prCompraPesosCI", "prVentaDolar", "USD_a_pesosCI"]
-                    ],  # type: ignore
-                    headers="keys",
-                    tablefmt="mixed_outline",
-                    floatfmt=".2f",
-                ),
+            df_USD_a_pCI = df.iloc[
+                rk.top(
+                    "USD_a_pesosCI", len(df), above=USDCI_a_pesosCI_MAX, rows=mis_ids
+                )
+            ]
+            display.text("\nUSD 24hs a Pesos CI (Mis activos)")
+            display.table(
+                df_USD_a_pCI[
+                    ["ticker", "prCompraPesosCI", "prVentaDolar", "USD_a_pesosCI"]
+                ],
+                floatfmt=".2f",
             )
 
         # Si la condición es verdadera, verifico cual de los dos pesos a USD es menor e imprimo la tabla
         if pesosCI_a_USDCI_Min <= pesosCI_a_USD_Min:
-            df_pCI_a_USDCI = (
-                df[df.pesosCI_a_USDCI > 1]
-                .sort_values(by=["pesosCI_a_USDCI"], ascending=True)
-                .iloc[0:2]
-            )
-            print("\nPesos CI a USD CI")
-            print(
-                tabulate(
-                    df_pCI_a_USDCI[
-                        [
-                            "ticker",
-                            "prVentaPesosCI",
-                            "prCompraDolarCI",
-                            "pesosCI_a_USDCI",
-                        ]
-                    ],  # type: ignore
-                    headers="keys",
-                    tablefmt="mixed_outline",
-                    floatfmt=".2f",
-                ),
+            df_pCI_a_USDCI = df.iloc[rk.bottom("pesosCI_a_USDCI", 2)]
+            display.text("\nPesos CI a USD CI")
+            display.table(
+                df_pCI_a_USDCI[
+                    [
+                        "ticker",
+                        "prVentaPesosCI",
+                        "prCompraDolarCI",
+                        "pesosCI_a_USDCI",
+                    ]
+                ],
+                floatfmt=".2f",
             )
         else:
-            df_pCI_a_USD = df[df.pesosCI_a_USD > 1].sort_values(
-                by=["pesosCI_a_USD"], ascending=True
-            )
-            print("\nPesos CI a USD 24hs")
-            print(
-                tabulate(
-                    df_pCI_a_USD[
-                        [
-                            "ticker",
-                            "prVentaPesosCI",
-                            "prCompraDolar",
-                            "pesosCI_a_USD",
-                        ]
-                    ].iloc[0:3],  # type: ignore
-                    headers="keys",
-                    tablefmt="mixed_outline",
-                    floatfmt=".2f",
-                ),
+            df_pCI_a_USD = df.iloc[rk.bottom("pesosCI_a_USD", 3)]
+            display.text("\nPesos CI a USD 24hs")
+            display.table(
+                df_pCI_a_USD[
+                    [
+                        "ticker",
+                        "prVentaPesosCI",
+                        "prCompraDolar",
+                        "pesosCI_a_USD",
+                    ]
+                ],
+                floatfmt=".2f",
             )
 
     else:
-        print("NO HAY ARBITRAJE EN CI")
+        display.text("NO HAY ARBITRAJE EN CI")
 
-    print(
+    display.text(
         "---------------------------------------------------------------------------------------------"
     )
 
-    df_dolares = df.copy()[
-        (df.prVentaDolarCI < df.prCompraDolar) & (df.prVentaDolarCI > 1)
-    ]
-    df_dolares["%"] = ((df_dolares.prCompraDolar / df_dolares.prVentaDolarCI) - 1) * 100
+    df_dolares = df.iloc[rk.top("USDCI_a_USD", len(df), above=1)]
+    df_dolares = df_dolares.assign(**{"%": (df_dolares.USDCI_a_USD - 1) * 100})
     if not df_dolares.empty:
-        print(
-            tabulate(
-                df_dolares[["ticker", "prVentaDolarCI", "prCompraDolar", "%"]],  # type: ignore
-                headers="keys",
-                tablefmt="mixed_outline",
-            )
-        )
+        display.table(df_dolares[["ticker", "prVentaDolarCI", "prCompraDolar", "%"]])
     else:
-        print("No hay arbitraje DolarCI por Dolar.")
+        display.text("No hay arbitraje DolarCI por Dolar.")
 
-    df_pesos = df.copy()[
-        (df.prVentaPesosCI < df.prCompraPesos) & (df.prVentaPesosCI > 1)
-    ]
-    df_pesos["%"] = ((df_pesos.prCompraPesos / df_pesos.prVentaPesosCI) - 1) * 36500
+    df_pesos = df.iloc[rk.top("pesosCI_a_pesos", 2, above=1)]
+    df_pesos = df_pesos.assign(**{"%": (df_pesos.pesosCI_a_pesos - 1) * 36500})
     if not df_pesos.empty:
-        print(
-            tabulate(
-                df_pesos[["ticker", "prVentaPesosCI", "prCompraPesos", "%"]]
-                .sort_values(by=["%"], ascending=False)
-                .iloc[0:2],  # type: ignore
-                headers="keys",
-                tablefmt="mixed_outline",
-                floatfmt=".5f",
-            )
+        display.table(
+            df_pesos[["ticker", "prVentaPesosCI", "prCompraPesos", "%"]], floatfmt=".5f"
         )
     else:
-        print("No hay arbitraje PesosCI por Pesos.")
+        display.text("No hay arbitraje PesosCI por Pesos.")
 
-    print(
+    display.text(
         "---------------------------------------------------------------------------------------------"
     )
 
-    df_dolares = df.copy()[
-        (df.prVentaDolar < df.prCompraDolarCI) & (df.prVentaDolar > 1)
-    ].loc[df["ticker"].isin(mis_activos), :]
-    df_dolares["%"] = ((df_dolares.prCompraDolarCI / df_dolares.prVentaDolar) - 1) * 100
+    df_dolares = df.iloc[rk.top("USD_a_USDCI", len(df), above=1, rows=mis_ids)]
+    df_dolares = df_dolares.assign(**{"%": (df_dolares.USD_a_USDCI - 1) * 100})
     if not df_dolares.empty:
-        print(
-            tabulate(
-                df_dolares[["ticker", "prVentaDolar", "prCompraDolarCI", "%"]],  # type: ignore
-                headers="keys",
-                tablefmt="mixed_outline",
-            )
-        )
+        display.table(df_dolares[["ticker", "prVentaDolar", "prCompraDolarCI", "%"]])
     else:
-        print("No hay arbitraje Dolar a DolarCI.")
+        display.text("No hay arbitraje Dolar a DolarCI.")
 
-    df_pesos = df.copy()[
-        (df.prVentaPesos < df.prCompraPesosCI) & (df.prVentaPesos > 1)
-    ].loc[df["ticker"].isin(mis_activos), :]
-    df_pesos["%"] = ((df_pesos.prCompraPesosCI / df_pesos.prVentaPesos) - 1) * 100
+    df_pesos = df.iloc[rk.top("pesos_a_pesosCI", len(df), above=1, rows=mis_ids)]
+    df_pesos = df_pesos.assign(**{"%": (df_pesos.pesos_a_pesosCI - 1) * 100})
     if not df_pesos.empty:
-        print(
-            tabulate(
-                df_pesos[["ticker", "prVentaPesos", "prCompraPesosCI", "%"]],  # type: ignore
-                headers="keys",
-                tablefmt="mixed_outline",
-            )
-        )
+        display.table(df_pesos[["ticker", "prVentaPesos", "prCompraPesosCI", "%"]])
     else:
-        print("No hay arbitraje Pesos a PesosCI.")
+        display.text("No hay arbitraje Pesos a PesosCI.")
 
-    print(
+    display.text(
         "\n##############################################################################################\n"
     )
+    display.flush()
 
 
-while True:
-    run()
-    time.sleep(15)
+##############################################################################################
+# Modo streaming: con "[marketdata] source = matriz" en config.ini las mismas
+# tablas salen del websocket de Matriz (los mismos pares de to_get_data, CI y
+# 24hs) y run() se vuelve a evaluar con cada lote de ticks que cambia el
+# máximo o mínimo de algún ratio, en lugar de cada 15 segundos.
+
+stream_pairs = [pair for _, pairs in to_get_data for pair in pairs]
+# Ratios que run() solo mira entre mis activos
+MIS_ACTIVOS_RATIOS = ["USD_a_pesosCI", "pesos_a_USDCI", "USD_a_USDCI", "pesos_a_pesosCI"]
+
+
+def open_stream(config):
+    """
+    Libro de puntas de stream_pairs alimentado por el websocket de Matriz.
+
+    Returns:
+        Tuple[QuoteBook, AsyncMarketDataClient]: El cliente todavía sin iniciar
+    """
+    book = QuoteBook([pair[0] for pair in stream_pairs], PRICE_COLUMNS)
+    parser = TopicParser(book, stream_pairs)
+    session_id = config["credentials"]["matriz_session_id"]
+    conn_id = config["credentials"]["matriz_conn_id"]
+    url = config.get(
+        "endpoints",
+        "matriz_ws_url",
+        fallback=f"{MATRIZ_WS_URL}?session_id={session_id}&conn_id={conn_id}",
+    )
+    client = AsyncMarketDataClient(
+        url,
+        MatrizDialect(parser),
+        shards=config.getint("marketdata", "shards", fallback=DEFAULT_SHARDS),
+        recorder=open_recorder("dolarMEP"),
+    )
+    return book, client
+
+
+def stream(book):
+    """Corre run() sobre cada snapshot del libro que mueve un extremo."""
+    mis_ids = [book.ids[t] for t in mis_activos if t in book.ids]
+    evaluator = RatioEvaluator(
+        book, restricted={name: mis_ids for name in MIS_ACTIVOS_RATIOS}
+    )
+    labels = {"ticker": book.keys}
+    while True:
+        if not book.wait(timeout=STREAM_WAIT):
+            continue
+        with book.snapshot() as snap:
+            if evaluator.refresh(snap):
+                run(snap.frame(labels))
+
+
+config = configparser.ConfigParser()
+config.read(CONFIG_FILE_PATH)
+if config.get("marketdata", "source", fallback="balanz") == "matriz":
+    book, client = open_stream(config)
+    client.start()
+    try:
+        stream(book)
+    except KeyboardInterrupt:
+        display.close()
+        client.stop()
+        print(client.stats())
+        if store is not None:
+            store.close()
+            print(f"Store: {store.stats()}")
+else:
+    balanz.prewarm(BALANZ_URL, connections=1)
+    balanz_tokens.start()
+    try:
+        while True:
+            if scheduler.is_open():
+                run()
+            scheduler.sleep()
+    except KeyboardInterrupt:
+        display.close()
+        print(format_panel_stats())
+        print(f"Cadencia: {scheduler.stats()}")
+        print(format_all_stats())
+        if store is not None:
+            store.close()
+            print(f"Store: {store.stats()}")
 
 ##############################################################################################
 
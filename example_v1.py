@@ -1,15 +1,38 @@
-import requests
 import base64
 import json
 import time
 import threading
 import websocket
 from datetime import datetime
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Mapping, Optional, Set
 import logging
 import os
 import configparser
-import copy
+
+import requests
+
+from httppool import (
+    KEEPALIVE_INTERVAL,
+    PRIMARY_TIMEOUTS,
+    format_all_stats,
+    get_session,
+)
+from instruments import get_universe
+from latency import LatencyTracer, now_ns
+from legs import LegExecutor, order_report
+from mdparser import Target, TopicParser
+from ordermanager import (
+    HEDGE_WORKING,
+    LEG1_WORKING,
+    Arbitrage,
+    ArbitrageResult,
+    OrderManager,
+)
+from orderstream import WS_URL, OrderReportClient, OrderTracker
+from quotebook import TOP_24HS_COLUMNS, QuoteBook, Snapshot
+from scheduler import open_scheduler
+from tape import TapeWriter, open_recorder
+from tokens import PRIMARY_TOKEN_TTL, TokenManager
 
 # ====================== CONSTANTES ======================
 DEFAULT_API_URL = "https://api.cocos.xoms.com.ar"
@@ -21,6 +44,9 @@ WEBSOCKET_RECONNECT_DELAY = 5
 ARBITER_RATIO = 1.0006
 AL30_MAX_QUANT_DEFAULT = 2000
 UPDATE_SLEEP_INTERVAL = 3
+LATENCY_REPORT_INTERVAL = 60
+HTTP_CONNECTIONS = 4  # conexiones keep-alive precalentadas a la API
+ORDER_REPORT_WAIT = 1.0  # segundos esperando que una orden llene o termine
 
 
 logging.basicConfig(
@@ -53,25 +79,43 @@ class CocosMatrizClient:
         self.basic_auth = base64.b64encode(
             f"{username}:{password}".encode()
         ).decode()  # Para endpoints de riesgo
+        # Sesión keep-alive compartida con conexiones abiertas de antemano,
+        # una por orden que puede salir a la vez: el envío no paga el TLS
+        self.http = get_session(self.base_url, PRIMARY_TIMEOUTS)
+        # Token en memoria renovado antes de las 24 h; un 401 fuerza otro
+        self.tokens = TokenManager(
+            self._fetch_token, "X-Auth-Token", PRIMARY_TOKEN_TTL, name="Primary"
+        )
+        self.tokens.listeners.append(self._set_token)
         self.login()
+        self.tokens.start()
+        self.http.prewarm(
+            self.base_url, connections=HTTP_CONNECTIONS, keepalive=KEEPALIVE_INTERVAL
+        )
 
-    def login(self) -> bool:
-        """Login a la Primary API"""
+    def _fetch_token(self) -> str:
+        """Pide un token nuevo (lo usa el TokenManager)."""
         url = f"{self.base_url}/auth/getToken"
         headers = {"X-Username": self.username, "X-Password": self.password}
+        response = self.http.post(
+            url, endpoint="login", headers=headers, timeout=AUTH_TIMEOUT
+        )
+        response.raise_for_status()
+        token = response.headers.get("X-Auth-Token")
+        if not token:
+            raise ValueError("no se recibió token")
+        return token
+
+    def _set_token(self, token: str) -> None:
+        self.token = token
+        self.headers["X-Auth-Token"] = token
+
+    def login(self) -> bool:
+        """Login a la Primary API"""
         try:
-            response = requests.post(url, headers=headers, timeout=AUTH_TIMEOUT)
-            response.raise_for_status()
-            self.token = response.headers.get("X-Auth-Token")
-            if self.token:
-                self.headers["X-Auth-Token"] = self.token
-                logger.info(
-                    f"✅ Login exitoso - Token válido por 24h: {datetime.now()}"
-                )
-                return True
-            else:
-                logger.error("❌ Login falló: no se recibió token")
-                return False
+            self.tokens.refresh()
+            logger.info(f"✅ Login exitoso - Token válido por 24h: {datetime.now()}")
+            return True
         except Exception as e:
             logger.error(f"❌ Error en login: {e}")
             return False
@@ -104,9 +148,18 @@ class CocosMatrizClient:
         if price is not None:
             params["price"] = str(price)
 
-        r = requests.get(
-            url, headers=self.headers, params=params
-        )  # La mayoría de endpoints de Primary usan GET + query params
+        try:
+            r = self.http.get(
+                url,
+                endpoint="send_order",
+                headers=self.headers,
+                tokens=self.tokens,
+                params=params,
+            )  # La mayoría de endpoints de Primary usan GET + query params
+        except requests.RequestException as e:
+            # Sin respuesta la orden puede haber quedado viva en el broker
+            logger.error(f"❌ Envío sin respuesta, conciliar la orden {params}: {e}")
+            return {"error": str(e)}
         return r.json() if r.ok else {"error": r.text}
 
     def get_orders_by_clor_id(
@@ -119,22 +172,43 @@ class CocosMatrizClient:
             "clOrdId": clorId,
             "proprietary": proprietary,
         }  # En doc es accountId, pero asumimos string
-        r = requests.get(url, headers=self.headers, params=params)
+        try:
+            r = self.http.get(
+                url,
+                endpoint="order_status",
+                headers=self.headers,
+                tokens=self.tokens,
+                params=params,
+            )
+        except requests.RequestException as e:
+            return {"error": str(e)}
         return r.json() if r.ok else {"error": r.text}
 
     def cancel_order(self, cl_ord_id: str, proprietary: str) -> Dict:
         """Cancelar orden por clOrdId"""
         url = f"{self.base_url}/rest/order/cancelById"
         params = {"clOrdId": cl_ord_id, "proprietary": proprietary}
-        r = requests.get(url, headers=self.headers, params=params)
+        try:
+            r = self.http.get(
+                url,
+                endpoint="cancel_order",
+                headers=self.headers,
+                tokens=self.tokens,
+                params=params,
+            )
+        except requests.RequestException as e:
+            return {"error": str(e)}
         return r.json() if r.ok else {"error": r.text}
 
 
 class WebSocketClient:
-    def __init__(self, url, dataManager, instrumentos):
+    def __init__(
+        self, url, dataManager, instrumentos, recorder: Optional[TapeWriter] = None
+    ):
         self.url = url
         self.dataManager = dataManager
         self.instrumentos = instrumentos
+        self.recorder = recorder  # graba los frames crudos (ver tape.py)
 
     def connect(self):
         # websocket.enableTrace(True)
@@ -153,20 +227,16 @@ class WebSocketClient:
         return wst
 
     def on_message(self, ws, message):
-        data = []
-        if message[0] != "X":
-            if message[0] == "M":
-                data.append(message)
-            else:
-                try:
-                    data = json.loads(message)
-                except json.JSONDecodeError as e:
-                    logger.warning(f"❌ JSON Decode Error: {e}")
-                    return
-        else:
+        received = now_ns()
+        if self.recorder is not None:
+            self.recorder.write(message)
+        if message[0] == "X":
             logger.warning("Message is not market data")
             return
-        self.dataManager.update_instrument_data(data)
+        try:
+            self.dataManager.update_frame(message, received)
+        except json.JSONDecodeError as e:
+            logger.warning(f"❌ JSON Decode Error: {e}")
 
     def on_error(self, ws, error):
         logger.error("Error: " + str(error))
@@ -182,41 +252,46 @@ class WebSocketClient:
         ws.send(self.create_subscription_message())
 
     def create_subscription_message(self):
-        aux = [
-            "md.bm_MERV_{0}_24hs".format(inst["ticker"]) for inst in self.instrumentos
-        ] + [
-            "md.bm_MERV_{0}_24hs".format(inst["tickerD"]) for inst in self.instrumentos
-        ]
-        return (
-            '{"_req":"S","topicType":"md","topics":'
-            + str(aux).replace(" ", "").replace("'", '"')
-            + ',"replace":false}'
-        )
+        return self.dataManager.parser.subscription_message()
 
     def stop_websocket(self):
         if self.ws:
             self.ws.close()
             logger.info("WebSocket detenido")
         self.ws = None
+        if self.recorder is not None:
+            self.recorder.close()
 
 
 class DataManager:
     """Gerencia datos de instrumentos actualizados desde el WebSocket."""
 
-    def __init__(self, instrumentos: List[Dict]) -> None:
+    def __init__(
+        self,
+        instrumentos: List[Dict],
+        tracer: Optional[LatencyTracer] = None,
+        targets: Optional[Mapping[str, Target]] = None,
+    ) -> None:
         """
         Inicializa el gerenciador de datos.
 
         Args:
             instrumentos: Lista de instrumentos a monitorear
+            tracer: Histogramas de latencia por etapa (opcional)
+            targets: Tópicos ya compilados por instruments.py (Universe.topics)
         """
-        # Crear índices para acceso rápido O(1)
-        self.instrumentos_by_ticker = {
-            inst["ticker"]: inst for inst in instrumentos
-        }
-        self.instrumentos_by_tickerD = {
-            inst["tickerD"]: inst for inst in instrumentos
-        }
+        self.instrumentos = instrumentos
+        self.tracer = tracer
+        self.book = QuoteBook(
+            [inst["ticker"] for inst in instrumentos], TOP_24HS_COLUMNS
+        )
+        # Tabla precompilada tópico → (fila, columnas) para acceso O(1)
+        self.parser = TopicParser(
+            self.book,
+            [(inst["ticker"], inst["tickerD"]) for inst in instrumentos],
+            plazos=("24hs",),
+            targets=targets,
+        )
 
     def update_instrument_data(self, data: List) -> None:
         """
@@ -225,44 +300,202 @@ class DataManager:
         Args:
             data: Lista de mensajes del WebSocket con datos de mercado
         """
-        for record in data:
-            values = str(record).split("|")
-            # Normalizar valores vacíos
-            values[3] = values[3] if values[3] else "-100"
-            values[4] = values[4] if values[4] else "-100"
+        self.parser.apply_records(data)
 
-            if "_24hs" not in values[0]:
-                continue
+    def update_frame(self, message: str, received: Optional[int] = None) -> None:
+        """
+        Actualiza datos a partir de un frame crudo del WebSocket.
 
-            ticker = (
-                values[0].removeprefix("M:bm_MERV_").removesuffix("_24hs")
-            )
+        Args:
+            message: Registro suelto ("M:...") o array JSON de registros
+            received: Estampa de recepción (latency.now_ns) para el tracer
+        """
+        if self.tracer is None:
+            self.parser.apply_frame(message)
+            return
+        if received is None:
+            received = now_ns()
+        ticks = self.parser.decode_frame(message)
+        parsed = now_ns()
+        write = self.parser.write
+        for tick in ticks:
+            write(tick)
+        self.tracer.frame(received, parsed, self.book.commit())
 
-            # Actualizar por ticker de pesos
-            if ticker in self.instrumentos_by_ticker:
-                inst = self.instrumentos_by_ticker[ticker]
-                inst["prCompraPesos"] = float(values[3])
-                inst["prVentaPesos"] = float(values[4])
-                inst["siCompraPesos"] = (
-                    float(values[2]) if values[2] else None
-                )
-                inst["siVentaPesos"] = float(values[5]) if values[5] else None
-
-            # Actualizar por ticker de dólares
-            elif ticker in self.instrumentos_by_tickerD:
-                inst = self.instrumentos_by_tickerD[ticker]
-                inst["prCompraDolar"] = float(values[3])
-                inst["prVentaDolar"] = float(values[4])
-                inst["siCompraDolar"] = (
-                    float(values[2]) if values[2] else None
-                )
-                inst["siVentaDolar"] = float(values[5]) if values[5] else None
+    def snapshot(self) -> Snapshot:
+        """Último snapshot coherente del libro (liberar con release o with)."""
+        return self.book.snapshot()
 
 
 class Executer:
-    def __init__(self, account, client: CocosMatrizClient):
+    def __init__(
+        self,
+        account,
+        client: CocosMatrizClient,
+        tracer: Optional[LatencyTracer] = None,
+        concurrent_legs: bool = False,
+        orders: Optional[OrderTracker] = None,
+        manager: Optional[OrderManager] = None,
+    ):
         self.account = account
         self.client = client
+        self.tracer = tracer  # estampas de latencia (ver latency.py)
+        self.trace = None  # oportunidad en curso
+        # Arbitrajes en paralelo sin bloquear la estrategia (ver ordermanager.py)
+        self.manager = manager
+        self._local = threading.local()  # arbitraje del hilo que envía órdenes
+        # Estado de órdenes por execution reports (ver orderstream.py)
+        self.orders = orders
+        # Patas y cobertura en paralelo en vez de encadenadas (ver legs.py)
+        self.legs = (
+            LegExecutor(
+                client, account, send=self._send_order, status=self._order_status
+            )
+            if concurrent_legs
+            else None
+        )
+
+    def _arbitrar(
+        self, item: Dict, quant: int, al30: Dict, quant_al30: int, dolarizar: bool
+    ) -> ArbitrageResult:
+        """Arbitraje con sus patas y la cobertura con AL30 enviadas juntas."""
+        success, price_ratio, price_ratio_al30 = self.legs.arbitrage(
+            item, quant, al30, quant_al30, dolarizar=dolarizar
+        )
+        operacion = "dolarizó" if dolarizar else "pesificó"
+        logger.info(
+            f"✅ Se {operacion} {item['ticker']} a: {price_ratio:.4f}"
+            if success and price_ratio
+            else f"❌ No se obtuvo price ratio con {item['ticker']}."
+        )
+        if price_ratio_al30:
+            logger.info(f"✅ Cobertura con AL30 a: {price_ratio_al30:.4f}")
+        return success, price_ratio, price_ratio_al30
+
+    def _send_order(self, **kwargs) -> Dict:
+        """send_order estampando envío y respuesta si hay tracer."""
+        if self.tracer is None:
+            return self.client.send_order(**kwargs)
+        arb = getattr(self._local, "arb", None)
+        sent = self.tracer.sent(arb.trace if arb is not None else self.trace)
+        response = self.client.send_order(**kwargs)
+        self.tracer.acked(sent)
+        return response
+
+    def _order_status(self, cl_ord_id: str, proprietary: str) -> Dict:
+        """
+        Estado de una orden, con la misma forma que get_orders_by_clor_id.
+
+        Con el stream de execution reports conectado espera hasta
+        ORDER_REPORT_WAIT a que la orden llene o termine, sin REST; si no hay
+        stream o no llegó ningún report de la orden, consulta por REST.
+        """
+        response = None
+        if self.orders is not None and self.orders.connected:
+            report = self.orders.wait(cl_ord_id, ORDER_REPORT_WAIT)
+            if report is not None:
+                response = {"order": report}
+            else:
+                logger.warning(f"Sin execution report de {cl_ord_id}; consulta REST")
+        if response is None:
+            response = self.client.get_orders_by_clor_id(cl_ord_id, proprietary)
+        arb = getattr(self._local, "arb", None)
+        if arb is not None:
+            arb.on_report(order_report(response))
+        return response
+
+    def _secuencial(
+        self,
+        item: Dict,
+        quant: int,
+        al30: Dict,
+        quant_al30: int,
+        dolarizar: bool,
+        arb: Optional[Arbitrage] = None,
+    ) -> ArbitrageResult:
+        """
+        Conversión con ``item`` y después la inversa con AL30, orden por orden.
+
+        Args:
+            arb: Arbitraje del OrderManager cuyo estado se avanza, si lo hay
+
+        Returns:
+            ArbitrageResult: (se ejecutaron conversión y cobertura, ratio,
+            ratio de AL30)
+        """
+        if arb is not None:
+            arb.advance(LEG1_WORKING)
+        if dolarizar:
+            success, price_ratio = self.dolarizar(item, quant)
+            logger.info(
+                f"✅ Se dolarizó a: {price_ratio:.4f}"
+                if price_ratio
+                else "❌ No se obtuvo price ratio en dolarización."
+            )
+            logger.info("COMPRAR AL30 EN DOLARES")
+            logger.info("VENDER AL30 EN PESOS")
+        else:
+            success, price_ratio = self.pesificar(item, quant)
+            logger.info(
+                f"✅ Se pesificó a: {price_ratio:.4f}"
+                if price_ratio
+                else "❌ No se obtuvo price ratio en pesificación."
+            )
+            logger.info("COMPRAR AL30 EN PESOS")
+            logger.info("VENDER AL30 EN DOLARES")
+
+        operacion = "dolarización" if dolarizar else "pesificación"
+        if not success:
+            logger.warning(
+                f"No se ejecutó la parte de AL30 porque la {operacion} no se ejecutó."
+            )
+            return False, price_ratio, None
+
+        if arb is not None:
+            arb.advance(HEDGE_WORKING)
+        cubrir = self.pesificar if dolarizar else self.dolarizar
+        success2, price_ratio2 = cubrir(al30, quant_al30, order_type="MARKET")
+        cobertura = "pesific" if dolarizar else "dolariz"
+        logger.info(
+            f"✅ Se {cobertura}ó a: {price_ratio2:.4f}"
+            if price_ratio2
+            else f"❌ No se obtuvo price ratio en {cobertura}ación."
+        )
+        return success2, price_ratio, price_ratio2
+
+    def _lanzar(
+        self, item: Dict, quant: int, al30: Dict, quant_al30: int, dolarizar: bool
+    ) -> Optional[Arbitrage]:
+        """
+        Lanza el arbitraje en el OrderManager y vuelve sin esperar las órdenes.
+
+        Returns:
+            Optional[Arbitrage]: None si lo impidieron la exclusividad por ticker
+            o los límites de exposición
+        """
+        # Copias: el snapshot del libro se libera cuando vuelve execute
+        item, al30 = dict(item), dict(al30)
+        precio = item["prVentaPesos"] if dolarizar else item["prCompraPesos"]
+
+        def run(arb: Arbitrage) -> ArbitrageResult:
+            self._local.arb = arb
+            try:
+                if self.legs is not None:
+                    arb.advance(LEG1_WORKING)
+                    return self._arbitrar(item, quant, al30, quant_al30, dolarizar)
+                return self._secuencial(item, quant, al30, quant_al30, dolarizar, arb)
+            finally:
+                self._local.arb = None
+
+        return self.manager.submit(  # type: ignore
+            item["ticker"],
+            dolarizar,
+            quant,
+            quant_al30,
+            quant * (precio or 0),
+            run,
+            self.trace,
+        )
 
     @staticmethod
     def _calculate_ratios(instrumentos: List[Dict]) -> None:
@@ -312,6 +545,8 @@ class Executer:
         ) 
 
         for item in instrumentos:
+            if self.manager is not None and self.manager.busy(item["ticker"]):
+                continue  # ya hay un arbitraje en curso con este instrumento
             if item["pesos_a_USD"] is None or item["pesos_a_USD"] <= 1:
                 continue
             else:
@@ -319,11 +554,15 @@ class Executer:
                     if item["ticker"] not in dolarizadores:
                         dolarizadores.add(item["ticker"])
                         continue
-                    logger.info(json.dumps(item, indent=2, ensure_ascii=False))
-                    quant = min(
-                        item["siCompraDolar"],
-                        item["siVentaPesos"],
-                        item["max_quant"],
+                    if self.tracer is not None:
+                        self.trace = self.tracer.signal(item)
+                    logger.info(json.dumps(dict(item), indent=2, ensure_ascii=False))
+                    quant = int(
+                        min(
+                            item["siCompraDolar"],
+                            item["siVentaPesos"],
+                            item["max_quant"],
+                        )
                     )
 
                     amount = quant * item["prCompraDolar"]
@@ -340,28 +579,14 @@ class Executer:
                     logger.info(
                         f"Se dolarizaria a un precio de {item['pesos_a_USD']:.2f} pesos por dólar"
                     )
-                    success, price_ratio = self.dolarizar(item, quant)
-                    logger.info(
-                        f"✅ Se dolarizó a: {price_ratio:.4f}"
-                        if price_ratio
-                        else "❌ No se obtuvo price ratio en dolarización."
-                    )
-
-                    logger.info("COMPRAR AL30 EN DOLARES")
-                    logger.info("VENDER AL30 EN PESOS")
-                    if success:
-                        success2, price_ratio2 = self.pesificar(
-                            al30, quant_al30, order_type="MARKET"
-                        )
-                        logger.info(
-                            f"✅ Se pesificó a: {price_ratio2:.4f}"
-                            if price_ratio2
-                            else "❌ No se obtuvo price ratio en pesificación."
-                        )
-                    else:
-                        logger.warning(
-                            "No se ejecutó la parte de AL30 porque la dolarización no se ejecutó."
-                        )
+                    if self.manager is not None:
+                        # Sigue evaluando señales mientras trabajan las órdenes
+                        self._lanzar(item, quant, al30, quant_al30, dolarizar=True)
+                        continue
+                    if self.legs is not None:
+                        self._arbitrar(item, quant, al30, quant_al30, dolarizar=True)
+                        return
+                    self._secuencial(item, quant, al30, quant_al30, dolarizar=True)
                     return  # Ejecutar solo una operación por ciclo.
                 else:
                     if item["ticker"] in dolarizadores:
@@ -374,11 +599,15 @@ class Executer:
                     if item["ticker"] not in pesificadores:
                         pesificadores.add(item["ticker"])
                         continue
-                    logger.info(json.dumps(item, indent=2, ensure_ascii=False))
-                    quant = min(
-                        item["siVentaDolar"],
-                        item["siCompraPesos"],
-                        item["max_quant"],
+                    if self.tracer is not None:
+                        self.trace = self.tracer.signal(item)
+                    logger.info(json.dumps(dict(item), indent=2, ensure_ascii=False))
+                    quant = int(
+                        min(
+                            item["siVentaDolar"],
+                            item["siCompraPesos"],
+                            item["max_quant"],
+                        )
                     )
 
                     amount = quant * item["prVentaDolar"]
@@ -395,28 +624,14 @@ class Executer:
                     logger.info(
                         f"Se pesificaria a un precio de {item['USD_a_pesos']:.2f} pesos por dólar"
                     )
-                    success, price_ratio = self.pesificar(item, quant)
-                    logger.info(
-                        f"✅ Se pesificó a: {price_ratio:.4f}"
-                        if price_ratio
-                        else "❌ No se obtuvo price ratio en pesificación."
-                    )
-
-                    logger.info("COMPRAR AL30 EN PESOS")
-                    logger.info("VENDER AL30 EN DOLARES")
-                    if success:
-                        success2, price_ratio2 = self.dolarizar(
-                            al30, quant_al30, order_type="MARKET"
-                        )
-                        logger.info(
-                            f"✅ Se dolarizó a: {price_ratio2:.4f}"
-                            if price_ratio2
-                            else "❌ No se obtuvo price ratio en dolarización."
-                        )
-                    else:
-                        logger.warning(
-                            "No se ejecutó la parte de AL30 porque la pesificación no se ejecutó."
-                        )
+                    if self.manager is not None:
+                        # Sigue evaluando señales mientras trabajan las órdenes
+                        self._lanzar(item, quant, al30, quant_al30, dolarizar=False)
+                        continue
+                    if self.legs is not None:
+                        self._arbitrar(item, quant, al30, quant_al30, dolarizar=False)
+                        return
+                    self._secuencial(item, quant, al30, quant_al30, dolarizar=False)
                     return  # Ejecutar solo una operación por ciclo.
                 if item["ticker"] in pesificadores:
                     logger.info(f"Eliminando {item['ticker']} de pesificadores.")
@@ -426,7 +641,7 @@ class Executer:
         price_ratio = None
         first_price, second_price = None, None
         # Enviar orden de compra en pesos
-        orden_response = self.client.send_order(
+        orden_response = self._send_order(
             symbol=f"MERV - XMEV - {dolarizador['ticker']} - 24hs",  # Ticker D para dólares
             side="BUY",
             quantity=quant,
@@ -451,7 +666,7 @@ class Executer:
             logger.error("No se obtuvo clOrdId o proprietary.")
             return False, price_ratio
 
-        orden_encontrada = self.client.get_orders_by_clor_id(cl_ord_id, prop)
+        orden_encontrada = self._order_status(cl_ord_id, prop)
 
         status = orden_encontrada.get("order", {}).get("status")
         cum_qty = orden_encontrada.get("order", {}).get("cumQty", 0)
@@ -468,7 +683,7 @@ class Executer:
             logger.info(f"Orden de compra filled con cumQty={cum_qty}")
             first_price = orden_encontrada.get("order", {}).get("avgPx")
             # Enviar orden complementaria de venta en dolares por la cantidad filled
-            comp_response = self.client.send_order(
+            comp_response = self._send_order(
                 symbol=f"MERV - XMEV - {dolarizador['tickerD']} - 24hs",
                 side="SELL",
                 quantity=cum_qty,
@@ -490,7 +705,7 @@ class Executer:
                 logger.info(
                     f"Orden de venta en dólares enviada → clOrdId={comp_cl_ord_id}, proprietary={comp_prop}"
                 )
-                comp_orden_encontrada = self.client.get_orders_by_clor_id(
+                comp_orden_encontrada = self._order_status(
                     comp_cl_ord_id, comp_prop
                 )
                 second_price = comp_orden_encontrada.get("order", {}).get("avgPx")
@@ -512,7 +727,7 @@ class Executer:
         price_ratio = None
         first_price, second_price = None, None
         # Enviar orden de compra en dólares
-        orden_response = self.client.send_order(
+        orden_response = self._send_order(
             symbol=f"MERV - XMEV - {pesificador['tickerD']} - 24hs",  # Ticker D para dólares
             side="BUY",
             quantity=quant,
@@ -537,7 +752,7 @@ class Executer:
             logger.error("No se obtuvo clOrdId o proprietary.")
             return False, price_ratio
 
-        orden_encontrada = self.client.get_orders_by_clor_id(cl_ord_id, prop)
+        orden_encontrada = self._order_status(cl_ord_id, prop)
 
         status = orden_encontrada.get("order", {}).get("status")
         cum_qty = orden_encontrada.get("order", {}).get("cumQty", 0)
@@ -554,7 +769,7 @@ class Executer:
             logger.info(f"Orden de compra filled con cumQty={cum_qty}")
             first_price = orden_encontrada.get("order", {}).get("avgPx")
             # Enviar orden complementaria de venta en pesos por la cantidad filled
-            comp_response = self.client.send_order(
+            comp_response = self._send_order(
                 symbol=f"MERV - XMEV - {pesificador['ticker']} - 24hs",
                 side="SELL",
                 quantity=cum_qty,
@@ -576,7 +791,7 @@ class Executer:
                 logger.info(
                     f"Orden de venta en pesos enviada → clOrdId={comp_cl_ord_id}, proprietary={comp_prop}"
                 )
-                comp_orden_encontrada = self.client.get_orders_by_clor_id(
+                comp_orden_encontrada = self._order_status(
                     comp_cl_ord_id, comp_prop
                 )
                 second_price = comp_orden_encontrada.get("order", {}).get("avgPx")
@@ -625,32 +840,11 @@ def create_instrument(ticker: str, tickerD: str, max_quant: int = 200) -> Dict:
 
 # ====================== MAIN ======================
 if __name__ == "__main__":
+    # Pares y max_quant de instruments.json (ver instruments.py)
+    universe = get_universe("example_v1")
     instrumentos = [
-        create_instrument("AO27", "AO27D", 100),
-        create_instrument("AL30", "AL30D", 1800),
-        create_instrument("DNC3O", "DNC3D"),
-        create_instrument("DNC5O", "DNC5D"),
-        create_instrument("DNC7O", "DNC7D", 400),
-        create_instrument("IRCPO", "IRCPD"),
-        create_instrument("LOC5O", "LOC5D",500),
-        create_instrument("LOC6O", "LOC6D"),
-        create_instrument("OLC5O", "OLC5D", 1000),
-        create_instrument("OLC6O", "OLC6D"),
-        create_instrument("OLC7O", "OLC7D"),
-        create_instrument("PLC4O", "PLC4D", 1000),
-        create_instrument("PN43O", "PN43D", 1000),
-        create_instrument("PQCSO", "PQCSD", 300),
-        create_instrument("RUCDO", "RUCDD", 500),
-        create_instrument("TLCMO", "TLCMD", 1000),
-        create_instrument("TLCPO", "TLCPD"),
-        create_instrument("TLCTO", "TLCTD", 1000),
-        create_instrument("TSC4O", "TSC4D", 1000),
-        create_instrument("TTCDO", "TTCDD", 1000),
-        create_instrument("VSCVO", "VSCVD", 1000),
-        create_instrument("YM34O", "YM34D"),
-        create_instrument("YM37O", "YM37D"),
-        create_instrument("YM42O", "YM42D"),
-        create_instrument("YMCXO", "YMCXD"),
+        create_instrument(a["ticker"], a["tickerD"], a["max_quant"])
+        for a in universe.attrs
     ]
 
     PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
@@ -670,24 +864,85 @@ if __name__ == "__main__":
     websocket_url = (
         f"wss://matriz.cocos.xoms.com.ar/ws?session_id={session_id}&conn_id={conn_id}"
     )
-
-    client = CocosMatrizClient(username=usuario, password=password)
-    data_manager = DataManager(instrumentos)
-    websocket_client = WebSocketClient(websocket_url, data_manager, instrumentos)
+    # [endpoints] apunta a otro broker, por ejemplo `python mockbroker.py serve`
+    websocket_url = config.get("endpoints", "matriz_ws_url", fallback=websocket_url)
+    api_url = config.get("endpoints", "api_url", fallback=DEFAULT_API_URL)
+    reports_url = config.get("endpoints", "primary_ws_url", fallback=WS_URL)
+
+    client = CocosMatrizClient(username=usuario, password=password, base_url=api_url)
+    tracer = LatencyTracer()
+    tracer.start_reporter(LATENCY_REPORT_INTERVAL)
+    data_manager = DataManager(instrumentos, tracer, universe.topics)
+    websocket_client = WebSocketClient(
+        websocket_url, data_manager, instrumentos, open_recorder("example_v1")
+    )
     wst = websocket_client.connect()
 
-    executer = Executer(account=account, client=client)
+    # Estado de órdenes por execution reports push en vez de consultas REST
+    # ([execution] order_reports = false vuelve a consultar cada orden por REST)
+    orders: Optional[OrderTracker] = None
+    order_reports: Optional[OrderReportClient] = None
+    if client.token and config.getboolean(
+        "execution", "order_reports", fallback=True
+    ):
+        orders = OrderTracker()
+        # Al reconectar, el websocket usa el token renovado
+        order_reports = OrderReportClient(
+            lambda: client.token, account, orders, url=reports_url
+        )
+        order_reports.start()
+
+    # [execution] max_active_arbitrages = N lanza hasta N arbitrajes a la vez sin
+    # bloquear la estrategia; max_exposure topea los pesos comprometidos
+    manager: Optional[OrderManager] = None
+    max_active = config.getint("execution", "max_active_arbitrages", fallback=0)
+    if max_active > 0:
+        max_exposure = config.getfloat("execution", "max_exposure", fallback=0)
+        manager = OrderManager(max_active, max_exposure or None)
+
+    # [execution] concurrent_legs = true envía las patas en paralelo (legs.py)
+    executer = Executer(
+        account=account,
+        client=client,
+        tracer=tracer,
+        concurrent_legs=config.getboolean(
+            "execution", "concurrent_legs", fallback=False
+        ),
+        orders=orders,
+        manager=manager,
+    )
+
+    # [schedule] enabled = true ajusta el intervalo a la rueda y a la actividad
+    scheduler = open_scheduler(UPDATE_SLEEP_INTERVAL)
 
     try:
         dolarizadores: Set[str] = set()
         pesificadores: Set[str] = set()
         # Keep the main thread alive while the WebSocket listens
         while True:
-            time.sleep(UPDATE_SLEEP_INTERVAL)
-            snapshot = copy.deepcopy(instrumentos)
-            executer.execute(
-                snapshot, dolarizadores=dolarizadores, pesificadores=pesificadores
-            )  # pasar una copia para evitar modificaciones concurrentes
+            scheduler.sleep()
+            if not scheduler.is_open():
+                continue
+            # Snapshot coherente del libro, sin copiar: el websocket sigue
+            # escribiendo en otro buffer mientras se ejecuta la estrategia
+            with data_manager.snapshot() as snap:
+                scheduler.observe_snapshot(snap)
+                executer.execute(
+                    snap.records(instrumentos),
+                    dolarizadores=dolarizadores,
+                    pesificadores=pesificadores,
+                )
     except KeyboardInterrupt:
         logger.info("Exiting...")
         websocket_client.stop_websocket()
+        if manager is not None:
+            logger.info("Esperando arbitrajes en curso...")
+            manager.shutdown(wait=True)
+            logger.info(f"Arbitrajes: {manager.stats()}")
+        if executer.legs is not None:
+            executer.legs.shutdown()
+        if order_reports is not None:
+            order_reports.stop()
+        logger.info(f"Cadencia: {scheduler.stats()}")
+        logger.info("⏱️ Latencias por etapa:\n" + tracer.format_summary())
+        logger.info("🌐 Conexiones HTTP por endpoint:\n" + format_all_stats())
@@ -1,15 +1,40 @@
-import requests
 import base64
 import json
 import time
 import threading
 import websocket  # pip install websocket-client
 from datetime import datetime
-from typing import Dict, List, Optional, Callable
+from typing import Dict, List, Mapping, Optional, Callable
 import logging
 import os
 import configparser
-import copy
+
+import requests
+
+from httppool import (
+    KEEPALIVE_INTERVAL,
+    PRIMARY_TIMEOUTS,
+    format_all_stats,
+    get_session,
+)
+from depthbook import DepthBook, Sizing
+from instruments import get_universe
+from latency import LatencyTracer, now_ns
+from legs import LegExecutor, order_report
+from mdparser import SymbolRegistry, Target
+from ordermanager import (
+    HEDGE_WORKING,
+    LEG1_WORKING,
+    Arbitrage,
+    ArbitrageResult,
+    OrderManager,
+)
+from orderstream import TERMINAL_STATUSES, OrderReportClient, OrderTracker
+from positions import PositionCache
+from quotebook import TOP_24HS_COLUMNS, QuoteBook, Snapshot
+from scheduler import open_scheduler
+from tape import TapeWriter, open_recorder
+from tokens import PRIMARY_TOKEN_TTL, TokenManager
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,13 +47,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+LATENCY_REPORT_INTERVAL = 60
+HTTP_CONNECTIONS = 4  # conexiones keep-alive precalentadas a la API
+ORDER_REPORT_WAIT = 1.0  # segundos esperando que una orden llene o termine
+UPDATE_SLEEP_INTERVAL = 3
+DEFAULT_API_URL = "https://api.cocos.xoms.com.ar"
+WS_URL = "wss://api.cocos.xoms.com.ar/"
+
 
 class CocosMatrizClient:
     def __init__(
         self,
         username: str,
         password: str,
-        base_url: str = "https://api.cocos.xoms.com.ar",
+        base_url: str = DEFAULT_API_URL,
     ):
         self.base_url = base_url.rstrip("/")
         self.username = username
@@ -41,25 +73,41 @@ class CocosMatrizClient:
         self.basic_auth = base64.b64encode(
             f"{username}:{password}".encode()
         ).decode()  # Para endpoints de riesgo
+        # Sesión keep-alive compartida con conexiones abiertas de antemano,
+        # una por orden que puede salir a la vez: el envío no paga el TLS
+        self.http = get_session(self.base_url, PRIMARY_TIMEOUTS)
+        # Token en memoria renovado antes de las 24 h; un 401 fuerza otro
+        self.tokens = TokenManager(
+            self._fetch_token, "X-Auth-Token", PRIMARY_TOKEN_TTL, name="Primary"
+        )
+        self.tokens.listeners.append(self._set_token)
         self.login()
+        self.tokens.start()
+        self.http.prewarm(
+            self.base_url, connections=HTTP_CONNECTIONS, keepalive=KEEPALIVE_INTERVAL
+        )
 
-    def login(self) -> bool:
-        """Login a la Primary API"""
+    def _fetch_token(self) -> str:
+        """Pide un token nuevo (lo usa el TokenManager)."""
         url = f"{self.base_url}/auth/getToken"
         headers = {"X-Username": self.username, "X-Password": self.password}
+        response = self.http.post(url, endpoint="login", headers=headers)
+        response.raise_for_status()
+        token = response.headers.get("X-Auth-Token")
+        if not token:
+            raise ValueError("no se recibió token")
+        return token
+
+    def _set_token(self, token: str) -> None:
+        self.token = token
+        self.headers["X-Auth-Token"] = token
+
+    def login(self) -> bool:
+        """Login a la Primary API"""
         try:
-            response = requests.post(url, headers=headers, timeout=15)
-            response.raise_for_status()
-            self.token = response.headers.get("X-Auth-Token")
-            if self.token:
-                self.headers["X-Auth-Token"] = self.token
-                logger.info(
-                    f"✅ Login exitoso - Token válido por 24h: {datetime.now()}"
-                )
-                return True
-            else:
-                logger.error("❌ Login falló: no se recibió token")
-                return False
+            self.tokens.refresh()
+            logger.info(f"✅ Login exitoso - Token válido por 24h: {datetime.now()}")
+            return True
         except Exception as e:
             logger.error(f"❌ Error en login: {e}")
             return False
@@ -88,8 +136,12 @@ class CocosMatrizClient:
         }
 
         try:
-            response = requests.get(
-                url, headers=self.headers, params=params, timeout=10
+            response = self.http.get(
+                url,
+                endpoint="snapshot",
+                headers=self.headers,
+                tokens=self.tokens,
+                params=params,
             )
             response.raise_for_status()
             data = response.json()
@@ -114,7 +166,13 @@ class CocosMatrizClient:
     def get_instruments(self, market_id: str = "BYMA"):
         url = f"{self.base_url}/rest/instruments/details"
         params = {"marketId": market_id}
-        r = requests.get(url, headers=self.headers, params=params)
+        r = self.http.get(
+            url,
+            endpoint="instruments",
+            headers=self.headers,
+            tokens=self.tokens,
+            params=params,
+        )
         return r.json()
 
     # ====================== GESTIÓN DE ÓRDENES ======================
@@ -145,9 +203,18 @@ class CocosMatrizClient:
         if price is not None:
             params["price"] = str(price)
 
-        r = requests.get(
-            url, headers=self.headers, params=params
-        )  # La mayoría de endpoints de Primary usan GET + query params
+        try:
+            r = self.http.get(
+                url,
+                endpoint="send_order",
+                headers=self.headers,
+                tokens=self.tokens,
+                params=params,
+            )  # La mayoría de endpoints de Primary usan GET + query params
+        except requests.RequestException as e:
+            # Sin respuesta la orden puede haber quedado viva en el broker
+            logger.error(f"❌ Envío sin respuesta, conciliar la orden {params}: {e}")
+            return {"error": str(e)}
         return r.json() if r.ok else {"error": r.text}
 
     def get_orders(
@@ -157,7 +224,13 @@ class CocosMatrizClient:
         endpoint = f"/rest/order/{status}"
         url = f"{self.base_url}{endpoint}"
         params = {"accountId": account}  # En doc es accountId, pero asumimos string
-        r = requests.get(url, headers=self.headers, params=params)
+        r = self.http.get(
+            url,
+            endpoint="orders",
+            headers=self.headers,
+            tokens=self.tokens,
+            params=params,
+        )
         return r.json() if r.ok else []
 
     def get_orders_by_clor_id(
@@ -170,14 +243,32 @@ class CocosMatrizClient:
             "clOrdId": clorId,
             "proprietary": proprietary,
         }  # En doc es accountId, pero asumimos string
-        r = requests.get(url, headers=self.headers, params=params)
+        try:
+            r = self.http.get(
+                url,
+                endpoint="order_status",
+                headers=self.headers,
+                tokens=self.tokens,
+                params=params,
+            )
+        except requests.RequestException as e:
+            return {"error": str(e)}
         return r.json() if r.ok else {"error": r.text}
 
     def cancel_order(self, cl_ord_id: str, proprietary: str) -> Dict:
         """Cancelar orden por clOrdId"""
         url = f"{self.base_url}/rest/order/cancelById"
         params = {"clOrdId": cl_ord_id, "proprietary": proprietary}
-        r = requests.get(url, headers=self.headers, params=params)
+        try:
+            r = self.http.get(
+                url,
+                endpoint="cancel_order",
+                headers=self.headers,
+                tokens=self.tokens,
+                params=params,
+            )
+        except requests.RequestException as e:
+            return {"error": str(e)}
         return r.json() if r.ok else {"error": r.text}
 
     # ====================== PORTFOLIO Y CUENTA (RISK API con Basic Auth) ======================
@@ -185,34 +276,41 @@ class CocosMatrizClient:
         """Posiciones abiertas"""
         url = f"{self.base_url}/rest/risk/position/getPositions/{account_name}"
         headers = {"Authorization": f"Basic {self.basic_auth}"}
-        r = requests.get(url, headers=headers)
+        r = self.http.get(url, endpoint="positions", headers=headers)
         return r.json() if r.ok else {"error": r.text}
 
     def get_detailed_positions(self, account_name: str) -> Dict:
         """Posiciones detalladas"""
         url = f"{self.base_url}/rest/risk/detailedPosition/{account_name}"
         headers = {"Authorization": f"Basic {self.basic_auth}"}
-        r = requests.get(url, headers=headers)
+        r = self.http.get(url, endpoint="detailed_positions", headers=headers)
         return r.json() if r.ok else {"error": r.text}
 
     def get_portfolio(self, account_name: str) -> Dict:
         """Reporte completo de cuenta (portfolio, cash, P&L, etc.)"""
         url = f"{self.base_url}/rest/risk/accountReport/{account_name}"
         headers = {"Authorization": f"Basic {self.basic_auth}"}
-        r = requests.get(url, headers=headers)
+        r = self.http.get(url, endpoint="portfolio", headers=headers)
         return r.json() if r.ok else {"error": r.text}
 
     # ====================== WEBSOCKET - MARKET DATA EN TIEMPO REAL ======================
 
 
 class WebSocketClient:
-    def __init__(self, token: Optional[str] = None):
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        recorder: Optional[TapeWriter] = None,
+        url: str = WS_URL,
+    ):
         self.token = token
+        self.recorder = recorder  # graba los frames crudos (ver tape.py)
+        self.url = url
 
     def start_market_data_websocket(
         self,
         symbols: List[str],
-        on_data_callback: Callable[[Dict], None],
+        on_data_callback: Callable[[Dict, int], None],
         depth: int = 1,
         entries: str = "LA,BI,OF",
     ):  # agregué OI como común
@@ -224,7 +322,7 @@ class WebSocketClient:
             return
 
         self.on_market_data = on_data_callback
-        ws_url = "wss://api.cocos.xoms.com.ar/"
+        ws_url = self.url
 
         def on_open(ws):
             logger.info("WebSocket conectado → Suscribiendo a market data...")
@@ -244,6 +342,9 @@ class WebSocketClient:
 
         def on_message(ws, message):
             # logger.info(f"WS Msg (raw): {message}")
+            received = now_ns()
+            if self.recorder is not None:
+                self.recorder.write(message)
             try:
                 data = json.loads(message)
                 msg_type = data.get("type")
@@ -251,11 +352,11 @@ class WebSocketClient:
                 # Mensajes de market data update (oficial en doc: "Md")
                 if msg_type == "Md":
                     if self.on_market_data:
-                        self.on_market_data(data)
+                        self.on_market_data(data, received)
                 elif msg_type in ["smd_update", "md", "update"]:
                     # Variantes vistas en algunos brokers
                     if self.on_market_data:
-                        self.on_market_data(data)
+                        self.on_market_data(data, received)
                 else:
                     # Mensajes de control / error / heartbeat
                     logger.warning(f"WS Msg (control/error): {data}")
@@ -298,61 +399,261 @@ class WebSocketClient:
             self.ws.close()
             logger.info("WebSocket detenido")
         self.ws = None
+        if self.recorder is not None:
+            self.recorder.close()
 
 
 class DataManager:
-    def __init__(self, instrumentos: List[Dict]):
+    def __init__(
+        self,
+        instrumentos: List[Dict],
+        tracer: Optional[LatencyTracer] = None,
+        depth: int = 1,
+        targets: Optional[Mapping[str, Target]] = None,
+    ):
+        """
+        Args:
+            depth: Niveles por punta; con más de uno se guardan también en un
+                DepthBook para dimensionar por VWAP (ver depthbook.py)
+            targets: Símbolos ya compilados por instruments.py
+                (Universe.symbols)
+        """
         self.instrumentos = instrumentos
+        self.tracer = tracer  # estampas de latencia (ver latency.py)
+        pairs = [(inst["ticker"], inst["tickerD"]) for inst in instrumentos]
+        self.depth = DepthBook(pairs, depth) if depth > 1 else None
+        self.book = QuoteBook(
+            [inst["ticker"] for inst in instrumentos], TOP_24HS_COLUMNS
+        )
+        # Símbolo completo de Primary → (fila, columnas) para la pata en pesos
+        # y en dólares; el libro solo guarda 24hs
+        self.registry = SymbolRegistry(
+            self.book, pairs, plazos=("24hs",), targets=targets
+        )
 
-    def market_data_callback(self, data: Dict):
-        self.update_instrument_data(data)
+    def market_data_callback(self, data: Dict, received: Optional[int] = None):
+        self.update_instrument_data(data, received)
         # self.execute()
 
-    def update_instrument_data(self, data: Dict):
-        if "marketData" in data and data["marketData"]:
-            md = data["marketData"]
-            symbol = data["instrumentId"]["symbol"]
-            bid = (
-                md.get("BI", [{}])[0].get("price")
-                if md.get("BI") is not None and md.get("BI") != []
-                else None
+    def update_instrument_data(self, data: Dict, received: Optional[int] = None):
+        """Escribe la punta en el libro (sin precio o tamaño → NaN) y publica."""
+        if self.depth is not None:
+            # Antes del commit: quien vea el snapshot ya tiene estos niveles
+            self.depth.apply(data)
+        if self.tracer is None or received is None:
+            self.registry.apply(data)
+            return
+        cells = self.registry.decode(data)
+        if cells is None:
+            return
+        parsed = now_ns()
+        self.registry.write(cells)
+        self.tracer.frame(received, parsed, self.book.commit())
+
+    def snapshot(self) -> Snapshot:
+        """Último snapshot coherente del libro (liberar con release o with)."""
+        return self.book.snapshot()
+
+
+class Executer:
+    def __init__(
+        self,
+        account,
+        client: CocosMatrizClient,
+        tracer: Optional[LatencyTracer] = None,
+        concurrent_legs: bool = False,
+        orders: Optional[OrderTracker] = None,
+        manager: Optional[OrderManager] = None,
+        risk: Optional[PositionCache] = None,
+        depth: Optional[DepthBook] = None,
+    ):
+        self.account = account
+        self.client = client
+        self.tracer = tracer  # estampas de latencia (ver latency.py)
+        self.trace = None  # oportunidad en curso
+        # Arbitrajes en paralelo sin bloquear la estrategia (ver ordermanager.py)
+        self.manager = manager
+        self._local = threading.local()  # arbitraje del hilo que envía órdenes
+        # Estado de órdenes por execution reports (ver orderstream.py)
+        self.orders = orders
+        # Posiciones y efectivo en memoria para controles pre-trade (positions.py)
+        self.risk = risk
+        # Niveles L2 para dimensionar con VWAP en vez de la mejor punta
+        self.depth = depth
+        # Patas y cobertura en paralelo en vez de encadenadas (ver legs.py)
+        self.legs = (
+            LegExecutor(
+                client, account, send=self._send_order, status=self._order_status
             )
-            offer = (
-                md.get("OF", [{}])[0].get("price")
-                if md.get("OF") is not None and md.get("OF") != []
-                else None
+            if concurrent_legs
+            else None
+        )
+
+    def _arbitrar(
+        self, item: Dict, quant: int, al30: Dict, quant_al30: int, dolarizar: bool
+    ) -> ArbitrageResult:
+        """Arbitraje con sus patas y la cobertura con AL30 enviadas juntas."""
+        success, price_ratio, price_ratio_al30 = self.legs.arbitrage(
+            item, quant, al30, quant_al30, dolarizar=dolarizar
+        )
+        operacion = "dolarizó" if dolarizar else "pesificó"
+        logger.info(
+            f"✅ Se {operacion} {item['ticker']} a: {price_ratio:.4f}"
+            if success and price_ratio
+            else f"❌ No se obtuvo price ratio con {item['ticker']}."
+        )
+        if price_ratio_al30:
+            logger.info(f"✅ Cobertura con AL30 a: {price_ratio_al30:.4f}")
+        return success, price_ratio, price_ratio_al30
+
+    def _send_order(self, **kwargs) -> Dict:
+        """
+        send_order con control pre-trade contra la cache de posiciones y
+        estampando envío y respuesta si hay tracer.
+
+        Returns:
+            Dict: Respuesta del envío, o ``{"error": motivo}`` si el control
+            rechazó la orden
+        """
+        hold = None
+        if self.risk is not None:
+            hold, reason = self.risk.reserve(
+                kwargs["symbol"],
+                kwargs["side"],
+                kwargs["quantity"],
+                kwargs.get("price"),
             )
-            size_bid = (
-                md.get("BI", [{}])[0].get("size", "N/A")
-                if md.get("BI") is not None and md.get("BI") != []
-                else None
+            if reason is not None:
+                logger.warning(f"🚫 Pre-trade rechazó {kwargs['symbol']}: {reason}")
+                return {"error": reason}
+        if self.tracer is None:
+            response = self.client.send_order(**kwargs)
+        else:
+            arb = getattr(self._local, "arb", None)
+            sent = self.tracer.sent(arb.trace if arb is not None else self.trace)
+            response = self.client.send_order(**kwargs)
+            self.tracer.acked(sent)
+        if hold is not None:
+            self.risk.bind(hold, response)  # type: ignore
+        return response
+
+    def _order_status(self, cl_ord_id: str, proprietary: str) -> Dict:
+        """
+        Estado de una orden, con la misma forma que get_orders_by_clor_id.
+
+        Con el stream de execution reports conectado espera hasta
+        ORDER_REPORT_WAIT a que la orden llene o termine, sin REST; si no hay
+        stream o no llegó ningún report de la orden, consulta por REST.
+        """
+        response = None
+        if self.orders is not None and self.orders.connected:
+            report = self.orders.wait(cl_ord_id, ORDER_REPORT_WAIT)
+            if report is not None:
+                response = {"order": report}
+            else:
+                logger.warning(f"Sin execution report de {cl_ord_id}; consulta REST")
+        if response is None:
+            response = self.client.get_orders_by_clor_id(cl_ord_id, proprietary)
+        report = order_report(response)
+        if self.risk is not None:
+            self.risk.on_report(report)
+        arb = getattr(self._local, "arb", None)
+        if arb is not None:
+            arb.on_report(report)
+        return response
+
+    def _secuencial(
+        self,
+        item: Dict,
+        quant: int,
+        al30: Dict,
+        quant_al30: int,
+        dolarizar: bool,
+        arb: Optional[Arbitrage] = None,
+    ) -> ArbitrageResult:
+        """
+        Conversión con ``item`` y después la inversa con AL30, orden por orden.
+
+        Args:
+            arb: Arbitraje del OrderManager cuyo estado se avanza, si lo hay
+
+        Returns:
+            ArbitrageResult: (se ejecutaron conversión y cobertura, ratio,
+            ratio de AL30)
+        """
+        if arb is not None:
+            arb.advance(LEG1_WORKING)
+        if dolarizar:
+            success, price_ratio = self.dolarizar(item, quant)
+            logger.warning(
+                f"Se dolarizó a: {price_ratio:.4f}"
+                if price_ratio
+                else "No se obtuvo price ratio en dolarización."
             )
-            size_offer = (
-                md.get("OF", [{}])[0].get("size", "N/A")
-                if md.get("OF") is not None and md.get("OF") != []
-                else None
+            logger.info("COMPRAR AL30 EN DOLARES")
+            logger.info("VENDER AL30 EN PESOS")
+        else:
+            success, price_ratio = self.pesificar(item, quant)
+            logger.warning(
+                f"Se pesificó a: {price_ratio:.4f}"
+                if price_ratio
+                else "No se obtuvo price ratio en pesificación."
             )
+            logger.info("COMPRAR AL30 EN PESOS")
+            logger.info("VENDER AL30 EN DOLARES")
 
-            ticker = symbol.removeprefix("MERV - XMEV -").removesuffix("- 24hs").strip()
-            for item in self.instrumentos:
-                if item["ticker"] == ticker:
-                    item["prCompraPesos"] = bid
-                    item["prVentaPesos"] = offer
-                    item["siCompraPesos"] = size_bid
-                    item["siVentaPesos"] = size_offer
-                    return
-                if item["tickerD"] == ticker:
-                    item["prCompraDolar"] = bid
-                    item["prVentaDolar"] = offer
-                    item["siCompraDolar"] = size_bid
-                    item["siVentaDolar"] = size_offer
-                    return
+        operacion = "dolarización" if dolarizar else "pesificación"
+        if not success:
+            logger.warning(
+                f"No se ejecutó la parte de AL30 porque la {operacion} no se ejecutó."
+            )
+            return False, price_ratio, None
+
+        if arb is not None:
+            arb.advance(HEDGE_WORKING)
+        cubrir = self.pesificar if dolarizar else self.dolarizar
+        success2, price_ratio2 = cubrir(al30, quant_al30, order_type="MARKET")
+        cobertura = "pesific" if dolarizar else "dolariz"
+        logger.warning(
+            f"Se {cobertura}ó a: {price_ratio2:.4f}"
+            if price_ratio2
+            else f"No se obtuvo price ratio en {cobertura}ación."
+        )
+        return success2, price_ratio, price_ratio2
 
+    def _lanzar(
+        self, item: Dict, quant: int, al30: Dict, quant_al30: int, dolarizar: bool
+    ) -> Optional[Arbitrage]:
+        """
+        Lanza el arbitraje en el OrderManager y vuelve sin esperar las órdenes.
 
-class Executer:
-    def __init__(self, account, client: CocosMatrizClient):
-        self.account = account
-        self.client = client
+        Returns:
+            Optional[Arbitrage]: None si lo impidieron la exclusividad por ticker
+            o los límites de exposición
+        """
+        # Copias: el snapshot del libro se libera cuando vuelve execute
+        item, al30 = dict(item), dict(al30)
+        precio = item["prVentaPesos"] if dolarizar else item["prCompraPesos"]
+
+        def run(arb: Arbitrage) -> ArbitrageResult:
+            self._local.arb = arb
+            try:
+                if self.legs is not None:
+                    arb.advance(LEG1_WORKING)
+                    return self._arbitrar(item, quant, al30, quant_al30, dolarizar)
+                return self._secuencial(item, quant, al30, quant_al30, dolarizar, arb)
+            finally:
+                self._local.arb = None
+
+        return self.manager.submit(  # type: ignore
+            item["ticker"],
+            dolarizar,
+            quant,
+            quant_al30,
+            quant * (precio or 0),
+            run,
+            self.trace,
+        )
 
     def monitor_order(
         self,
@@ -364,12 +665,25 @@ class Executer:
         """
         Monitorea el status de una orden hasta que sea FILLED o timeout.
         Retorna el order report final.
+
+        Con el stream de execution reports conectado espera el report push sin
+        consultar por REST; si no, hace polling cada ``poll_interval``.
         """
+        if self.orders is not None and self.orders.connected:
+            order = self.orders.wait(cl_ord_id, timeout)
+            if order is None or order.get("status") not in TERMINAL_STATUSES:
+                logger.warning(f"Timeout monitoreando order {cl_ord_id}")
+                return {}
+            if order.get("status") != "FILLED":
+                logger.error(f"Order {cl_ord_id} rechazada o cancelada.")
+            return order
+
         start_time = time.time()
         while time.time() - start_time < timeout:
-            orders = self.client.get_orders_by_clor_id(cl_ord_id, proprietary)
-            if orders and isinstance(orders, list) and len(orders) > 0:
-                order = orders[0].get("order", {})
+            order = order_report(
+                self.client.get_orders_by_clor_id(cl_ord_id, proprietary)
+            )
+            if order:
                 status = order.get("status")
                 cum_qty = order.get("cumQty", 0)
                 leaves_qty = order.get("leavesQty", order.get("orderQty", 0) - cum_qty)
@@ -385,6 +699,32 @@ class Executer:
         logger.warning(f"Timeout monitoreando order {cl_ord_id}")
         return {}
 
+    def _dimensionar(
+        self, item: Dict, ratio: float, max_quant_al30: int, dolarizar: bool
+    ) -> Optional[Sizing]:
+        """
+        Cantidad por profundidad (ver depthbook.py) y precios límite del último
+        nivel que toca cada pata, escritos en ``item``.
+
+        Returns:
+            Optional[Sizing]: None si con los niveles no conviene ni un nominal
+        """
+        size = self.depth.dolarizar if dolarizar else self.depth.pesificar  # type: ignore
+        sizing = size(item["ticker"], ratio, item["max_quant"], max_quant_al30)
+        if sizing is None:
+            logger.info(f"{item['ticker']}: sin profundidad que convenga contra AL30")
+            return None
+        if dolarizar:
+            item["prVentaPesos"] = sizing.buy_price
+            item["prCompraDolar"] = sizing.sell_price
+            item["pesos_a_USD"] = sizing.ratio
+        else:
+            item["prVentaDolar"] = sizing.buy_price
+            item["prCompraPesos"] = sizing.sell_price
+            item["USD_a_pesos"] = sizing.ratio
+        logger.info(f"{item['ticker']}: {sizing}")
+        return sizing
+
     def execute(self, instrumentos: List[Dict]):
         for item in instrumentos:
             item["USD_a_pesos"] = (
@@ -426,21 +766,36 @@ class Executer:
         )  # Ejemplo: máximo 2000 contratos de AL30 por operación
 
         for item in instrumentos:
+            if self.manager is not None and self.manager.busy(item["ticker"]):
+                continue  # ya hay un arbitraje en curso con este instrumento
             if item["pesos_a_USD"] is None:
                 continue
             else:
                 if item["pesos_a_USD"] * ratio < USD_a_pesos_AL30:
-                    logger.info(json.dumps(item, indent=2, ensure_ascii=False))
-                    quant = min(
-                        item["siCompraDolar"],
-                        item["siVentaPesos"],
-                        item["max_quant"],
+                    if self.tracer is not None:
+                        self.trace = self.tracer.signal(item)
+                    logger.info(json.dumps(dict(item), indent=2, ensure_ascii=False))
+                    quant = int(
+                        min(
+                            item["siCompraDolar"],
+                            item["siVentaPesos"],
+                            item["max_quant"],
+                        )
                     )
 
                     amount = quant * item["prVentaDolar"]
                     quant_al30 = min(
                         int(amount / al30["prCompraDolar"]), max_quant_al30
                     )
+                    if self.depth is not None:
+                        # Más allá del primer nivel mientras convenga contra AL30
+                        sizing = self._dimensionar(
+                            item, ratio, max_quant_al30, dolarizar=True
+                        )
+                        if sizing is None:
+                            continue
+                        quant, quant_al30 = sizing.quant, sizing.quant_al30
+                        amount = sizing.amount
 
                     logger.info(
                         f"Ejecutando estrategia para {item['ticker']} → quant={quant}, amount={amount}, quant_al30={quant_al30}"
@@ -451,43 +806,42 @@ class Executer:
                     logger.info(
                         f"Se dolarizaria a un precio de {item['pesos_a_USD']:.2f} pesos por dólar"
                     )
-                    success, price_ratio = self.dolarizar(item, quant)
-                    logger.warning(
-                        f"Se dolarizó a: {price_ratio:.4f}"
-                        if price_ratio
-                        else "No se obtuvo price ratio en dolarización."
-                    )
-
-                    logger.info("COMPRAR AL30 EN DOLARES")
-                    logger.info("VENDER AL30 EN PESOS")
-                    if success:
-                        success2, price_ratio2 = self.pesificar(
-                            al30, quant_al30, order_type="MARKET"
-                        )
-                        logger.warning(
-                            f"Se pesificó a: {price_ratio2:.4f}"
-                            if price_ratio2
-                            else "No se obtuvo price ratio en pesificación."
-                        )
-                    else:
-                        logger.warning(
-                            "No se ejecutó la parte de AL30 porque la dolarización no se ejecutó."
-                        )
+                    if self.manager is not None:
+                        # Sigue evaluando señales mientras trabajan las órdenes
+                        self._lanzar(item, quant, al30, quant_al30, dolarizar=True)
+                        continue
+                    if self.legs is not None:
+                        self._arbitrar(item, quant, al30, quant_al30, dolarizar=True)
+                        continue
+                    self._secuencial(item, quant, al30, quant_al30, dolarizar=True)
             if item["USD_a_pesos"] is None:
                 continue
             else:
                 if pesos_a_USD_AL30 * ratio < item["USD_a_pesos"]:
-                    logger.info(json.dumps(item, indent=2, ensure_ascii=False))
-                    quant = min(
-                        item["siVentaDolar"],
-                        item["siCompraPesos"],
-                        item["max_quant"],
+                    if self.tracer is not None:
+                        self.trace = self.tracer.signal(item)
+                    logger.info(json.dumps(dict(item), indent=2, ensure_ascii=False))
+                    quant = int(
+                        min(
+                            item["siVentaDolar"],
+                            item["siCompraPesos"],
+                            item["max_quant"],
+                        )
                     )
 
                     amount = quant * item["prVentaDolar"]
                     quant_al30 = min(
                         int(amount / al30["prCompraDolar"]), max_quant_al30
                     )
+                    if self.depth is not None:
+                        # Más allá del primer nivel mientras convenga contra AL30
+                        sizing = self._dimensionar(
+                            item, ratio, max_quant_al30, dolarizar=False
+                        )
+                        if sizing is None:
+                            continue
+                        quant, quant_al30 = sizing.quant, sizing.quant_al30
+                        amount = sizing.amount
 
                     logger.info(
                         f"Ejecutando estrategia para {item['ticker']} → quant={quant}, amount={amount}, quant_al30={quant_al30}"
@@ -498,34 +852,20 @@ class Executer:
                     logger.info(
                         f"Se pesificaria a un precio de {item['USD_a_pesos']:.2f} pesos por dólar"
                     )
-                    success, price_ratio = self.pesificar(item, quant)
-                    logger.warning(
-                        f"Se pesificó a: {price_ratio:.4f}"
-                        if price_ratio
-                        else "No se obtuvo price ratio en pesificación."
-                    )
-
-                    logger.info("COMPRAR AL30 EN PESOS")
-                    logger.info("VENDER AL30 EN DOLARES")
-                    if success:
-                        success2, price_ratio2 = self.dolarizar(
-                            al30, quant_al30, order_type="MARKET"
-                        )
-                        logger.warning(
-                            f"Se dolarizó a: {price_ratio2:.4f}"
-                            if price_ratio2
-                            else "No se obtuvo price ratio en dolarización."
-                        )
-                    else:
-                        logger.warning(
-                            "No se ejecutó la parte de AL30 porque la pesificación no se ejecutó."
-                        )
+                    if self.manager is not None:
+                        # Sigue evaluando señales mientras trabajan las órdenes
+                        self._lanzar(item, quant, al30, quant_al30, dolarizar=False)
+                        continue
+                    if self.legs is not None:
+                        self._arbitrar(item, quant, al30, quant_al30, dolarizar=False)
+                        continue
+                    self._secuencial(item, quant, al30, quant_al30, dolarizar=False)
 
     def dolarizar(self, dolarizador: Dict, quant: int, order_type: str = "LIMIT"):
         price_ratio = None
         first_price, second_price = None, None
         # Enviar orden de compra en pesos
-        orden_response = self.client.send_order(
+        orden_response = self._send_order(
             symbol=f"MERV - XMEV - {dolarizador['ticker']} - 24hs",  # Ticker D para dólares
             side="BUY",
             quantity=quant,
@@ -550,7 +890,7 @@ class Executer:
             logger.error("No se obtuvo clOrdId o proprietary.")
             return False, price_ratio
 
-        orden_encontrada = self.client.get_orders_by_clor_id(cl_ord_id, prop)
+        orden_encontrada = self._order_status(cl_ord_id, prop)
 
         status = orden_encontrada.get("order", {}).get("status")
         cum_qty = orden_encontrada.get("order", {}).get("cumQty", 0)
@@ -567,7 +907,7 @@ class Executer:
             logger.info(f"Orden de compra filled con cumQty={cum_qty}")
             first_price = orden_encontrada.get("order", {}).get("avgPx")
             # Enviar orden complementaria de venta en dolares por la cantidad filled
-            comp_response = self.client.send_order(
+            comp_response = self._send_order(
                 symbol=f"MERV - XMEV - {dolarizador['tickerD']} - 24hs",
                 side="SELL",
                 quantity=cum_qty,
@@ -589,7 +929,7 @@ class Executer:
                 logger.info(
                     f"Orden de venta en dólares enviada → clOrdId={comp_cl_ord_id}, proprietary={comp_prop}"
                 )
-                comp_orden_encontrada = self.client.get_orders_by_clor_id(
+                comp_orden_encontrada = self._order_status(
                     comp_cl_ord_id, comp_prop
                 )
                 second_price = comp_orden_encontrada.get("order", {}).get("avgPx")
@@ -611,7 +951,7 @@ class Executer:
         price_ratio = None
         first_price, second_price = None, None
         # Enviar orden de compra en dólares
-        orden_response = self.client.send_order(
+        orden_response = self._send_order(
             symbol=f"MERV - XMEV - {pesificador['tickerD']} - 24hs",  # Ticker D para dólares
             side="BUY",
             quantity=quant,
@@ -636,7 +976,7 @@ class Executer:
             logger.error("No se obtuvo clOrdId o proprietary.")
             return False, price_ratio
 
-        orden_encontrada = self.client.get_orders_by_clor_id(cl_ord_id, prop)
+        orden_encontrada = self._order_status(cl_ord_id, prop)
 
         status = orden_encontrada.get("order", {}).get("status")
         cum_qty = orden_encontrada.get("order", {}).get("cumQty", 0)
@@ -653,7 +993,7 @@ class Executer:
             logger.info(f"Orden de compra filled con cumQty={cum_qty}")
             first_price = orden_encontrada.get("order", {}).get("avgPx")
             # Enviar orden complementaria de venta en pesos por la cantidad filled
-            comp_response = self.client.send_order(
+            comp_response = self._send_order(
                 symbol=f"MERV - XMEV - {pesificador['ticker']} - 24hs",
                 side="SELL",
                 quantity=cum_qty,
@@ -675,7 +1015,7 @@ class Executer:
                 logger.info(
                     f"Orden de venta en pesos enviada → clOrdId={comp_cl_ord_id}, proprietary={comp_prop}"
                 )
-                comp_orden_encontrada = self.client.get_orders_by_clor_id(
+                comp_orden_encontrada = self._order_status(
                     comp_cl_ord_id, comp_prop
                 )
                 second_price = comp_orden_encontrada.get("order", {}).get("avgPx")
@@ -694,327 +1034,41 @@ class Executer:
         return False, price_ratio
 
 
+# ====================== FUNCIÓN AUXILIAR ======================
+def create_instrument(ticker: str, tickerD: str, max_quant: int = 200) -> Dict:
+    """
+    Crea un diccionario de instrumento con valores inicializados.
+
+    Args:
+        ticker: Ticker en pesos
+        tickerD: Ticker en dólares
+        max_quant: Cantidad máxima permitida
+
+    Returns:
+        Dict: Diccionario de instrumento
+    """
+    return {
+        "ticker": ticker,
+        "tickerD": tickerD,
+        "prCompraPesos": None,
+        "prVentaPesos": None,
+        "prCompraDolar": None,
+        "prVentaDolar": None,
+        "siCompraPesos": None,
+        "siVentaPesos": None,
+        "siCompraDolar": None,
+        "siVentaDolar": None,
+        "max_quant": max_quant,
+    }
+
+
 # ====================== EJEMPLO DE USO ======================
 if __name__ == "__main__":
+    # Pares y max_quant de instruments.json (ver instruments.py)
+    universe = get_universe("example_v2")
     instrumentos = [
-        {
-            "ticker": "AL30",
-            "tickerD": "AL30D",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 1800,
-        },
-        {
-            "ticker": "YM34O",
-            "tickerD": "YM34D",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 200,
-        },
-        {
-            "ticker": "YMCXO",
-            "tickerD": "YMCXD",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 200,
-        },
-        {
-            "ticker": "RUCDO",
-            "tickerD": "RUCDD",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 400,
-        },
-        {
-            "ticker": "TLCTO",
-            "tickerD": "TLCTD",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 200,
-        },
-        {
-            "ticker": "PQCSO",
-            "tickerD": "PQCSD",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 200,
-        },
-        {
-            "ticker": "TLCPO",
-            "tickerD": "TLCPD",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 200,
-        },
-        {
-            "ticker": "IRCPO",
-            "tickerD": "IRCPD",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 200,
-        },
-        {
-            "ticker": "DNC7O",
-            "tickerD": "DNC7D",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 200,
-        },
-        {
-            "ticker": "VSCVO",
-            "tickerD": "VSCVD",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 1000,
-        },
-        {
-            "ticker": "TSC4O",
-            "tickerD": "TSC4D",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 1000,
-        },
-        {
-            "ticker": "TTCDO",
-            "tickerD": "TTCDD",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 1000,
-        },
-        {
-            "ticker": "TLCMO",
-            "tickerD": "TLCMD",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 1000,
-        },
-        {
-            "ticker": "PLC5O",
-            "tickerD": "PLC5D",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 1000,
-        },
-        {
-            "ticker": "YM37O",
-            "tickerD": "YM37D",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 200,
-        },
-        {
-            "ticker": "YM42O",
-            "tickerD": "YM42D",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 200,
-        },
-        {
-            "ticker": "LOC6O",
-            "tickerD": "LOC6D",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 200,
-        },
-        {
-            "ticker": "OLC5O",
-            "tickerD": "OLC5D",
-            "prCompraPesos": None,
-            "prVentaPesos": None,
-            "prCompraDolar": None,
-            "prVentaDolar": None,
-            "siCompraPesos": None,
-            "siVentaPesos": None,
-            "siCompraDolar": None,
-            "siVentaDolar": None,
-            "max_quant": 1000,
-        },
-        # {
-        #     "ticker": "PAMP",
-        #     "tickerD": "PAMPD",
-        #     "prCompraPesos": None,
-        #     "prVentaPesos": None,
-        #     "prCompraDolar": None,
-        #     "prVentaDolar": None,
-        #     "siCompraPesos": None,
-        #     "siVentaPesos": None,
-        #     "siCompraDolar": None,
-        #     "siVentaDolar": None,
-        #     "max_quant": 50,
-        #     "bond": False,
-        # },
-        # {
-        #     "ticker": "ALUA",
-        #     "tickerD": "ALUAD",
-        #     "prCompraPesos": None,
-        #     "prVentaPesos": None,
-        #     "prCompraDolar": None,
-        #     "prVentaDolar": None,
-        #     "siCompraPesos": None,
-        #     "siVentaPesos": None,
-        #     "siCompraDolar": None,
-        #     "siVentaDolar": None,
-        #     "max_quant": 50,
-        #     "bond": False,
-        # },
-        # {
-        #     "ticker": "TXAR",
-        #     "tickerD": "TXARD",
-        #     "prCompraPesos": None,
-        #     "prVentaPesos": None,
-        #     "prCompraDolar": None,
-        #     "prVentaDolar": None,
-        #     "siCompraPesos": None,
-        #     "siVentaPesos": None,
-        #     "siCompraDolar": None,
-        #     "siVentaDolar": None,
-        #     "max_quant": 100,
-        #     "bond": False,
-        # },
-        # {
-        #     "ticker": "YPFD",
-        #     "tickerD": "YPFDD",
-        #     "prCompraPesos": None,
-        #     "prVentaPesos": None,
-        #     "prCompraDolar": None,
-        #     "prVentaDolar": None,
-        #     "siCompraPesos": None,
-        #     "siVentaPesos": None,
-        #     "siCompraDolar": None,
-        #     "siVentaDolar": None,
-        #     "max_quant": 5,
-        #     "bond": False,
-        # },
-        # {
-        #     "ticker": "GGAL",
-        #     "tickerD": "GGALD",
-        #     "prCompraPesos": None,
-        #     "prVentaPesos": None,
-        #     "prCompraDolar": None,
-        #     "prVentaDolar": None,
-        #     "siCompraPesos": None,
-        #     "siVentaPesos": None,
-        #     "siCompraDolar": None,
-        #     "siVentaDolar": None,
-        #     "max_quant": 40,
-        #     "bond": False,
-        # },
-        # {
-        #     "ticker": "BBAR",
-        #     "tickerD": "BBARD",
-        #     "prCompraPesos": None,
-        #     "prVentaPesos": None,
-        #     "prCompraDolar": None,
-        #     "prVentaDolar": None,
-        #     "siCompraPesos": None,
-        #     "siVentaPesos": None,
-        #     "siCompraDolar": None,
-        #     "siVentaDolar": None,
-        #     "max_quant": 40,
-        #     "bond": False,
-        # },
+        create_instrument(a["ticker"], a["tickerD"], a["max_quant"])
+        for a in universe.attrs
     ]
 
     PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
@@ -1029,7 +1083,10 @@ if __name__ == "__main__":
     password = config["credentials"]["matriz_password"]
     account = config["credentials"]["matriz_account"]
 
-    client = CocosMatrizClient(username=usuario, password=password)
+    # [endpoints] apunta a otro broker, por ejemplo `python mockbroker.py serve`
+    api_url = config.get("endpoints", "api_url", fallback=DEFAULT_API_URL)
+    ws_url = config.get("endpoints", "primary_ws_url", fallback=WS_URL)
+    client = CocosMatrizClient(username=usuario, password=password, base_url=api_url)
 
     # print(client.get_instruments("ROFX"))
     # Datos de mercado
@@ -1091,30 +1148,107 @@ if __name__ == "__main__":
 
     # Ejemplo: suscribirse a GGAL y YPFD
 
-    symbols_to_subscribe = [
-        "MERV - XMEV - {0} - 24hs".format(inst["ticker"]) for inst in instrumentos
-    ] + ["MERV - XMEV - {0} - 24hs".format(inst["tickerD"]) for inst in instrumentos]
-
-    websocket_client = WebSocketClient(token=client.token)
-    data_manager = DataManager(instrumentos)
-
-    executer = Executer(account=account, client=client)
+    websocket_client = WebSocketClient(
+        token=client.token, recorder=open_recorder("example_v2"), url=ws_url
+    )
+    tracer = LatencyTracer()
+    tracer.start_reporter(LATENCY_REPORT_INTERVAL)
+    # [marketdata] depth = N suscribe N niveles y dimensiona cada arbitraje por
+    # VWAP mientras convenga contra AL30; 1 = solo la mejor punta
+    depth = config.getint("marketdata", "depth", fallback=1)
+    data_manager = DataManager(instrumentos, tracer, depth, universe.symbols)
+    symbols_to_subscribe = data_manager.registry.symbols()
+
+    # Estado de órdenes por execution reports push en vez de consultas REST
+    # ([execution] order_reports = false vuelve a consultar cada orden por REST)
+    orders: Optional[OrderTracker] = None
+    order_reports: Optional[OrderReportClient] = None
+    if client.token and config.getboolean(
+        "execution", "order_reports", fallback=True
+    ):
+        orders = OrderTracker()
+        # Al reconectar, el websocket usa el token renovado
+        order_reports = OrderReportClient(
+            lambda: client.token, account, orders, url=ws_url
+        )
+        order_reports.start()
+
+    def on_token(token: str) -> None:
+        # El websocket de market data usa el token renovado al reconectar
+        websocket_client.token = token
+
+    client.tokens.listeners.append(on_token)
+
+    # [risk] enabled = true controla saldo y nominales antes de cada orden con
+    # una cache cargada de la Risk API y actualizada con nuestros fills
+    risk: Optional[PositionCache] = None
+    if config.getboolean("risk", "enabled", fallback=False):
+        risk = PositionCache.from_instruments(client, account, instrumentos)
+        # Si la carga inicial falla, la primera reconciliación la reemplaza
+        risk.bootstrap()
+        risk.start_reconciler(
+            config.getfloat("risk", "reconcile_interval", fallback=60.0)
+        )
+        if orders is not None:
+            orders.listeners.append(risk.on_report)
+
+    # [execution] max_active_arbitrages = N lanza hasta N arbitrajes a la vez sin
+    # bloquear la estrategia; max_exposure topea los pesos comprometidos
+    manager: Optional[OrderManager] = None
+    max_active = config.getint("execution", "max_active_arbitrages", fallback=0)
+    if max_active > 0:
+        max_exposure = config.getfloat("execution", "max_exposure", fallback=0)
+        manager = OrderManager(max_active, max_exposure or None)
+
+    # [execution] concurrent_legs = true envía las patas en paralelo (legs.py)
+    executer = Executer(
+        account=account,
+        client=client,
+        tracer=tracer,
+        concurrent_legs=config.getboolean(
+            "execution", "concurrent_legs", fallback=False
+        ),
+        orders=orders,
+        manager=manager,
+        risk=risk,
+        depth=data_manager.depth,
+    )
 
     websocket_client.start_market_data_websocket(
         symbols=symbols_to_subscribe,
         on_data_callback=data_manager.market_data_callback,
-        depth=1,  # 1 = solo top of book
+        depth=depth,  # 1 = solo top of book
         entries="LA,BI,OF",  # Last, Bid, Offer, Volume
     )
 
+    # [schedule] enabled = true ajusta el intervalo a la rueda y a la actividad
+    scheduler = open_scheduler(UPDATE_SLEEP_INTERVAL)
+
     try:
         # Keep the main thread alive while the WebSocket listens
         while True:
-            time.sleep(3)
-            snapshot = copy.deepcopy(instrumentos)
-            executer.execute(
-                snapshot
-            )  # pasar una copia para evitar modificaciones concurrentes
+            scheduler.sleep()
+            if not scheduler.is_open():
+                continue
+            # Snapshot coherente del libro, sin copiar: el websocket sigue
+            # escribiendo en otro buffer mientras se ejecuta la estrategia
+            with data_manager.snapshot() as snap:
+                scheduler.observe_snapshot(snap)
+                executer.execute(snap.records(instrumentos))
     except KeyboardInterrupt:
         logger.info("Exiting...")
         websocket_client.stop_websocket()
+        if manager is not None:
+            logger.info("Esperando arbitrajes en curso...")
+            manager.shutdown(wait=True)
+            logger.info(f"Arbitrajes: {manager.stats()}")
+        if executer.legs is not None:
+            executer.legs.shutdown()
+        if order_reports is not None:
+            order_reports.stop()
+        if risk is not None:
+            risk.stop()
+            logger.info(f"Posiciones: {risk.snapshot()}")
+        logger.info(f"Cadencia: {scheduler.stats()}")
+        logger.info("⏱️ Latencias por etapa:\n" + tracer.format_summary())
+        logger.info("🌐 Conexiones HTTP por endpoint:\n" + format_all_stats())
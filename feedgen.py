@@ -0,0 +1,170 @@
+"""
+Generador determinístico de market data sintética.
+
+Arma un universo de pares (pesos, dólares) y emite ticks en los dos dialectos
+del websocket: registros con pipes de Matriz (``M:bm_MERV_AL30_24hs|...``) y
+mensajes JSON ``Md`` de Primary. Con la misma semilla la secuencia es siempre
+la misma, así que sirve para comparar benchmarks entre commits.
+
+Los precios de cada pata oscilan alrededor de un valor base con un spread fijo
+y la pata en dólares se deriva del mismo MEP para todo el universo, de modo que
+por defecto no aparecen arbitrajes (los Executer de example_v1/v2 no envían
+órdenes). Con ``arbitrage_rate`` se cruza el libro en una fracción de los ticks.
+"""
+
+import json
+import random
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from mdparser import SYMBOL_FORMAT, TOPIC_FORMAT
+from tape import TapeWriter
+
+DEFAULT_MEP = 1200.0
+DEFAULT_SPREAD = 0.01  # ancho total compra-venta, relativo al precio medio
+DEFAULT_NOISE = 0.001  # ruido del precio medio en cada tick
+
+
+def make_universe(size: int) -> List[Tuple[str, str]]:
+    """
+    Pares (ticker pesos, ticker dólares) de tamaño ``size``, empezando por AL30
+    (los Executer de example_v1/v2 lo usan de referencia).
+    """
+    pairs = [("AL30", "AL30D")]
+    pairs += [(f"SY{i:03d}O", f"SY{i:03d}D") for i in range(1, size)]
+    return pairs[:size]
+
+
+class SyntheticFeed:
+    """Secuencia reproducible de ticks de punta para un universo de pares."""
+
+    def __init__(
+        self,
+        pairs: Sequence[Sequence[str]],
+        plazos: Sequence[str] = ("24hs", "CI"),
+        seed: int = 0,
+        mep: float = DEFAULT_MEP,
+        spread: float = DEFAULT_SPREAD,
+        noise: float = DEFAULT_NOISE,
+        arbitrage_rate: float = 0.0,
+    ) -> None:
+        """
+        Args:
+            pairs: Pares (ticker pesos, ticker dólares)
+            plazos: Plazos para los que se emiten ticks
+            seed: Semilla del generador
+            mep: Tipo de cambio implícito entre las dos patas
+            spread: Ancho compra-venta relativo
+            noise: Desvío relativo del precio medio por tick
+            arbitrage_rate: Fracción de ticks con la punta cruzada
+        """
+        self.pairs = [tuple(p) for p in pairs]
+        self.plazos = tuple(plazos)
+        self.mep = mep
+        self.spread = spread
+        self.noise = noise
+        self.arbitrage_rate = arbitrage_rate
+        self._rng = random.Random(seed)
+        # Precio base en pesos por par; la pata en dólares es base / mep
+        self._base = [self._rng.uniform(500.0, 150000.0) for _ in self.pairs]
+
+    def ticks(self, n: int) -> Iterator[Tuple[str, str, float, float, int, int]]:
+        """
+        Genera ``n`` ticks.
+
+        Yields:
+            (ticker, plazo, compra, venta, tamaño compra, tamaño venta)
+        """
+        rng = self._rng
+        npairs = len(self.pairs)
+        half = self.spread / 2
+        for _ in range(n):
+            row = rng.randrange(npairs)
+            leg = rng.randrange(2)
+            plazo = self.plazos[rng.randrange(len(self.plazos))]
+            mid = self._base[row] * (1.0 + rng.uniform(-self.noise, self.noise))
+            if leg:
+                mid /= self.mep
+            bid, ask = mid * (1.0 - half), mid * (1.0 + half)
+            if self.arbitrage_rate and rng.random() < self.arbitrage_rate:
+                # Punta cruzada: la pata se corre más que el spread contra el MEP
+                shift = 1.0 + 2 * self.spread
+                if leg:
+                    shift = 1.0 / shift
+                bid, ask = bid * shift, ask * shift
+            yield (
+                self.pairs[row][leg],
+                plazo,
+                round(bid, 2 if leg == 0 else 4),
+                round(ask, 2 if leg == 0 else 4),
+                rng.randrange(1, 50000),
+                rng.randrange(1, 50000),
+            )
+
+    # ====================== MATRIZ (PIPES) ======================
+    def pipe_records(self, n: int) -> List[str]:
+        """Registros ``M:bm_MERV_<ticker>_<plazo>|...`` como los del websocket."""
+        return [
+            "|".join(
+                (
+                    TOPIC_FORMAT.format(ticker=ticker, plazo=plazo),
+                    "0",
+                    str(bsize),
+                    f"{bid}",
+                    f"{ask}",
+                    str(asize),
+                    "",
+                )
+            )
+            for ticker, plazo, bid, ask, bsize, asize in self.ticks(n)
+        ]
+
+    def pipe_frames(self, n: int, batch: int = 1) -> List[str]:
+        """Frames crudos: registros sueltos o arrays JSON de ``batch`` registros."""
+        records = self.pipe_records(n)
+        if batch <= 1:
+            return records
+        return [
+            json.dumps(records[i : i + batch], separators=(",", ":"))
+            for i in range(0, len(records), batch)
+        ]
+
+    # ====================== PRIMARY (JSON) ======================
+    def md_messages(self, n: int) -> List[Dict]:
+        """Mensajes ``Md`` ya decodificados, como los recibe ``update_df``."""
+        return [
+            {
+                "type": "Md",
+                "timestamp": i,
+                "instrumentId": {
+                    "marketId": "ROFX",
+                    "symbol": SYMBOL_FORMAT.format(ticker=ticker, plazo=plazo),
+                },
+                "marketData": {
+                    "BI": [{"price": bid, "size": bsize}],
+                    "OF": [{"price": ask, "size": asize}],
+                },
+            }
+            for i, (ticker, plazo, bid, ask, bsize, asize) in enumerate(self.ticks(n))
+        ]
+
+    def md_frames(self, n: int) -> List[str]:
+        """Mensajes ``Md`` serializados, como llegan por el websocket."""
+        return [json.dumps(m, separators=(",", ":")) for m in self.md_messages(n)]
+
+
+def write_tape(
+    path: str,
+    frames: Sequence[str],
+    rate: float = 1000.0,
+    start_ns: Optional[int] = None,
+) -> None:
+    """
+    Graba frames sintéticos en un archivo .tape (ver tape.py) a ``rate``
+    frames por segundo, para reproducirlos con ``tape.replay``.
+    """
+    t0 = time.time_ns() if start_ns is None else start_ns
+    step = int(1e9 / rate)
+    with TapeWriter(path) as writer:
+        for i, frame in enumerate(frames):
+            writer.write(frame, ts_ns=t0 + i * step)
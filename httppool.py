@@ -0,0 +1,320 @@
+"""
+Sesiones HTTP compartidas con pool de conexiones keep-alive.
+
+Un ``requests.get`` suelto abre una conexión TCP+TLS nueva en cada llamada. Acá
+hay una ``PooledSession`` por host, compartida por todo el proceso
+(``get_session``), que mantiene las conexiones abiertas y las reutiliza:
+
+- ``prewarm`` abre de antemano varias conexiones en paralelo (una por orden que
+  pueda salir a la vez) y, opcionalmente, las mantiene vivas con un ping
+  periódico para que el servidor no las cierre por inactividad. Así el camino
+  de órdenes no paga el handshake.
+- Cada llamada lleva un nombre de endpoint (``send_order``, ``panel``, ...)
+  que define su timeout (conexión, lectura) y agrupa las estadísticas.
+- Con ``tokens`` (un TokenManager, ver tokens.py) cada request lleva el token
+  vigente y un 401/403 se reintenta una vez con uno renovado.
+- ``stats``/``format_stats`` cuentan, por endpoint, requests, conexiones nuevas
+  (el resto reutilizó una del pool), errores y tiempo medio.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from tabulate import tabulate
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+
+from tokens import AUTH_ERRORS, TokenManager
+
+logger = logging.getLogger(__name__)
+
+Timeout = Union[float, Tuple[float, float]]
+
+DEFAULT_TIMEOUT: Timeout = (3.05, 15)  # (conexión, lectura)
+POOL_SIZE = 8  # conexiones que se guardan por host
+KEEPALIVE_INTERVAL = 30.0
+
+# Timeouts por endpoint de la API Primary (CocosMatrizClient). Las órdenes
+# fallan rápido: es mejor reintentar con precios nuevos que esperar 15 s.
+PRIMARY_TIMEOUTS: Dict[str, Timeout] = {
+    "login": (5, 15),
+    "send_order": (2, 5),
+    "cancel_order": (2, 5),
+    "order_status": (2, 5),
+    "orders": (2, 10),
+    "snapshot": (2, 10),
+    "instruments": (5, 30),
+    "positions": (3, 10),
+    "detailed_positions": (3, 10),
+    "portfolio": (3, 10),
+}
+
+# Timeouts por endpoint de Balanz (dolarMEP.py, xirr.py)
+BALANZ_TIMEOUTS: Dict[str, Timeout] = {
+    "auth": (5, 20),
+    "notificaciones": (3, 10),
+    "panel": (3, 15),
+}
+
+
+# Handshakes (connect) hechos por el hilo actual; cada request corre entero en
+# el hilo que lo llama, así que la diferencia antes/después es exacta
+_local = threading.local()
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self) -> None:
+        _local.connects = getattr(_local, "connects", 0) + 1
+        super().connect()
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self) -> None:
+        _local.connects = getattr(_local, "connects", 0) + 1
+        super().connect()
+
+
+class _CountingHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class EndpointStats:
+    """Contadores de un endpoint."""
+
+    __slots__ = ("requests", "new_connections", "errors", "elapsed")
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.new_connections = 0
+        self.errors = 0
+        self.elapsed = 0.0
+
+    @property
+    def reused(self) -> int:
+        return max(self.requests - self.new_connections, 0)
+
+
+class PooledSession:
+    """``requests.Session`` con pool keep-alive, timeouts y estadísticas."""
+
+    def __init__(
+        self,
+        timeouts: Optional[Dict[str, Timeout]] = None,
+        default_timeout: Timeout = DEFAULT_TIMEOUT,
+        pool_size: int = POOL_SIZE,
+    ) -> None:
+        """
+        Args:
+            timeouts: Timeout por nombre de endpoint
+            default_timeout: Timeout de los endpoints que no están en ``timeouts``
+            pool_size: Conexiones ociosas que se guardan por host
+        """
+        self.timeouts = dict(timeouts or {})
+        self.default_timeout = default_timeout
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self._adapter.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPPool,
+            "https": _CountingHTTPSPool,
+        }
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        self._stats: Dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+        self._keepalive: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        endpoint: Optional[str] = None,
+        tokens: Optional[TokenManager] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Igual que ``requests.request`` pero por el pool.
+
+        Args:
+            endpoint: Nombre para el timeout y las estadísticas; por defecto, la
+                ruta de la URL
+            tokens: Si se indica, pone su token en el header y, si la respuesta
+                es 401/403, reintenta una vez con un token renovado
+            **kwargs: Argumentos de requests; ``timeout`` pisa el del endpoint
+        """
+        name = endpoint or urlsplit(url).path
+        kwargs.setdefault("timeout", self.timeouts.get(name, self.default_timeout))
+        if tokens is None:
+            return self._send(method, url, name, **kwargs)
+        headers = dict(kwargs.pop("headers", None) or {})
+        token = headers[tokens.header] = tokens.get()
+        response = self._send(method, url, name, headers=headers, **kwargs)
+        if response.status_code in AUTH_ERRORS:
+            logger.warning(f"{name}: token rechazado ({response.status_code})")
+            headers[tokens.header] = tokens.refresh(stale=token)
+            response = self._send(method, url, name, headers=headers, **kwargs)
+        return response
+
+    def _send(self, method: str, url: str, name: str, **kwargs) -> requests.Response:
+        before = getattr(_local, "connects", 0)
+        start = time.perf_counter()
+        error = False
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            error = True
+            raise
+        finally:
+            self._record(
+                name,
+                getattr(_local, "connects", 0) - before,
+                time.perf_counter() - start,
+                error,
+            )
+
+    def _record(self, name: str, new: int, elapsed: float, error: bool = False) -> None:
+        with self._lock:
+            st = self._stats.get(name)
+            if st is None:
+                st = self._stats[name] = EndpointStats()
+            if error:
+                st.errors += 1
+                return
+            st.requests += 1
+            st.new_connections += new
+            st.elapsed += elapsed
+
+    def get(self, url: str, endpoint: Optional[str] = None, **kwargs):
+        return self.request("GET", url, endpoint, **kwargs)
+
+    def post(self, url: str, endpoint: Optional[str] = None, **kwargs):
+        return self.request("POST", url, endpoint, **kwargs)
+
+    # ---------- conexiones precalentadas ----------
+    def prewarm(
+        self,
+        url: str,
+        connections: int = 2,
+        keepalive: Optional[float] = None,
+    ) -> int:
+        """
+        Abre ``connections`` conexiones a ``url`` en paralelo y las deja en el
+        pool.
+
+        Args:
+            url: URL barata del host (se pide con HEAD; la respuesta no importa)
+            connections: Conexiones a abrir; no más que ``pool_size``
+            keepalive: Si se indica, repite el ping cada tantos segundos en un
+                hilo daemon para que el servidor no cierre las conexiones
+
+        Returns:
+            int: Conexiones que respondieron
+        """
+        ok: List[bool] = []
+
+        def ping() -> None:
+            try:
+                self.request("HEAD", url, endpoint="prewarm", timeout=(3.05, 5))
+                ok.append(True)
+            except requests.RequestException as e:
+                logger.warning(f"No se pudo precalentar {url}: {e}")
+
+        def ping_all() -> None:
+            # En paralelo, para que cada ping tome (o abra) una conexión distinta
+            threads = [threading.Thread(target=ping) for _ in range(connections)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        ping_all()
+        logger.info(f"Pool HTTP: {len(ok)}/{connections} conexiones abiertas a {url}")
+
+        if keepalive and self._keepalive is None:
+
+            def loop() -> None:
+                while not self._stop.wait(keepalive):
+                    ok.clear()
+                    ping_all()
+
+            self._keepalive = threading.Thread(
+                target=loop, name="http-keepalive", daemon=True
+            )
+            self._keepalive.start()
+        return len(ok)
+
+    def close(self) -> None:
+        self._stop.set()
+        self.session.close()
+
+    # ---------- estadísticas ----------
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Por endpoint: requests, conexiones nuevas, reutilizadas, errores y ms."""
+        with self._lock:
+            return {
+                name: {
+                    "requests": st.requests,
+                    "new_connections": st.new_connections,
+                    "reused": st.reused,
+                    "reuse_pct": (
+                        100.0 * st.reused / st.requests if st.requests else 0.0
+                    ),
+                    "errors": st.errors,
+                    "mean_ms": 1e3 * st.elapsed / st.requests if st.requests else 0.0,
+                }
+                for name, st in self._stats.items()
+            }
+
+    def format_stats(self) -> str:
+        rows: List[List[Any]] = [
+            [name, s["requests"], s["new_connections"], s["reuse_pct"], s["errors"]]
+            + [s["mean_ms"]]
+            for name, s in self.stats().items()
+        ]
+        return tabulate(
+            rows,
+            headers=["endpoint", "n", "nuevas", "reuso_%", "errores", "ms"],
+            floatfmt=".1f",
+            tablefmt="simple",
+        )
+
+
+_sessions: Dict[str, PooledSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(
+    base_url: str, timeouts: Optional[Dict[str, Timeout]] = None
+) -> PooledSession:
+    """
+    Sesión compartida del proceso para el host de ``base_url``.
+
+    Args:
+        base_url: URL del host (se usa esquema + host como clave)
+        timeouts: Timeouts por endpoint; se suman a los ya registrados
+    """
+    parts = urlsplit(base_url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = PooledSession(timeouts)
+        elif timeouts:
+            session.timeouts.update(timeouts)
+        return session
+
+
+def format_all_stats() -> str:
+    """Estadísticas de todas las sesiones compartidas, para loguear."""
+    with _sessions_lock:
+        items = list(_sessions.items())
+    return "\n".join(f"{host}\n{s.format_stats()}" for host, s in items)
@@ -0,0 +1,162 @@
+"""
+Universo de instrumentos compartido, cargado de instruments.json.
+
+Los pares pesos/dólares/cable estaban escritos a mano en cada script, con
+contenidos distintos. instruments.json los define una sola vez:
+
+- ``instruments``: un registro por instrumento con sus tickers por pata
+  (``ticker`` pesos, ``tickerD`` dólares MEP, ``tickerC`` cable).
+- ``universes``: qué instrumentos usa cada script (o panel de dolarMEP), en
+  el orden del libro, qué patas forman el par (``legs``, por defecto pesos y
+  dólares) y sus atributos: un mapa ticker → valor (``max_quant``) o una lista
+  de pertenencia (``mis_activos``).
+- ``defaults``: valor de cada atributo para los que no lo definen.
+
+Al cargar, cada universo se compila una sola vez en ids enteros, tablas
+tópico de Matriz / símbolo de Primary → (id, pata, plazo) y atributos por id.
+``load_registry`` guarda el resultado, así que todos los módulos de un mismo
+proceso comparten las mismas tablas.
+"""
+
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+from mdparser import SYMBOL_FORMAT, TOPIC_FORMAT, Target
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_FILE = os.path.join(PROJECT_ROOT, "instruments.json")
+DEFAULT_LEGS = ("ticker", "tickerD")
+PLAZOS = ("24hs", "CI")
+
+
+class Universe:
+    """Instrumentos de un script compilados en tablas de búsqueda."""
+
+    def __init__(
+        self,
+        name: str,
+        records: Sequence[Dict[str, Any]],
+        legs: Sequence[str] = DEFAULT_LEGS,
+        plazos: Sequence[str] = PLAZOS,
+    ) -> None:
+        """
+        Args:
+            name: Nombre del universo en instruments.json
+            records: Registro de cada instrumento (tickers y atributos), en el
+                orden del libro
+            legs: Campos de ticker que forman el par (pata 0, pata 1)
+            plazos: Plazos para los que se arman las tablas de tópicos/símbolos
+        """
+        self.name = name
+        self.legs = tuple(legs)
+        self.attrs: List[Dict[str, Any]] = [dict(r) for r in records]
+        self.pairs: List[List[str]] = [[r[leg] for leg in self.legs] for r in self.attrs]
+        self.keys: List[str] = [p[0] for p in self.pairs]
+        self.ids: Dict[str, int] = {}
+        for i, key in enumerate(self.keys):
+            self.ids.setdefault(key, i)
+        self.topics: Dict[str, Target] = {}
+        self.symbols: Dict[str, Target] = {}
+        for i, pair in enumerate(self.pairs):
+            for leg, ticker in enumerate(pair):
+                for plazo in plazos:
+                    target = (i, leg, plazo)
+                    fields = {"ticker": ticker, "plazo": plazo}
+                    self.topics.setdefault(TOPIC_FORMAT.format(**fields), target)
+                    self.symbols.setdefault(SYMBOL_FORMAT.format(**fields), target)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __repr__(self) -> str:
+        return f"Universe({self.name!r}, {len(self)} instrumentos)"
+
+    def tagged(self, attr: str) -> List[str]:
+        """Tickers (pata 0) con el atributo ``attr`` verdadero, en orden."""
+        return [k for k, a in zip(self.keys, self.attrs) if a.get(attr)]
+
+    def tagged_ids(self, attr: str) -> List[int]:
+        """Ids con el atributo ``attr`` verdadero (ej. para RatioEvaluator)."""
+        return [i for i, a in enumerate(self.attrs) if a.get(attr)]
+
+    def attr(self, ticker: str, name: str, default: Any = None) -> Any:
+        """Atributo de un instrumento por su ticker de pata 0."""
+        i = self.ids.get(ticker)
+        return default if i is None else self.attrs[i].get(name, default)
+
+
+class InstrumentRegistry:
+    """Contenido de instruments.json con los universos ya compilados."""
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        """
+        Raises:
+            KeyError: Si un universo nombra un ticker que no está en
+                ``instruments`` o al que le falta alguna de sus patas
+        """
+        self.defaults: Dict[str, Any] = dict(data.get("defaults", {}))
+        self.instruments: Dict[str, Dict[str, Any]] = {}
+        for record in data["instruments"]:
+            self.instruments.setdefault(record["ticker"], record)
+        self.universes: Dict[str, Universe] = {
+            name: self._compile(name, spec)
+            for name, spec in data.get("universes", {}).items()
+        }
+
+    def _compile(self, name: str, spec: Dict[str, Any]) -> Universe:
+        legs = spec.get("legs", DEFAULT_LEGS)
+        records = []
+        for ticker in spec["tickers"]:
+            if ticker not in self.instruments:
+                raise KeyError(f"{name}: {ticker} no está en instruments")
+            # Los defaults solo completan lo que el instrumento no define
+            record = {**self.defaults, **self.instruments[ticker]}
+            missing = [leg for leg in legs if leg not in record]
+            if missing:
+                raise KeyError(f"{name}: {ticker} no tiene {', '.join(missing)}")
+            records.append(record)
+        for attr, values in spec.items():
+            if attr in ("legs", "tickers"):
+                continue
+            # Lista = pertenencia; mapa = valor por ticker
+            if isinstance(values, list):
+                values = dict.fromkeys(values, True)
+            for record in records:
+                if record["ticker"] in values:
+                    record[attr] = values[record["ticker"]]
+                elif isinstance(spec[attr], list):
+                    record[attr] = False
+        return Universe(name, records, legs)
+
+    def universe(self, name: str) -> Universe:
+        """
+        Raises:
+            KeyError: Si el universo no está definido
+        """
+        try:
+            return self.universes[name]
+        except KeyError:
+            raise KeyError(f"Universo {name!r} no definido en instruments.json")
+
+    def prefixed(self, prefix: str) -> Dict[str, Universe]:
+        """Universos cuyo nombre empieza con ``prefix.`` (ej. paneles)."""
+        head = prefix + "."
+        return {
+            name[len(head) :]: u
+            for name, u in self.universes.items()
+            if name.startswith(head)
+        }
+
+
+@lru_cache(maxsize=None)
+def load_registry(path: Optional[str] = None) -> InstrumentRegistry:
+    """Lee y compila instruments.json una vez por proceso y ruta."""
+    with open(path or REGISTRY_FILE, "r", encoding="utf-8") as f:
+        return InstrumentRegistry(json.load(f))
+
+
+def get_universe(name: str, path: Optional[str] = None) -> Universe:
+    """Atajo de ``load_registry(path).universe(name)``."""
+    return load_registry(path).universe(name)
@@ -0,0 +1,271 @@
+"""
+Latencia tick-to-order por etapa.
+
+Cada frame se estampa con un reloj monotónico (``time.perf_counter_ns``) al
+recibirlo, al terminar de decodificarlo y al publicar el lote en el libro. La
+hora de recepción queda asociada a la secuencia del commit, así que cuando el
+Executer detecta una oportunidad sobre una fila de un snapshot se recupera el
+tick que la escribió por última vez y se mide desde ahí:
+
+    parse          recepción → frame decodificado
+    book           decodificado → commit en el QuoteBook
+    signal         recepción del último tick de la fila → oportunidad detectada
+    send           oportunidad → orden enviada (antes del request REST)
+    ack            orden enviada → respuesta del REST
+    tick_to_order  recepción → orden enviada
+
+Los tiempos se acumulan en histogramas log-lineales al estilo HDR: 64
+sub-buckets por potencia de dos (error relativo < 1.6 %), registro O(1) sin
+asignar memoria, así que se pueden dejar activos en producción.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from tabulate import tabulate
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("parse", "book", "signal", "send", "ack", "tick_to_order")
+SUB_BITS = 7  # 2**7 valores exactos; después 64 sub-buckets por octava
+MAX_BITS = 42  # ~73 minutos en ns; valores mayores caen en el último bucket
+RING_SIZE = 4096  # commits recientes cuya hora de recepción se recuerda
+REPORT_INTERVAL = 60.0
+
+_SUB_COUNT = 1 << SUB_BITS
+_HALF = _SUB_COUNT >> 1
+_BUCKETS = _HALF * (MAX_BITS - SUB_BITS + 2)
+_NO_MIN = 1 << 62
+
+now_ns = time.perf_counter_ns
+
+
+def _index(value: int) -> int:
+    if value < _SUB_COUNT:
+        return value if value > 0 else 0
+    e = value.bit_length() - SUB_BITS
+    return min((e + 1) * _HALF + (value >> e) - _HALF, _BUCKETS - 1)
+
+
+def _lower(index: int) -> int:
+    if index < _SUB_COUNT:
+        return index
+    e = index // _HALF - 1
+    return (index % _HALF + _HALF) << e
+
+
+class LatencyHistogram:
+    """Histograma log-lineal de latencias en nanosegundos."""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * _BUCKETS
+        self.reset()
+
+    def reset(self) -> None:
+        for i in range(_BUCKETS):
+            self.counts[i] = 0
+        self.count = 0
+        self.total = 0
+        self.min = _NO_MIN
+        self.max = 0
+
+    def record(self, value: int) -> None:
+        """Agrega una muestra (ns). Un solo hilo escritor por histograma."""
+        # Índice inline (ver _index): esto corre en cada frame
+        if value < _SUB_COUNT:
+            i = value if value > 0 else 0
+        else:
+            e = value.bit_length() - SUB_BITS
+            i = (e + 1) * _HALF + (value >> e) - _HALF
+            if i >= _BUCKETS:
+                i = _BUCKETS - 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if value < self.min:
+            self.min = value
+
+    def percentile(self, q: float) -> float:
+        """
+        Valor (ns) por debajo del cual cae la fracción ``q`` de las muestras.
+
+        Returns:
+            float: Punto medio del bucket, acotado a [min, max]; 0 sin muestras
+        """
+        if not self.count:
+            return 0.0
+        target = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if not c:
+                continue
+            seen += c
+            if seen >= target:
+                lo, hi = _lower(i), _lower(i + 1)
+                return float(min(max((lo + hi) / 2, self.min), self.max))
+        return float(self.max)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        if not other.count:
+            return
+        for i, c in enumerate(other.counts):
+            if c:
+                self.counts[i] += c
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def summary(self) -> Dict[str, float]:
+        """Cantidad y percentiles en microsegundos."""
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count / 1e3 if self.count else 0.0,
+            "p50_us": self.percentile(0.50) / 1e3,
+            "p90_us": self.percentile(0.90) / 1e3,
+            "p99_us": self.percentile(0.99) / 1e3,
+            "p999_us": self.percentile(0.999) / 1e3,
+            "min_us": self.min / 1e3 if self.count else 0.0,
+            "max_us": self.max / 1e3,
+        }
+
+
+class Trace:
+    """Estampas de una oportunidad: tick de origen y detección."""
+
+    __slots__ = ("origin", "signal")
+
+    def __init__(self, origin: Optional[int], signal: int) -> None:
+        self.origin = origin
+        self.signal = signal
+
+
+class LatencyTracer:
+    """Histogramas por etapa y la relación secuencia del libro → recepción."""
+
+    def __init__(self, ring_size: int = RING_SIZE) -> None:
+        self.histograms: Dict[str, LatencyHistogram] = {
+            stage: LatencyHistogram() for stage in STAGES
+        }
+        self._parse = self.histograms["parse"]
+        self._book = self.histograms["book"]
+        self._ring_size = ring_size
+        self._ring_seq = [0] * ring_size
+        self._ring_ns = [0] * ring_size
+        # Las etapas de órdenes pueden registrarse desde varios hilos
+        self._order_lock = threading.Lock()
+        self._reporter: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---------- market data (hilo del websocket) ----------
+    def frame(self, received: int, parsed: int, seq: int) -> None:
+        """
+        Registra un frame ya publicado en el libro.
+
+        Args:
+            received: Estampa de recepción (now_ns() al entrar a on_message)
+            parsed: Estampa al terminar de decodificar
+            seq: Secuencia devuelta por ``QuoteBook.commit()``
+        """
+        done = now_ns()
+        self._parse.record(parsed - received)
+        self._book.record(done - parsed)
+        i = seq % self._ring_size
+        self._ring_ns[i] = received
+        self._ring_seq[i] = seq
+
+    def origin(self, seq: int) -> Optional[int]:
+        """Recepción del frame que publicó ``seq``; None si ya salió del anillo."""
+        i = seq % self._ring_size
+        if seq <= 0 or self._ring_seq[i] != seq:
+            return None
+        return self._ring_ns[i]
+
+    # ---------- estrategia / órdenes ----------
+    def signal(self, item: Any) -> Trace:
+        """
+        Marca la detección de una oportunidad sobre ``item``.
+
+        Args:
+            item: Fila de ``Snapshot.records`` (QuoteRow); con un dict común no
+                se conoce el tick de origen y solo se miden las órdenes
+        """
+        t = now_ns()
+        snap = getattr(item, "_snap", None)
+        origin = self.origin(int(snap.stamp[item._row])) if snap is not None else None
+        if origin is not None:
+            with self._order_lock:
+                self.histograms["signal"].record(t - origin)
+        return Trace(origin, t)
+
+    def sent(self, trace: Optional[Trace]) -> int:
+        """Estampa justo antes de enviar una orden; devuelve la estampa."""
+        t = now_ns()
+        if trace is not None:
+            with self._order_lock:
+                self.histograms["send"].record(t - trace.signal)
+                if trace.origin is not None:
+                    self.histograms["tick_to_order"].record(t - trace.origin)
+        return t
+
+    def acked(self, sent: int) -> None:
+        """Registra la respuesta de una orden enviada en ``sent``."""
+        t = now_ns()
+        with self._order_lock:
+            self.histograms["ack"].record(t - sent)
+
+    # ---------- consulta ----------
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Percentiles por etapa en microsegundos (ver LatencyHistogram.summary)."""
+        return {stage: h.summary() for stage, h in self.histograms.items()}
+
+    def reset(self) -> None:
+        for h in self.histograms.values():
+            h.reset()
+
+    def format_summary(self) -> str:
+        rows: List[List[Any]] = [
+            [stage, s["count"], s["p50_us"], s["p90_us"], s["p99_us"], s["max_us"]]
+            for stage, s in self.summary().items()
+            if s["count"]
+        ]
+        if not rows:
+            return "Sin muestras de latencia"
+        return tabulate(
+            rows,
+            headers=["etapa", "n", "p50_us", "p90_us", "p99_us", "max_us"],
+            floatfmt=",.1f",
+            tablefmt="simple",
+        )
+
+    def start_reporter(
+        self, interval: float = REPORT_INTERVAL, reset: bool = False
+    ) -> threading.Thread:
+        """
+        Loguea el resumen cada ``interval`` segundos en un hilo daemon.
+
+        Args:
+            reset: Si es True cada resumen cubre solo el último intervalo
+        """
+
+        def loop() -> None:
+            while not self._stop.wait(interval):
+                logger.info("⏱️ Latencias por etapa:\n" + self.format_summary())
+                if reset:
+                    self.reset()
+
+        self._stop.clear()
+        self._reporter = threading.Thread(
+            target=loop, name="latency-report", daemon=True
+        )
+        self._reporter.start()
+        return self._reporter
+
+    def stop_reporter(self) -> None:
+        self._stop.set()
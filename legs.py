@@ -0,0 +1,387 @@
+"""
+Ejecución concurrente de las patas de un arbitraje MEP.
+
+En ``Executer.dolarizar``/``pesificar`` cada pata espera a la anterior: orden,
+consulta de estado, orden complementaria, consulta, y después lo mismo para la
+cobertura con AL30. Acá las cuatro órdenes (compra y venta del instrumento,
+compra y venta de AL30) salen juntas desde un pool de hilos y los acks se
+correlacionan por clOrdId a medida que llegan, así que el arbitraje tarda
+alrededor de un round trip REST.
+
+Como las patas ya no se encadenan, la que llene menos se completa al final con
+una orden MARKET por la diferencia (``balance``) para no quedar con posición en
+el bono. Una pata que no respondió a tiempo se cancela y se consulta por
+clOrdId antes de balancear; si su estado sigue siendo desconocido no se
+balancea, porque la orden original todavía podría llenar y duplicar la
+posición. La cobertura con AL30 es en sí misma un par compra/venta, así que si el
+instrumento no llena queda una conversión pesos ↔ dólares a precio de AL30 y no
+una posición abierta; se avisa en el log.
+"""
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from mdparser import SYMBOL_FORMAT
+from orderstream import TERMINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+LEG_TIMEOUT = 30  # segundos para esperar los acks de un lote de patas
+RESOLVE_TIMEOUT = 10  # segundos extra para el envío de una pata sin ack
+# Estados cuyo cumQty es lo llenado; una orden cancelada o vencida puede haber
+# llenado parte antes (ver LegExecutor._resolve)
+FILLED_STATUSES = ("FILLED", "PARTIALLY_FILLED", "CANCELLED", "EXPIRED")
+
+
+class Leg:
+    """Una orden de un arbitraje."""
+
+    __slots__ = ("symbol", "side", "quantity", "price", "ord_type")
+
+    def __init__(
+        self,
+        symbol: str,
+        side: str,
+        quantity: int,
+        price: Optional[float] = None,
+        ord_type: str = "LIMIT",
+    ) -> None:
+        self.symbol = symbol
+        self.side = side
+        self.quantity = quantity
+        self.price = price if ord_type == "LIMIT" else None
+        self.ord_type = ord_type
+
+    def __repr__(self) -> str:
+        price = f" @ {self.price}" if self.price is not None else ""
+        return f"{self.side} {self.quantity} {self.symbol} {self.ord_type}{price}"
+
+
+class LegResult:
+    """Ack y estado de una pata ya enviada."""
+
+    __slots__ = (
+        "leg",
+        "cl_ord_id",
+        "proprietary",
+        "status",
+        "cum_qty",
+        "avg_px",
+        "resolved",
+    )
+
+    def __init__(
+        self,
+        leg: Leg,
+        cl_ord_id: Optional[str] = None,
+        proprietary: Optional[str] = None,
+        status: Optional[str] = None,
+        cum_qty: float = 0,
+        avg_px: Optional[float] = None,
+        resolved: bool = True,
+    ) -> None:
+        """
+        Args:
+            resolved: False si no se sabe en qué terminó la orden (puede seguir
+                viva en el mercado)
+        """
+        self.leg = leg
+        self.cl_ord_id = cl_ord_id
+        self.proprietary = proprietary
+        self.status = status
+        self.cum_qty = cum_qty
+        self.avg_px = avg_px
+        self.resolved = resolved
+
+    @property
+    def filled(self) -> float:
+        return self.cum_qty if self.status in FILLED_STATUSES else 0
+
+    def merge(self, other: Optional["LegResult"]) -> "LegResult":
+        """Suma una orden de completado (ver LegExecutor.balance) a esta pata."""
+        if other is None or not other.filled:
+            return self
+        total = self.filled + other.filled
+        avg = (
+            ((self.avg_px or 0) * self.filled + (other.avg_px or 0) * other.filled)
+            / total
+            if self.avg_px is not None and other.avg_px is not None
+            else self.avg_px or other.avg_px
+        )
+        return LegResult(
+            self.leg, self.cl_ord_id, self.proprietary, "FILLED", total, avg
+        )
+
+
+def order_report(response: Any) -> Dict:
+    """``order`` de la respuesta de get_orders_by_clor_id (dict o lista)."""
+    if isinstance(response, list):
+        response = response[0] if response else {}
+    if not isinstance(response, dict):
+        return {}
+    return response.get("order", {}) or {}
+
+
+def mep_legs(
+    item: Dict, quant: int, dolarizar: bool, order_type: str = "LIMIT"
+) -> Tuple[Leg, Leg]:
+    """
+    Patas (compra, venta) de una conversión con un instrumento.
+
+    Args:
+        item: Instrumento con ticker, tickerD y precios de punta
+        quant: Nominales de cada pata
+        dolarizar: True = comprar en pesos y vender en dólares; False = al revés
+        order_type: LIMIT (a la punta) o MARKET
+
+    Returns:
+        Tuple[Leg, Leg]: (compra, venta)
+    """
+    pesos = SYMBOL_FORMAT.format(ticker=item["ticker"], plazo="24hs")
+    dolares = SYMBOL_FORMAT.format(ticker=item["tickerD"], plazo="24hs")
+    if dolarizar:
+        return (
+            Leg(pesos, "BUY", quant, item["prVentaPesos"], order_type),
+            Leg(dolares, "SELL", quant, item["prCompraDolar"], order_type),
+        )
+    return (
+        Leg(dolares, "BUY", quant, item["prVentaDolar"], order_type),
+        Leg(pesos, "SELL", quant, item["prCompraPesos"], order_type),
+    )
+
+
+def price_ratio(buy: LegResult, sell: LegResult, dolarizar: bool) -> Optional[float]:
+    """Pesos por dólar obtenidos: precio pata pesos / precio pata dólares."""
+    pesos, dolares = (buy, sell) if dolarizar else (sell, buy)
+    if pesos.avg_px is None or not dolares.avg_px:
+        return None
+    return pesos.avg_px / dolares.avg_px
+
+
+class LegExecutor:
+    """Envía patas en paralelo y junta sus acks."""
+
+    def __init__(
+        self,
+        client: Any,
+        account: str,
+        send: Optional[Callable[..., Dict]] = None,
+        workers: int = DEFAULT_WORKERS,
+        status: Optional[Callable[[str, str], Any]] = None,
+    ) -> None:
+        """
+        Args:
+            client: CocosMatrizClient (send_order, get_orders_by_clor_id,
+                cancel_order)
+            account: Cuenta de las órdenes
+            send: Reemplazo de ``client.send_order`` (ej. ``Executer._send_order``
+                para estampar latencias)
+            workers: Hilos del pool; con 4 salen juntas las dos patas y la
+                cobertura
+            status: Reemplazo de ``client.get_orders_by_clor_id`` (ej.
+                ``Executer._order_status``, que espera el execution report push)
+        """
+        self.client = client
+        self.account = account
+        self.send = send or client.send_order
+        self.status = status or client.get_orders_by_clor_id
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="legs")
+
+    def _run_leg(self, leg: Leg, sent: Optional[LegResult] = None) -> LegResult:
+        """
+        Envía una pata, espera su estado y cancela el remanente.
+
+        Args:
+            sent: Se le anotan clOrdId y proprietary apenas llega el ack del
+                envío, para poder cancelar la orden si la pata no termina a
+                tiempo (ver _resolve)
+        """
+        response = self.send(
+            symbol=leg.symbol,
+            side=leg.side,
+            quantity=leg.quantity,
+            price=leg.price,
+            ord_type=leg.ord_type,
+            market_id="ROFX",
+            account=self.account,
+            time_in_force="DAY",
+        )
+        if not response or "error" in response:
+            logger.error(f"Error enviando {leg}: {response}")
+            return LegResult(leg)
+        order = response.get("order", {})
+        cl_ord_id, prop = order.get("clientId"), order.get("proprietary")
+        if not cl_ord_id or not prop:
+            logger.error(f"No se obtuvo clOrdId o proprietary para {leg}")
+            return LegResult(leg)
+        if sent is not None:
+            sent.cl_ord_id, sent.proprietary = cl_ord_id, prop
+
+        report = order_report(self.status(cl_ord_id, prop))
+        status = report.get("status")
+        result = LegResult(
+            leg,
+            cl_ord_id,
+            prop,
+            status,
+            report.get("cumQty", 0) or 0,
+            report.get("avgPx"),
+        )
+        if status != "FILLED":
+            logger.warning(f"{leg} no filled (status={status}); se cancela")
+            self.client.cancel_order(cl_ord_id, prop)
+        return result
+
+    def run(self, legs: Sequence[Leg], timeout: float = LEG_TIMEOUT) -> List[LegResult]:
+        """
+        Envía todas las patas a la vez y espera sus acks.
+
+        Returns:
+            List[LegResult]: En el orden de ``legs``; una pata cuyo envío fue
+            rechazado vuelve sin clOrdId ni cantidad, y una que no respondió a
+            tiempo se resuelve con _resolve (``resolved=False`` si no se pudo)
+        """
+        sent = [LegResult(leg, resolved=False) for leg in legs]
+        futures = {
+            self.pool.submit(self._run_leg, leg, sent[i]): i
+            for i, leg in enumerate(legs)
+        }
+        results: List[LegResult] = list(sent)
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    logger.error(f"Error ejecutando {legs[i]}: {e}")
+                    continue
+                r = results[i]
+                logger.info(
+                    f"Ack {r.cl_ord_id}: {r.leg} → {r.status}, cumQty={r.cum_qty}"
+                    f", avgPx={r.avg_px}"
+                )
+        except FuturesTimeout:
+            logger.error(f"Timeout esperando acks de {len(legs)} patas")
+        for future, i in futures.items():
+            if not results[i].resolved:
+                results[i] = self._resolve(sent[i], future)
+        return results
+
+    def _resolve(self, pending: LegResult, future: Future) -> LegResult:
+        """
+        Estado final de una pata que falló o no respondió a tiempo: si ya tiene
+        clOrdId se cancela y se consulta; si no, se espera un poco más su envío.
+
+        Returns:
+            LegResult: Con ``resolved=False`` si no se pudo saber en qué terminó
+        """
+        leg = pending.leg
+        if pending.cl_ord_id is None:
+            try:
+                return future.result(timeout=RESOLVE_TIMEOUT)
+            except FuturesTimeout:
+                pass
+            except Exception as e:
+                logger.error(f"Error ejecutando {leg}: {e}")
+            if pending.cl_ord_id is None:
+                logger.error(f"Estado desconocido de {leg}: el envío no respondió")
+                return pending
+        cl_ord_id, prop = pending.cl_ord_id, pending.proprietary
+        try:
+            self.client.cancel_order(cl_ord_id, prop)
+            report = order_report(self.status(cl_ord_id, prop))
+        except Exception as e:
+            logger.error(f"No se pudo cancelar/consultar {cl_ord_id} ({leg}): {e}")
+            return pending
+        status = report.get("status")
+        if status not in TERMINAL_STATUSES:
+            logger.error(f"Estado desconocido de {cl_ord_id} ({leg}): {status}")
+            return pending
+        logger.warning(f"{leg} resuelta tras el timeout: {status}")
+        return LegResult(
+            leg,
+            cl_ord_id,
+            prop,
+            status,
+            report.get("cumQty", 0) or 0,
+            report.get("avgPx"),
+        )
+
+    def balance(self, buy: LegResult, sell: LegResult) -> Optional[LegResult]:
+        """
+        Completa a mercado la pata que llenó menos para no dejar posición en el
+        instrumento.
+
+        Returns:
+            Optional[LegResult]: Orden de completado, o None si ya cerraba o
+            alguna pata tiene estado desconocido
+        """
+        if not buy.resolved or not sell.resolved:
+            logger.error(
+                f"No se balancea {buy.leg} / {sell.leg}: hay una pata con estado"
+                " desconocido; revisar la posición a mano"
+            )
+            return None
+        diff = buy.filled - sell.filled
+        if not diff:
+            return None
+        lagging = sell if diff > 0 else buy
+        leg = Leg(lagging.leg.symbol, lagging.leg.side, int(abs(diff)), None, "MARKET")
+        logger.warning(f"Patas desbalanceadas en {diff:+g} nominales → {leg}")
+        return self._run_leg(leg)
+
+    def _balanced(self, buy: LegResult, sell: LegResult) -> Tuple[LegResult, LegResult]:
+        fix = self.balance(buy, sell)
+        if fix is None:
+            return buy, sell
+        if fix.leg.side == "BUY":
+            return buy.merge(fix), sell
+        return buy, sell.merge(fix)
+
+    def arbitrage(
+        self,
+        item: Dict,
+        quant: int,
+        al30: Dict,
+        quant_al30: int,
+        dolarizar: bool,
+        order_type: str = "LIMIT",
+    ) -> Tuple[bool, Optional[float], Optional[float]]:
+        """
+        Conversión con ``item`` y la inversa con AL30, todo en paralelo.
+
+        Args:
+            item: Instrumento del arbitraje
+            quant: Nominales del instrumento
+            al30: Instrumento de cobertura
+            quant_al30: Nominales de AL30 (0 = sin cobertura)
+            dolarizar: Sentido de la conversión con ``item``
+            order_type: Tipo de orden del instrumento; AL30 va a MARKET
+
+        Returns:
+            Tuple[bool, Optional[float], Optional[float]]: (el instrumento
+            llenó algo, pesos por dólar del instrumento, pesos por dólar de AL30)
+        """
+        legs = list(mep_legs(item, quant, dolarizar, order_type))
+        if quant_al30 > 0:
+            legs += mep_legs(al30, quant_al30, not dolarizar, "MARKET")
+        results = self.run(legs)
+        buy, sell = self._balanced(results[0], results[1])
+        ratio = price_ratio(buy, sell, dolarizar)
+
+        ratio_al30 = None
+        if quant_al30 > 0:
+            buy_al30, sell_al30 = self._balanced(results[2], results[3])
+            ratio_al30 = price_ratio(buy_al30, sell_al30, not dolarizar)
+            if not buy.filled and buy_al30.filled:
+                logger.warning(
+                    f"{item['ticker']} no llenó pero AL30 sí: queda una conversión"
+                    " pesos/dólares a precio de AL30"
+                )
+        return bool(buy.filled), ratio, ratio_al30
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=True)
@@ -0,0 +1,309 @@
+"""
+Ruteo precompilado de market data hacia el QuoteBook.
+
+A partir de la lista de pares que se suscriben se arma, una sola vez, un
+diccionario que lleva cada identificador completo directo a su fila y columnas
+del libro, para los dos dialectos del websocket:
+
+- Matriz (pipes): tópico ``M:bm_MERV_AL30D_24hs``. Por registro solo se separan
+  los primeros campos: 0 tópico, 2 tamaño compra, 3 precio compra, 4 precio
+  venta, 5 tamaño venta.
+- Primary (JSON ``Md``): símbolo ``MERV - XMEV - AL30D - 24hs``.
+"""
+
+import json
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from quotebook import QuoteBook
+
+TOPIC_PREFIX = "M:bm_MERV_"
+SUBSCRIPTION_PREFIX = "md.bm_MERV_"
+TOPIC_FORMAT = TOPIC_PREFIX + "{ticker}_{plazo}"
+SYMBOL_FORMAT = "MERV - XMEV - {ticker} - {plazo}"
+EMPTY_PRICE = -100.0
+NAN = float("nan")
+TOPIC_FIELDS = 6  # campos que lee decode: tópico .. tamaño venta
+
+# (compra, venta, tamaño compra, tamaño venta) por (pata, plazo).
+# Pata 0 es el primer ticker del par (pesos), pata 1 el segundo (dólares).
+LEG_COLUMNS: Dict[Tuple[int, str], Tuple[Optional[str], ...]] = {
+    (0, "24hs"): ("prCompraPesos", "prVentaPesos", "siCompraPesos", "siVentaPesos"),
+    (0, "CI"): (
+        "prCompraPesosCI",
+        "prVentaPesosCI",
+        "siCompraPesosCI",
+        "siVentaPesosCI",
+    ),
+    (1, "24hs"): ("prCompraDolar", "prVentaDolar", "siCompraDolar", "siVentaDolar"),
+    (1, "CI"): (
+        "prCompraDolarCI",
+        "prVentaDolarCI",
+        "siCompraDolarCI",
+        "siVentaDolarCI",
+    ),
+}
+
+# (fila, compra, venta, tamaño compra, tamaño venta); -1 = campo que no se guarda
+Route = Tuple[int, int, int, int, int]
+# Registro de pipes ya separado: (ruta, compra, venta, tamaño compra, tamaño venta)
+Tick = Tuple[Route, float, float, float, float]
+# Escritura de una celda del libro: (fila, columna, valor)
+Cell = Tuple[int, int, float]
+# Identificador ya formateado → (fila, pata, plazo); ver instruments.Universe
+Target = Tuple[int, int, str]
+
+
+def compile_routes(
+    book: QuoteBook,
+    pairs: Sequence[Sequence[str]],
+    plazos: Sequence[str],
+    leg_columns: Dict[Tuple[int, str], Tuple[Optional[str], ...]],
+    key_format: str,
+    targets: Optional[Mapping[str, Target]] = None,
+) -> Dict[str, Route]:
+    """
+    Arma la tabla identificador → celdas del libro.
+
+    Args:
+        book: Libro donde se escriben los ticks (fila i = par i)
+        pairs: Pares (ticker pata 0, ticker pata 1, ...) en el orden del libro
+        plazos: Plazos suscriptos
+        leg_columns: Columnas del libro para cada (pata, plazo); las que el
+            libro no tenga se ignoran
+        key_format: Formato del identificador (TOPIC_FORMAT o SYMBOL_FORMAT)
+        targets: Identificadores ya compilados del universo de ``pairs``
+            (``Universe.topics`` o ``Universe.symbols``); si se pasan no se
+            formatea ningún identificador
+
+    Returns:
+        Dict[str, Route]: Ruta por identificador; si un ticker aparece dos
+        veces se queda la primera
+    """
+    if targets is None:
+        targets = {}
+        for row, pair in enumerate(pairs):
+            for leg in (0, 1):
+                for plazo in plazos:
+                    key = key_format.format(ticker=pair[leg], plazo=plazo)
+                    targets.setdefault(key, (row, leg, plazo))  # type: ignore
+    columns = {}
+    for (leg, plazo), names in leg_columns.items():
+        if plazo not in plazos:
+            continue
+        cols = [book.col.get(c, -1) if c else -1 for c in names]
+        cols += [-1] * (4 - len(cols))
+        if cols[0] >= 0 and cols[1] >= 0:  # el libro guarda precios de la pata
+            columns[(leg, plazo)] = cols
+    routes: Dict[str, Route] = {}
+    for key, (row, leg, plazo) in targets.items():
+        cols = columns.get((leg, plazo))
+        if cols is not None:
+            routes[key] = (row, *cols)  # type: ignore
+    return routes
+
+
+class TopicParser:
+    """Lleva registros ``M:bm_MERV_...`` directo a celdas del libro."""
+
+    def __init__(
+        self,
+        book: QuoteBook,
+        pairs: Sequence[Sequence[str]],
+        plazos: Sequence[str] = ("24hs", "CI"),
+        leg_columns: Dict[Tuple[int, str], Tuple[Optional[str], ...]] = LEG_COLUMNS,
+        targets: Optional[Mapping[str, Target]] = None,
+    ) -> None:
+        """Compila la tabla de rutas tópico → celdas (ver compile_routes)."""
+        self.book = book
+        self.routes = compile_routes(
+            book, pairs, plazos, leg_columns, TOPIC_FORMAT, targets
+        )
+        self.invalid = 0  # registros truncados o con números inválidos
+
+    def topics(self) -> List[str]:
+        """Tópicos de suscripción (``md.bm_MERV_...``), sin repetidos."""
+        return [SUBSCRIPTION_PREFIX + t[len(TOPIC_PREFIX) :] for t in self.routes]
+
+    def subscription_message(self) -> str:
+        return json.dumps(
+            {"_req": "S", "topicType": "md", "topics": self.topics(), "replace": False},
+            separators=(",", ":"),
+        )
+
+    def decode(self, record: str) -> Optional[Tick]:
+        """
+        Separa un registro sin tocar el libro, para poder decodificar fuera del
+        hilo que escribe (ver aioclient.py).
+
+        Returns:
+            Optional[Tick]: None si el tópico no está suscripto o el registro
+                está truncado o mal formado (se cuenta en ``invalid``)
+        """
+        vals = record.split("|", 6)
+        route = self.routes.get(vals[0])
+        if route is None:
+            return None
+        if len(vals) < TOPIC_FIELDS:
+            self.invalid += 1
+            return None
+        try:
+            return (
+                route,
+                float(vals[3]) if vals[3] else EMPTY_PRICE,
+                float(vals[4]) if vals[4] else EMPTY_PRICE,
+                float(vals[2]) if vals[2] else NAN,
+                float(vals[5]) if vals[5] else NAN,
+            )
+        except ValueError:
+            self.invalid += 1
+            return None
+
+    def decode_frame(self, message: str) -> List[Tick]:
+        """
+        Decodifica un frame crudo completo (ver apply_frame) sin tocar el libro.
+
+        Raises:
+            json.JSONDecodeError: Si el frame no es un registro ni JSON válido
+        """
+        if not message or message[0] == "X":
+            return []
+        records = [message] if message[0] == "M" else json.loads(message)
+        decode = self.decode
+        ticks = []
+        for record in records:
+            tick = decode(record if isinstance(record, str) else str(record))
+            if tick is not None:
+                ticks.append(tick)
+        return ticks
+
+    def write(self, tick: Tick) -> None:
+        """Escribe un registro ya decodificado, sin publicar el lote."""
+        (row, bid_col, ask_col, bid_size_col, ask_size_col), bid, ask, bsz, asz = tick
+        book = self.book
+        book.set_quote(row, bid_col, ask_col, bid, ask)
+        if bid_size_col >= 0:
+            book.set_quote(row, bid_size_col, ask_size_col, bsz, asz)
+
+    def apply(self, record: str) -> bool:
+        """
+        Aplica un registro al libro sin publicar el lote.
+
+        Returns:
+            bool: True si el tópico estaba suscripto
+        """
+        tick = self.decode(record)
+        if tick is None:
+            return False
+        self.write(tick)
+        return True
+
+    def apply_records(self, records: Iterable) -> int:
+        """Aplica una lista de registros y publica el lote una sola vez."""
+        apply = self.apply
+        n = 0
+        for record in records:
+            n += apply(record if isinstance(record, str) else str(record))
+        self.book.commit()
+        return n
+
+    def apply_frame(self, message: str) -> int:
+        """
+        Aplica un frame crudo del websocket: un registro suelto (``M:...``) o un
+        array JSON de registros, que se decodifica en una sola llamada.
+
+        Returns:
+            int: Cantidad de registros aplicados (0 si no es market data)
+
+        Raises:
+            json.JSONDecodeError: Si el frame no es un registro ni JSON válido
+        """
+        if not message or message[0] == "X":
+            return 0
+        if message[0] == "M":
+            n = self.apply(message)
+            self.book.commit()
+            return int(n)
+        return self.apply_records(json.loads(message))
+
+
+class SymbolRegistry:
+    """Lleva mensajes ``Md`` de Primary directo a celdas del libro."""
+
+    def __init__(
+        self,
+        book: QuoteBook,
+        pairs: Sequence[Sequence[str]],
+        plazos: Sequence[str] = ("24hs", "CI"),
+        leg_columns: Dict[Tuple[int, str], Tuple[Optional[str], ...]] = LEG_COLUMNS,
+        clear_missing: bool = True,
+        targets: Optional[Mapping[str, Target]] = None,
+    ) -> None:
+        """
+        Compila la tabla de rutas símbolo → celdas (ver compile_routes).
+
+        Args:
+            clear_missing: Si es False, una punta ausente o en cero no pisa el
+                último valor del libro
+        """
+        self.book = book
+        self.routes = compile_routes(
+            book, pairs, plazos, leg_columns, SYMBOL_FORMAT, targets
+        )
+        self.clear_missing = clear_missing
+
+    def symbols(self) -> List[str]:
+        """Símbolos para la suscripción ``smd``, sin repetidos."""
+        return list(self.routes)
+
+    def decode(self, data: Dict) -> Optional[List[Cell]]:
+        """
+        Traduce un mensaje ``Md`` a escrituras de celdas sin tocar el libro.
+
+        Returns:
+            Optional[List[Cell]]: None si el símbolo no está registrado o el
+            mensaje no trae market data
+        """
+        md = data.get("marketData")
+        if not md:
+            return None
+        route = self.routes.get(data["instrumentId"]["symbol"])
+        if route is None:
+            return None
+        row, bid_col, ask_col, bid_size_col, ask_size_col = route
+        cells: List[Cell] = []
+        for entry, price_col, size_col in (
+            (md.get("BI"), bid_col, bid_size_col),
+            (md.get("OF"), ask_col, ask_size_col),
+        ):
+            top = entry[0] if entry else None
+            price = top.get("price") if top else None
+            if price:
+                cells.append((row, price_col, float(price)))
+            elif self.clear_missing:
+                cells.append((row, price_col, NAN))
+            else:
+                continue
+            if size_col >= 0:
+                size = top.get("size") if top else None
+                cells.append((row, size_col, float(size) if size is not None else NAN))
+        return cells
+
+    def write(self, cells: Iterable[Cell]) -> None:
+        """Escribe celdas ya decodificadas, sin publicar el lote."""
+        set_value = self.book.set_value
+        for row, col, value in cells:
+            set_value(row, col, value)
+
+    def apply(self, data: Dict) -> bool:
+        """
+        Aplica un mensaje ``Md`` al libro y publica el lote.
+
+        Returns:
+            bool: True si el símbolo estaba registrado y traía market data
+        """
+        cells = self.decode(data)
+        if cells is None:
+            return False
+        self.write(cells)
+        self.book.commit()
+        return True
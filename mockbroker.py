@@ -0,0 +1,804 @@
+"""
+Broker local que imita la API Primary de Cocos y el websocket de Matriz.
+
+Sirve para probar CocosMatrizClient, los dos dialectos de market data y la
+ejecución sin conectarse al broker real, y para medir tick-to-fill y throughput
+de punta a punta:
+
+- REST (HTTP/1.1 keep-alive): ``/auth/getToken``, ``/rest/order/newSingleOrder``,
+  ``/rest/order/id``, ``/rest/order/cancelById``, ``/rest/order/{actives,
+  filleds,all}``, ``/rest/marketdata/get`` y ``/rest/instruments/details``.
+- Websocket en ``/`` con el protocolo de Primary: suscripciones ``smd`` (market
+  data ``Md``) y ``os`` (execution reports ``or``), con ``x-auth-token``.
+- Websocket en ``/ws`` con el protocolo de Matriz: ``{"_req": "S", "topics":
+  [...]}`` y registros con pipes ``M:bm_MERV_...``.
+- ``MatchingEngine``: la liquidez de fondo es la punta que marca el guion de
+  precios; las órdenes propias la consumen al llegar y las que quedan en
+  reposo se cruzan cuando el precio las alcanza.
+- Latencia configurable en cada respuesta REST y en cada mensaje websocket.
+
+Uso::
+
+    python mockbroker.py serve --port 9000 --rest-latency 5
+    python mockbroker.py bench --seconds 20 --pairs 20
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import websockets
+from tabulate import tabulate
+
+from feedgen import DEFAULT_MEP, DEFAULT_SPREAD, SyntheticFeed, make_universe
+from latency import LatencyHistogram, now_ns
+from mdparser import SUBSCRIPTION_PREFIX, SYMBOL_FORMAT, TOPIC_FORMAT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 9000  # websocket; REST en el puerto siguiente
+TOKEN = "mock-token"
+PROPRIETARY = "PBCP"
+DEFAULT_SIZE = 1000  # tamaño de la liquidez de fondo de los guiones sintéticos
+CROSS_EDGE = 0.015  # cuánto se corre la punta en pesos en un cruce sintético
+TERMINAL_STATUSES = ("FILLED", "CANCELLED", "REJECTED")
+
+# Paso de un guion de precios: (segundos desde el inicio, ticker, plazo, compra,
+# venta, tamaño compra, tamaño venta)
+Step = Tuple[float, str, str, float, float, float, float]
+
+
+# ====================== GUIONES DE PRECIOS ======================
+def load_script(path: str) -> List[Step]:
+    """
+    Guion desde un JSON: lista de ``{"at", "ticker", "plazo", "bid", "ask",
+    "bid_size", "ask_size"}`` (plazo 24hs y tamaños DEFAULT_SIZE por defecto).
+    """
+    with open(path, encoding="utf-8") as f:
+        rows = json.load(f)
+    return sorted(
+        (
+            (
+                float(r["at"]),
+                r["ticker"],
+                r.get("plazo", "24hs"),
+                float(r["bid"]),
+                float(r["ask"]),
+                float(r.get("bid_size", DEFAULT_SIZE)),
+                float(r.get("ask_size", DEFAULT_SIZE)),
+            )
+            for r in rows
+        ),
+        key=lambda s: s[0],
+    )
+
+
+def synthetic_script(
+    pairs: Sequence[Sequence[str]],
+    seconds: float,
+    rate: float = 200.0,
+    crossing_every: float = 0.0,
+    seed: int = 0,
+    mep: float = DEFAULT_MEP,
+) -> List[Step]:
+    """
+    Guion con los ticks de ``feedgen.SyntheticFeed`` y, opcionalmente, cruces
+    periódicos contra AL30.
+
+    Args:
+        pairs: Pares (ticker pesos, ticker dólares); el primero es AL30
+        seconds: Duración del guion
+        rate: Ticks por segundo
+        crossing_every: Cada cuántos segundos se baja la punta vendedora en
+            pesos de un instrumento (rotando, sin AL30) lo suficiente para que
+            dolarizar con él convenga contra AL30; 0 = sin cruces
+        seed: Semilla de SyntheticFeed
+        mep: Tipo de cambio implícito
+    """
+    feed = SyntheticFeed(pairs, plazos=("24hs",), seed=seed, mep=mep)
+    steps: List[Step] = []
+    dollar_bid: Dict[str, float] = {}
+    next_cross, k = crossing_every, 0
+    ticks = feed.ticks(int(seconds * rate))
+    for i, (ticker, plazo, bid, ask, _, _) in enumerate(ticks):
+        at = i / rate
+        steps.append((at, ticker, plazo, bid, ask, DEFAULT_SIZE, DEFAULT_SIZE))
+        dollar_bid[ticker] = bid
+        if crossing_every and at >= next_cross and len(pairs) > 1:
+            pesos, dolares = pairs[1 + k % (len(pairs) - 1)]
+            k += 1
+            next_cross += crossing_every
+            if dolares in dollar_bid:
+                cross_ask = round(dollar_bid[dolares] * mep * (1 - CROSS_EDGE), 2)
+                cross_bid = round(cross_ask * (1 - DEFAULT_SPREAD), 2)
+                steps.append(
+                    (at, pesos, plazo, cross_bid, cross_ask, DEFAULT_SIZE, DEFAULT_SIZE)
+                )
+    return steps
+
+
+# ====================== MOTOR DE MATCHING ======================
+def _transact_time() -> str:
+    return datetime.now().strftime("%Y%m%d-%H:%M:%S.%f")[:-3] + "-0300"
+
+
+class MatchingEngine:
+    """Órdenes de una cuenta contra la liquidez de fondo del guion."""
+
+    def __init__(self) -> None:
+        # símbolo → [compra, venta, tamaño compra, tamaño venta, último]
+        self.quotes: Dict[str, List[float]] = {}
+        self.orders: Dict[str, Dict] = {}  # clOrdId → report actual
+        self.fills = 0
+        self.listeners: List[Any] = []  # se llaman con cada report nuevo
+        self._resting: Dict[str, List[Dict]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _publish(self, order: Dict) -> None:
+        order["transactTime"] = _transact_time()
+        order["execId"] = str(next(self._ids))
+        report = dict(order)
+        for listener in self.listeners:
+            listener(report)
+
+    def _fill(self, order: Dict, qty: float, price: float) -> None:
+        cum = order["cumQty"] + qty
+        order["avgPx"] = (order["avgPx"] * order["cumQty"] + price * qty) / cum
+        order["cumQty"] = cum
+        order["leavesQty"] = order["orderQty"] - cum
+        order["lastPx"], order["lastQty"] = price, qty
+        order["status"] = "FILLED" if order["leavesQty"] <= 0 else "PARTIALLY_FILLED"
+        self.fills += 1
+        q = self.quotes[order["instrumentId"]["symbol"]]
+        q[4] = price
+        self._publish(order)
+
+    def _match(self, order: Dict) -> bool:
+        """Cruza ``order`` contra la punta de fondo. True si hubo fill."""
+        q = self.quotes.get(order["instrumentId"]["symbol"])
+        if q is None or order["leavesQty"] <= 0:
+            return False
+        market = order["ordType"] == "MARKET"
+        if order["side"] == "BUY":
+            price, size = q[1], q[3]
+            crosses = size > 0 and (market or order["price"] >= price)
+        else:
+            price, size = q[0], q[2]
+            crosses = size > 0 and (market or order["price"] <= price)
+        if not crosses or price != price:  # NaN = sin punta
+            return False
+        qty = min(order["leavesQty"], size)
+        if order["side"] == "BUY":
+            q[3] -= qty
+        else:
+            q[2] -= qty
+        self._fill(order, qty, price)
+        return True
+
+    def new_order(self, params: Mapping[str, str]) -> Tuple[Dict, bool]:
+        """
+        Alta de una orden con los parámetros de ``newSingleOrder``.
+
+        Returns:
+            Tuple[Dict, bool]: (report, consumió liquidez de fondo)
+        """
+        symbol = params.get("symbol", "")
+        ord_type = params.get("ordType", "LIMIT").upper()
+        cl_ord_id = f"mock{next(self._ids)}"
+        order = {
+            "orderId": cl_ord_id,
+            "clOrdId": cl_ord_id,
+            "proprietary": PROPRIETARY,
+            "accountId": {"id": params.get("account", "")},
+            "instrumentId": {
+                "marketId": params.get("marketId", "ROFX"),
+                "symbol": symbol,
+            },
+            "price": float(params["price"]) if params.get("price") else None,
+            "orderQty": float(params.get("orderQty", 0)),
+            "ordType": ord_type,
+            "side": params.get("side", "BUY").upper(),
+            "timeInForce": params.get("timeInForce", "DAY"),
+            "avgPx": 0.0,
+            "lastPx": 0.0,
+            "lastQty": 0.0,
+            "cumQty": 0.0,
+            "leavesQty": float(params.get("orderQty", 0)),
+            "status": "NEW",
+            "text": "",
+        }
+        with self._lock:
+            self.orders[cl_ord_id] = order
+            if symbol not in self.quotes or order["orderQty"] <= 0 or (
+                ord_type == "LIMIT" and order["price"] is None
+            ):
+                order["status"], order["text"] = "REJECTED", "Orden inválida"
+                order["leavesQty"] = 0.0
+                self._publish(order)
+                return dict(order), False
+            self._publish(order)
+            filled = self._match(order)
+            if order["leavesQty"] > 0:
+                if ord_type == "MARKET":
+                    # El remanente de una orden a mercado no queda en el libro
+                    order["status"], order["leavesQty"] = "CANCELLED", 0.0
+                    self._publish(order)
+                else:
+                    self._resting.setdefault(symbol, []).append(order)
+            return dict(order), filled
+
+    def cancel(self, cl_ord_id: str) -> Optional[Dict]:
+        with self._lock:
+            order = self.orders.get(cl_ord_id)
+            if order is None:
+                return None
+            if order["status"] not in TERMINAL_STATUSES:
+                order["status"], order["leavesQty"] = "CANCELLED", 0.0
+                resting = self._resting.get(order["instrumentId"]["symbol"], [])
+                if order in resting:
+                    resting.remove(order)
+                self._publish(order)
+            return dict(order)
+
+    def get(self, cl_ord_id: str) -> Optional[Dict]:
+        with self._lock:
+            order = self.orders.get(cl_ord_id)
+            return dict(order) if order is not None else None
+
+    def list_orders(self, which: str) -> List[Dict]:
+        with self._lock:
+            orders = list(self.orders.values())
+        if which == "actives":
+            orders = [o for o in orders if o["status"] in ("NEW", "PARTIALLY_FILLED")]
+        elif which == "filleds":
+            orders = [o for o in orders if o["status"] == "FILLED"]
+        return [dict(o) for o in orders]
+
+    def quote(
+        self,
+        symbol: str,
+        bid: float,
+        ask: float,
+        bid_size: float,
+        ask_size: float,
+    ) -> None:
+        """Nueva punta de fondo; cruza las órdenes en reposo que alcanza."""
+        with self._lock:
+            q = self.quotes.get(symbol)
+            last = q[4] if q is not None else float("nan")
+            self.quotes[symbol] = [bid, ask, bid_size, ask_size, last]
+            resting = self._resting.get(symbol)
+            if resting:
+                for order in list(resting):
+                    self._match(order)
+                    if order["leavesQty"] <= 0:
+                        resting.remove(order)
+
+    def market_data(self, symbol: str) -> Optional[Dict]:
+        """``marketData`` de Primary para ``symbol`` (BI, OF y LA)."""
+        q = self.quotes.get(symbol)
+        if q is None:
+            return None
+        bid, ask, bid_size, ask_size, last = q
+        md: Dict[str, Any] = {
+            "BI": [{"price": bid, "size": bid_size}] if bid_size > 0 else [],
+            "OF": [{"price": ask, "size": ask_size}] if ask_size > 0 else [],
+        }
+        if last == last:  # sin operaciones no se informa LA
+            md["LA"] = {"price": last, "size": 0}
+        return md
+
+
+# ====================== BROKER ======================
+class MockBroker:
+    """Servidor websocket (Primary y Matriz) y REST sobre un MatchingEngine."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        rest_port: Optional[int] = None,
+        script: Sequence[Step] = (),
+        rest_latency: float = 0.0,
+        ws_latency: float = 0.0,
+        loop_script: bool = False,
+        pairs: Optional[Sequence[Sequence[str]]] = None,
+    ) -> None:
+        """
+        Args:
+            host: Interfaz donde escuchar
+            port: Puerto websocket (``/`` Primary, ``/ws`` Matriz)
+            rest_port: Puerto REST; por defecto ``port + 1``
+            script: Guion de precios (ver load_script / synthetic_script)
+            rest_latency: Segundos que se demora cada respuesta REST
+            ws_latency: Segundos que se demora cada mensaje websocket
+            loop_script: Repetir el guion al terminar
+            pairs: Pares (ticker pesos, ticker dólares) para informar la moneda
+                en ``instruments/details``; sin pares, los tickers terminados
+                en D se toman como dólares
+        """
+        self.host = host
+        self.port = port
+        self.rest_port = rest_port or port + 1
+        self.script = list(script)
+        self.rest_latency = rest_latency
+        self.ws_latency = ws_latency
+        self.loop_script = loop_script
+        self.dollar_tickers = {d for _, d in pairs} if pairs else None
+        self.engine = MatchingEngine()
+        self.engine.listeners.append(self._on_report)
+        self.instruments: Set[str] = {SYMBOL_FORMAT.format(ticker=s[1], plazo=s[2])
+                                      for s in self.script}
+        # Suscripciones: websocket → símbolos (market data) / cuentas (reports)
+        self._md_primary: Dict[Any, Set[str]] = {}
+        self._md_matriz: Dict[Any, Set[str]] = {}
+        self._reports: Set[Any] = set()
+        # Estadísticas
+        self.requests: Dict[str, int] = {}
+        self.md_sent = 0
+        self.reports_sent = 0
+        self.steps_done = 0
+        self.histograms = {
+            "tick_to_order": LatencyHistogram(),
+            "tick_to_fill": LatencyHistogram(),
+        }
+        self._tick_ns: Dict[str, int] = {}  # símbolo → emisión de su último tick
+        self._order_tick: Dict[str, int] = {}  # clOrdId → tick de referencia
+        self._stats_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._http: Optional[ThreadingHTTPServer] = None
+        self._ready = threading.Event()
+        self._stop: Optional[asyncio.Event] = None
+
+    @property
+    def rest_url(self) -> str:
+        return f"http://{self.host}:{self.rest_port}"
+
+    @property
+    def primary_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/"
+
+    @property
+    def matriz_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/ws?session_id=mock&conn_id=mock"
+
+    # ---------- websocket ----------
+    def _send(self, ws: Any, message: str) -> None:
+        """Envía desde el loop, con la latencia configurada."""
+
+        async def send() -> None:
+            if self.ws_latency:
+                await asyncio.sleep(self.ws_latency)
+            try:
+                await ws.send(message)
+            except websockets.exceptions.ConnectionClosed:
+                pass
+
+        asyncio.ensure_future(send())
+
+    def _broadcast(self, symbol: str) -> None:
+        md = self.engine.market_data(symbol)
+        if md is None:
+            return
+        self._tick_ns[symbol] = now_ns()
+        primary = matriz = None
+        for ws, symbols in self._md_primary.items():
+            if symbol in symbols:
+                if primary is None:
+                    primary = json.dumps(
+                        {
+                            "type": "Md",
+                            "timestamp": int(time.time() * 1000),
+                            "instrumentId": {"marketId": "ROFX", "symbol": symbol},
+                            "marketData": md,
+                        }
+                    )
+                self._send(ws, primary)
+                self.md_sent += 1
+        for ws, symbols in self._md_matriz.items():
+            if symbol in symbols:
+                if matriz is None:
+                    _, _, ticker, plazo = symbol.split(" - ")
+                    bid, ask, bid_size, ask_size, _ = self.engine.quotes[symbol]
+                    topic = TOPIC_FORMAT.format(ticker=ticker, plazo=plazo)
+                    matriz = f"{topic}|0|{bid_size:g}|{bid}|{ask}|{ask_size:g}|"
+                self._send(ws, matriz)
+                self.md_sent += 1
+
+    def _on_report(self, report: Dict) -> None:
+        """Listener del motor (cualquier hilo): reloj de fills y push ``or``."""
+        cl_ord_id = report["clOrdId"]
+        if report["status"] in ("FILLED", "PARTIALLY_FILLED"):
+            origin = self._order_tick.pop(cl_ord_id, None)
+            if origin is not None:
+                with self._stats_lock:
+                    self.histograms["tick_to_fill"].record(now_ns() - origin)
+        if self._loop is None or not self._reports:
+            return
+        message = json.dumps({"type": "or", "orderReport": report})
+
+        def push() -> None:
+            for ws in list(self._reports):
+                self._send(ws, message)
+                self.reports_sent += 1
+
+        self._loop.call_soon_threadsafe(push)
+
+    async def _handler(self, ws: Any) -> None:
+        path = urlsplit(ws.request.path).path
+        matriz = path.startswith("/ws")
+        if not matriz and ws.request.headers.get("x-auth-token") != TOKEN:
+            await ws.close(1008, "Unauthorized")
+            return
+        try:
+            async for raw in ws:
+                try:
+                    msg = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue
+                if matriz and msg.get("_req") == "S":
+                    symbols = {
+                        SYMBOL_FORMAT.format(ticker=t, plazo=p)
+                        for t, p in (
+                            topic[len(SUBSCRIPTION_PREFIX) :].rsplit("_", 1)
+                            for topic in msg.get("topics", [])
+                        )
+                    }
+                    self._md_matriz.setdefault(ws, set()).update(symbols)
+                elif msg.get("type") == "smd":
+                    symbols = {p["symbol"] for p in msg.get("products", [])}
+                    self._md_primary.setdefault(ws, set()).update(symbols)
+                elif msg.get("type") == "os":
+                    self._reports.add(ws)
+                    continue
+                else:
+                    continue
+                for symbol in symbols:  # foto inicial
+                    self._broadcast(symbol)
+        finally:
+            self._md_primary.pop(ws, None)
+            self._md_matriz.pop(ws, None)
+            self._reports.discard(ws)
+
+    async def _feed(self) -> None:
+        """Reproduce el guion de precios respetando sus tiempos."""
+        loop = asyncio.get_running_loop()
+        while self.script:
+            t0 = loop.time()
+            for at, ticker, plazo, bid, ask, bid_size, ask_size in self.script:
+                delay = t0 + at - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                symbol = SYMBOL_FORMAT.format(ticker=ticker, plazo=plazo)
+                self.engine.quote(symbol, bid, ask, bid_size, ask_size)
+                self._broadcast(symbol)
+                self.steps_done += 1
+            if not self.loop_script:
+                break
+
+    async def run(self) -> None:
+        self._stop = asyncio.Event()
+        async with websockets.serve(self._handler, self.host, self.port):
+            feed = asyncio.create_task(self._feed())
+            self._ready.set()
+            await self._stop.wait()
+            feed.cancel()
+
+    # ---------- REST ----------
+    def _rest(self, method: str, path: str, params: Dict[str, str], headers: Any):
+        """Atiende un request REST. Devuelve (status, cuerpo, headers extra)."""
+        engine = self.engine
+        if path == "/auth/getToken":
+            return 200, {"status": "OK"}, {"X-Auth-Token": TOKEN}
+        if headers.get("X-Auth-Token") != TOKEN:
+            return 401, {"status": "ERROR", "description": "Unauthorized"}, {}
+        if path == "/rest/order/newSingleOrder":
+            symbol = params.get("symbol", "")
+            origin = self._tick_ns.get(symbol)
+            if origin is not None:
+                with self._stats_lock:
+                    self.histograms["tick_to_order"].record(now_ns() - origin)
+            report, filled = engine.new_order(params)
+            if origin is not None:
+                if filled:
+                    with self._stats_lock:
+                        self.histograms["tick_to_fill"].record(now_ns() - origin)
+                elif report["status"] not in TERMINAL_STATUSES:
+                    # Queda en reposo: el fill lo registra _on_report
+                    self._order_tick[report["clOrdId"]] = origin
+            if filled and self._loop is not None:
+                self._loop.call_soon_threadsafe(self._broadcast, symbol)
+            order = {"clientId": report["clOrdId"], "proprietary": PROPRIETARY}
+            return 200, {"status": "OK", "order": order}, {}
+        if path == "/rest/order/id":
+            report = engine.get(params.get("clOrdId", ""))
+            if report is None:
+                return 200, {"status": "ERROR", "description": "Orden inexistente"}, {}
+            return 200, {"status": "OK", "order": report}, {}
+        if path == "/rest/order/cancelById":
+            report = engine.cancel(params.get("clOrdId", ""))
+            if report is None:
+                return 200, {"status": "ERROR", "description": "Orden inexistente"}, {}
+            order = {"clientId": report["clOrdId"], "proprietary": PROPRIETARY}
+            return 200, {"status": "OK", "order": order}, {}
+        if path in ("/rest/order/actives", "/rest/order/filleds", "/rest/order/all"):
+            orders = engine.list_orders(path.rsplit("/", 1)[1])
+            return 200, {"status": "OK", "orders": orders}, {}
+        if path == "/rest/marketdata/get":
+            md = engine.market_data(params.get("symbol", ""))
+            if md is None:
+                return 200, {"status": "ERROR", "description": "Símbolo inválido"}, {}
+            return 200, {"status": "OK", "marketData": md, "depth": 1}, {}
+        if path == "/rest/instruments/details":
+            instruments = [
+                {
+                    "instrumentId": {"marketId": "ROFX", "symbol": s},
+                    "currency": "USD D" if self._dollar(s) else "ARS",
+                    "minPriceIncrement": 0.01,
+                }
+                for s in sorted(self.instruments)
+            ]
+            return 200, {"status": "OK", "instruments": instruments}, {}
+        return 404, {"status": "ERROR", "description": f"No existe {path}"}, {}
+
+    def _dollar(self, symbol: str) -> bool:
+        ticker = symbol.split(" - ")[2]
+        if self.dollar_tickers is None:
+            return ticker.endswith("D")
+        return ticker in self.dollar_tickers
+
+    def _make_handler(self) -> type:
+        broker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, como el broker real
+            # Headers y cuerpo salen en writes separados: sin esto Nagle y el
+            # ACK diferido suman ~40 ms a cada respuesta
+            disable_nagle_algorithm = True
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def _reply(self, status: int, body: bytes, extra: Dict[str, str]) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in extra.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def _handle(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                if broker.rest_latency:
+                    time.sleep(broker.rest_latency)
+                if self.command == "HEAD":
+                    self._reply(200, b"", {})
+                    return
+                parts = urlsplit(self.path)
+                with broker._stats_lock:
+                    broker.requests[parts.path] = broker.requests.get(parts.path, 0) + 1
+                status, body, extra = broker._rest(
+                    self.command, parts.path, dict(parse_qsl(parts.query)), self.headers
+                )
+                self._reply(status, json.dumps(body).encode(), extra)
+
+            do_GET = do_POST = do_HEAD = _handle
+
+        return Handler
+
+    # ---------- ciclo de vida ----------
+    def start(self, timeout: float = 5.0) -> "MockBroker":
+        """Levanta websocket y REST en hilos daemon y espera a que escuchen."""
+        self._http = ThreadingHTTPServer(
+            (self.host, self.rest_port), self._make_handler()
+        )
+        self._http.daemon_threads = True
+        threading.Thread(
+            target=self._http.serve_forever, name="mock-rest", daemon=True
+        ).start()
+        self._loop = asyncio.new_event_loop()
+
+        def target() -> None:
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_until_complete(self.run())  # type: ignore
+            finally:
+                self._loop.close()  # type: ignore
+
+        self._thread = threading.Thread(target=target, name="mock-ws", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError("El broker local no arrancó")
+        logger.info(
+            f"Broker local: REST {self.rest_url} | Primary {self.primary_url}"
+            f" | Matriz {self.matriz_url}"
+        )
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join(5)
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "steps": self.steps_done,
+                "md_sent": self.md_sent,
+                "reports_sent": self.reports_sent,
+                "orders": len(self.engine.orders),
+                "fills": self.engine.fills,
+                "requests": dict(self.requests),
+                "latency": {k: h.summary() for k, h in self.histograms.items()},
+            }
+
+    def format_stats(self) -> str:
+        st = self.stats()
+        rows = [
+            [stage, s["count"], s["p50_us"], s["p90_us"], s["p99_us"], s["max_us"]]
+            for stage, s in st["latency"].items()
+            if s["count"]
+        ]
+        head = (
+            f"ticks={st['steps']} md={st['md_sent']} reports={st['reports_sent']}"
+            f" órdenes={st['orders']} fills={st['fills']}\n"
+        )
+        return head + tabulate(
+            rows,
+            headers=["etapa", "n", "p50_us", "p90_us", "p99_us", "max_us"],
+            floatfmt=",.1f",
+            tablefmt="simple",
+        )
+
+
+# ====================== BENCHMARK DE PUNTA A PUNTA ======================
+def bench(args: argparse.Namespace) -> int:
+    """
+    Corre example_v2 (cliente REST, websocket Primary, execution reports y
+    Executer) contra el broker local y reporta tick-to-fill y throughput.
+    """
+    import example_v2
+    from latency import LatencyTracer
+    from orderstream import OrderReportClient, OrderTracker
+
+    logging.getLogger().setLevel(logging.WARNING)
+    pairs = make_universe(args.pairs)
+    script = synthetic_script(
+        pairs, args.seconds, args.rate, args.crossing_every, args.seed
+    )
+    broker = MockBroker(
+        port=args.port,
+        script=script,
+        rest_latency=args.rest_latency / 1e3,
+        ws_latency=args.ws_latency / 1e3,
+        pairs=pairs,
+    ).start()
+
+    instrumentos = [
+        {"ticker": p, "tickerD": d, "max_quant": args.quant, **{
+            k: None
+            for k in (
+                "prCompraPesos", "prVentaPesos", "prCompraDolar", "prVentaDolar",
+                "siCompraPesos", "siVentaPesos", "siCompraDolar", "siVentaDolar",
+            )
+        }}
+        for p, d in pairs
+    ]
+    client = example_v2.CocosMatrizClient("mock", "mock", base_url=broker.rest_url)
+    tracer = LatencyTracer()
+    data_manager = example_v2.DataManager(instrumentos, tracer, args.depth)
+    ws = example_v2.WebSocketClient(token=client.token, url=broker.primary_url)
+    orders = OrderTracker()
+    reports = OrderReportClient(client.token, "mock", orders, url=broker.primary_url)
+    reports.start()
+    ws.start_market_data_websocket(
+        data_manager.registry.symbols(),
+        data_manager.market_data_callback,
+        depth=args.depth,
+    )
+    executer = example_v2.Executer(
+        "mock", client, tracer, orders=orders, depth=data_manager.depth
+    )
+    time.sleep(args.warmup)  # primeras puntas de todos los instrumentos
+
+    start = time.perf_counter()
+    cycles = 0
+    while time.perf_counter() - start < args.seconds:
+        with data_manager.snapshot() as snap:
+            executer.execute(snap.records(instrumentos))
+        cycles += 1
+        time.sleep(args.interval / 1e3)
+    elapsed = time.perf_counter() - start
+
+    ws.stop_websocket()
+    reports.stop()
+    broker.stop()
+    st = broker.stats()
+    print(f"{elapsed:.1f}s, {cycles} ciclos de estrategia")
+    print(
+        f"throughput: {st['md_sent'] / elapsed:,.0f} md/s,"
+        f" {st['orders'] / elapsed:,.1f} órdenes/s"
+    )
+    print("Broker (desde la emisión del tick):\n" + broker.format_stats())
+    print("Cliente:\n" + tracer.format_summary())
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("serve", "bench"):
+        p = sub.add_parser(name)
+        p.add_argument("--port", type=int, default=DEFAULT_PORT)
+        p.add_argument("--pairs", type=int, default=20)
+        p.add_argument("--rate", type=float, default=200.0, help="ticks por segundo")
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("--rest-latency", type=float, default=0.0, help="ms")
+        p.add_argument("--ws-latency", type=float, default=0.0, help="ms")
+        p.add_argument(
+            "--crossing-every", type=float, default=2.0, help="segundos entre cruces"
+        )
+    serve = sub.choices["serve"]
+    serve.add_argument("--script", help="guion JSON (ver load_script)")
+    serve.add_argument("--seconds", type=float, default=600.0)
+    b = sub.choices["bench"]
+    b.add_argument("--seconds", type=float, default=10.0)
+    b.add_argument("--interval", type=float, default=10.0, help="ms entre ciclos")
+    b.add_argument("--quant", type=int, default=100, help="max_quant por instrumento")
+    b.add_argument("--depth", type=int, default=1, help="niveles por punta")
+    b.add_argument("--warmup", type=float, default=1.0, help="segundos de espera")
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        return bench(args)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  %(message)s")
+    pairs = None if args.script else make_universe(args.pairs)
+    script = (
+        load_script(args.script)
+        if args.script
+        else synthetic_script(
+            pairs, args.seconds, args.rate, args.crossing_every, args.seed
+        )
+    )
+    broker = MockBroker(
+        port=args.port,
+        script=script,
+        rest_latency=args.rest_latency / 1e3,
+        ws_latency=args.ws_latency / 1e3,
+        loop_script=True,
+        pairs=pairs,
+    ).start()
+    print("[endpoints] para config.ini:")
+    print(f"api_url = {broker.rest_url}")
+    print(f"primary_ws_url = {broker.primary_url}")
+    print(f"matriz_ws_url = {broker.matriz_url}")
+    try:
+        while True:
+            time.sleep(10)
+            logger.info("\n" + broker.format_stats())
+    except KeyboardInterrupt:
+        broker.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
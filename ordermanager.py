@@ -0,0 +1,252 @@
+"""
+Arbitrajes en curso como máquinas de estado, varios a la vez.
+
+``Executer.execute`` ejecutaba una sola operación por ciclo y el hilo principal
+quedaba bloqueado mientras corrían sus requests. Con un ``OrderManager`` cada
+oportunidad se lanza como un ``Arbitrage`` en un hilo del pool y la evaluación
+de señales sigue con el próximo snapshot:
+
+    PENDING → LEG1_WORKING → PARTIALLY_FILLED → HEDGE_WORKING → DONE
+                   │                │                 │
+                   └────────────────┴─────────────────┴──────→ FAILED
+
+LEG1_WORKING cubre la conversión con el instrumento (orden y complementaria) y
+HEDGE_WORKING la conversión inversa con AL30. Antes de lanzar se controla:
+
+- exclusividad por ticker: un solo arbitraje en curso por instrumento;
+- cantidad máxima de arbitrajes simultáneos;
+- exposición total en pesos (nominales × precio de la pata en pesos) de los
+  arbitrajes en curso.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PENDING = "PENDING"
+LEG1_WORKING = "LEG1_WORKING"
+PARTIALLY_FILLED = "PARTIALLY_FILLED"
+HEDGE_WORKING = "HEDGE_WORKING"
+DONE = "DONE"
+FAILED = "FAILED"
+
+TRANSITIONS: Dict[str, Tuple[str, ...]] = {
+    PENDING: (LEG1_WORKING, FAILED),
+    LEG1_WORKING: (PARTIALLY_FILLED, HEDGE_WORKING, DONE, FAILED),
+    PARTIALLY_FILLED: (HEDGE_WORKING, DONE, FAILED),
+    HEDGE_WORKING: (DONE, FAILED),
+    DONE: (),
+    FAILED: (),
+}
+
+DEFAULT_MAX_ACTIVE = 3
+HISTORY_SIZE = 200  # arbitrajes terminados que se guardan para stats
+
+# Resultado de un arbitraje: (éxito, pesos por dólar, pesos por dólar de AL30)
+ArbitrageResult = Tuple[bool, Optional[float], Optional[float]]
+
+
+class Arbitrage:
+    """Un arbitraje lanzado: datos de la oportunidad y su estado."""
+
+    __slots__ = (
+        "id",
+        "ticker",
+        "dolarizar",
+        "quant",
+        "quant_al30",
+        "exposure",
+        "trace",
+        "state",
+        "history",
+        "ratio",
+        "ratio_al30",
+        "error",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        ticker: str,
+        dolarizar: bool,
+        quant: int,
+        quant_al30: int,
+        exposure: float,
+        trace: Any = None,
+    ) -> None:
+        self.id = id
+        self.ticker = ticker
+        self.dolarizar = dolarizar
+        self.quant = quant
+        self.quant_al30 = quant_al30
+        self.exposure = exposure
+        self.trace = trace  # latency.Trace de la señal, si hay tracer
+        self.state = PENDING
+        self.history: List[Tuple[str, float]] = [(PENDING, time.monotonic())]
+        self.ratio: Optional[float] = None
+        self.ratio_al30: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def __repr__(self) -> str:
+        operacion = "dolarizar" if self.dolarizar else "pesificar"
+        return f"#{self.id} {operacion} {self.quant} {self.ticker} [{self.state}]"
+
+    @property
+    def done(self) -> bool:
+        return self.state in (DONE, FAILED)
+
+    @property
+    def elapsed(self) -> float:
+        """Segundos desde el lanzamiento hasta el último cambio de estado."""
+        return self.history[-1][1] - self.history[0][1]
+
+    def advance(self, state: str) -> None:
+        """
+        Pasa a ``state``.
+
+        Raises:
+            ValueError: Si la transición no está en TRANSITIONS
+        """
+        if state == self.state:
+            return
+        if state not in TRANSITIONS[self.state]:
+            raise ValueError(f"Transición inválida {self.state} → {state} en {self}")
+        self.state = state
+        self.history.append((state, time.monotonic()))
+        logger.info(f"Arbitraje {self}")
+
+    def fail(self, error: str) -> None:
+        self.error = error
+        if not self.done:
+            self.advance(FAILED)
+
+    def on_report(self, order: Dict) -> None:
+        """Estado de una orden propia: registra el llenado parcial de la pata 1."""
+        if self.state == LEG1_WORKING and order.get("status") == PARTIALLY_FILLED:
+            self.advance(PARTIALLY_FILLED)
+
+
+class OrderManager:
+    """Lanza arbitrajes en un pool respetando exclusividad y límites."""
+
+    def __init__(
+        self,
+        max_active: int = DEFAULT_MAX_ACTIVE,
+        max_exposure: Optional[float] = None,
+    ) -> None:
+        """
+        Args:
+            max_active: Arbitrajes simultáneos (también hilos del pool)
+            max_exposure: Tope de exposición en pesos sumando los arbitrajes en
+                curso; None = sin tope
+        """
+        self.max_active = max_active
+        self.max_exposure = max_exposure
+        self.exposure = 0.0
+        self.pool = ThreadPoolExecutor(max_workers=max_active, thread_name_prefix="arb")
+        self.history: Deque[Arbitrage] = deque(maxlen=HISTORY_SIZE)
+        self.rejected = {"ticker": 0, "active": 0, "exposure": 0}
+        self._active: Dict[str, Arbitrage] = {}  # ticker → arbitraje en curso
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def busy(self, ticker: str) -> bool:
+        """Hay un arbitraje en curso con ``ticker``."""
+        return ticker in self._active
+
+    def active(self) -> List[Arbitrage]:
+        with self._lock:
+            return list(self._active.values())
+
+    def submit(
+        self,
+        ticker: str,
+        dolarizar: bool,
+        quant: int,
+        quant_al30: int,
+        exposure: float,
+        run: Callable[[Arbitrage], ArbitrageResult],
+        trace: Any = None,
+    ) -> Optional[Arbitrage]:
+        """
+        Reserva el ticker y la exposición y lanza ``run`` en el pool.
+
+        Args:
+            ticker: Instrumento del arbitraje
+            dolarizar: Sentido de la conversión con el instrumento
+            quant: Nominales del instrumento
+            quant_al30: Nominales de la cobertura
+            exposure: Pesos comprometidos por el arbitraje
+            run: Ejecuta las órdenes; recibe el Arbitrage para avanzar su estado
+                y devuelve (éxito, ratio, ratio AL30)
+            trace: Estampa de latencia de la señal
+
+        Returns:
+            Optional[Arbitrage]: El arbitraje lanzado, o None si lo impide la
+            exclusividad por ticker o algún límite
+        """
+        with self._lock:
+            reason = None
+            if ticker in self._active:
+                reason = "ticker"
+            elif len(self._active) >= self.max_active:
+                reason = "active"
+            elif (
+                self.max_exposure is not None
+                and self.exposure + exposure > self.max_exposure
+            ):
+                reason = "exposure"
+            if reason is not None:
+                self.rejected[reason] += 1
+                logger.info(
+                    f"No se lanza arbitraje con {ticker} ({reason}): "
+                    f"{len(self._active)} en curso, exposición ${self.exposure:,.0f}"
+                )
+                return None
+            arb = Arbitrage(
+                next(self._ids), ticker, dolarizar, quant, quant_al30, exposure, trace
+            )
+            self._active[ticker] = arb
+            self.exposure += exposure
+        logger.info(f"Arbitraje lanzado {arb}, exposición ${exposure:,.0f}")
+        self.pool.submit(self._run, arb, run)
+        return arb
+
+    def _run(self, arb: Arbitrage, run: Callable[[Arbitrage], ArbitrageResult]) -> None:
+        try:
+            success, arb.ratio, arb.ratio_al30 = run(arb)
+            if success:
+                arb.advance(DONE)
+            else:
+                arb.fail("sin ejecución")
+        except Exception as e:
+            logger.exception(f"Error en arbitraje {arb}")
+            arb.fail(str(e))
+        finally:
+            with self._lock:
+                self._active.pop(arb.ticker, None)
+                self.exposure -= arb.exposure
+                self.history.append(arb)
+            logger.info(f"Arbitraje {arb} terminado en {arb.elapsed:.2f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        """En curso, exposición, terminados por estado y rechazos por motivo."""
+        with self._lock:
+            finished = list(self.history)
+            return {
+                "active": len(self._active),
+                "exposure": self.exposure,
+                "done": sum(a.state == DONE for a in finished),
+                "failed": sum(a.state == FAILED for a in finished),
+                "rejected": dict(self.rejected),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Deja de aceptar arbitrajes; con ``wait`` espera los que están en curso."""
+        self.pool.shutdown(wait=wait)
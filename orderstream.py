@@ -0,0 +1,202 @@
+"""
+Estado de órdenes empujado por el websocket de execution reports de Primary.
+
+En vez de consultar ``/rest/order/id`` por cada orden, se abre una suscripción
+``os`` (order reports) de la cuenta y cada mensaje ``or`` actualiza una tabla
+local clOrdId → último report. Los que envían órdenes esperan sobre esa tabla a
+que la orden llegue a FILLED o a un estado terminal, sin requests REST.
+
+El report tiene los mismos campos que el ``order`` de ``get_orders_by_clor_id``
+(status, cumQty, leavesQty, avgPx, ...), así que el resto del código no cambia.
+La misma conexión sirve para example_v1 y example_v2: las dos operan contra la
+API Primary de Cocos (api.cocos.xoms.com.ar) con el mismo token.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import websocket
+
+logger = logging.getLogger(__name__)
+
+WS_URL = "wss://api.cocos.xoms.com.ar/"
+TERMINAL_STATUSES = ("FILLED", "CANCELLED", "REJECTED", "EXPIRED")
+MAX_ORDERS = 10000  # reports que se conservan (los más viejos se descartan)
+RECONNECT_DELAY = 2
+MAX_RECONNECT_DELAY = 30
+
+
+class OrderTracker:
+    """Tabla clOrdId → último execution report, con espera por cambios."""
+
+    def __init__(self, max_orders: int = MAX_ORDERS) -> None:
+        self.max_orders = max_orders
+        self.connected = False
+        self.reports = 0
+        # Se llaman con cada report aceptado (ej. PositionCache.on_report)
+        self.listeners: List[Callable[[Dict], None]] = []
+        self._orders: "OrderedDict[str, Dict]" = OrderedDict()
+        self._cond = threading.Condition()
+
+    def apply(self, report: Dict) -> None:
+        """Incorpora un report (``orderReport`` de un mensaje ``or``)."""
+        cl_ord_id = report.get("clOrdId")
+        if not cl_ord_id:
+            return
+        with self._cond:
+            prev = self._orders.get(cl_ord_id)
+            # Los reports de una orden no retroceden: se ignora uno con menos
+            # ejecutado o que reabre una orden ya terminada
+            if prev is not None and (
+                (report.get("cumQty") or 0) < (prev.get("cumQty") or 0)
+                or (
+                    prev.get("status") in TERMINAL_STATUSES
+                    and report.get("status") not in TERMINAL_STATUSES
+                )
+            ):
+                return
+            self._orders[cl_ord_id] = report
+            self._orders.move_to_end(cl_ord_id)
+            if len(self._orders) > self.max_orders:
+                self._orders.popitem(last=False)
+            self.reports += 1
+            self._cond.notify_all()
+        for listener in self.listeners:
+            try:
+                listener(report)
+            except Exception as e:
+                logger.error(f"Error procesando report de {cl_ord_id}: {e}")
+
+    def get(self, cl_ord_id: str) -> Optional[Dict]:
+        with self._cond:
+            report = self._orders.get(cl_ord_id)
+            return dict(report) if report is not None else None
+
+    def wait(
+        self,
+        cl_ord_id: str,
+        timeout: float,
+        until: Sequence[str] = TERMINAL_STATUSES,
+    ) -> Optional[Dict]:
+        """
+        Espera a que la orden llegue a uno de los estados ``until``.
+
+        Args:
+            cl_ord_id: clOrdId (``clientId`` de la respuesta de send_order)
+            timeout: Segundos máximos de espera
+            until: Estados que terminan la espera (por defecto, terminales)
+
+        Returns:
+            Optional[Dict]: Último report (aunque no haya llegado a ``until``
+            si venció el timeout), o None si no llegó ninguno
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                report = self._orders.get(cl_ord_id)
+                if report is not None and report.get("status") in until:
+                    return dict(report)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return dict(report) if report is not None else None
+                self._cond.wait(remaining)
+
+    async def wait_async(
+        self,
+        cl_ord_id: str,
+        timeout: float,
+        until: Sequence[str] = TERMINAL_STATUSES,
+    ) -> Optional[Dict]:
+        """``wait`` para código asyncio (corre en un hilo del executor)."""
+        return await asyncio.to_thread(self.wait, cl_ord_id, timeout, until)
+
+
+class OrderReportClient:
+    """Suscripción ``os`` de una cuenta que alimenta un OrderTracker."""
+
+    def __init__(
+        self,
+        token: Union[str, Callable[[], str]],
+        account: str,
+        tracker: OrderTracker,
+        url: str = WS_URL,
+    ) -> None:
+        """
+        Args:
+            token: Token de Primary, o una función que lo devuelve; se evalúa
+                en cada (re)conexión para tomar el token renovado
+            account: Cuenta cuyos execution reports se suscriben
+            tracker: Destino de los reports
+            url: URL del websocket
+        """
+        self.token = token
+        self.account = account
+        self.tracker = tracker
+        self.url = url
+        self.ws: Optional[websocket.WebSocketApp] = None
+        self._stopping = False
+        self._delay = RECONNECT_DELAY
+
+    def subscription_message(self) -> str:
+        return json.dumps(
+            {"type": "os", "account": {"id": self.account}, "snapshotOnlyActive": True}
+        )
+
+    def on_open(self, ws) -> None:
+        ws.send(self.subscription_message())
+        self.tracker.connected = True
+        self._delay = RECONNECT_DELAY
+        logger.info(f"Execution reports suscriptos para la cuenta {self.account}")
+
+    def on_message(self, ws, message: str) -> None:
+        try:
+            data = json.loads(message)
+        except json.JSONDecodeError:
+            logger.error(f"Execution report no es JSON: {message}")
+            return
+        if data.get("type") == "or":
+            self.tracker.apply(data.get("orderReport") or {})
+        else:
+            logger.warning(f"WS órdenes (control/error): {data}")
+
+    def on_error(self, ws, error) -> None:
+        logger.error(f"WebSocket de órdenes: {error}")
+
+    def on_close(self, ws, close_status_code, close_msg) -> None:
+        # Sin stream los que esperan caen a REST (ver Executer._order_status)
+        self.tracker.connected = False
+        logger.info(f"WebSocket de órdenes cerrado ({close_status_code}): {close_msg}")
+
+    def _run(self) -> None:
+        while not self._stopping:
+            token = self.token() if callable(self.token) else self.token
+            self.ws = websocket.WebSocketApp(
+                self.url,
+                header={"x-auth-token": token},
+                on_open=self.on_open,
+                on_message=self.on_message,
+                on_error=self.on_error,
+                on_close=self.on_close,
+            )
+            self.ws.run_forever()
+            if self._stopping:
+                break
+            time.sleep(self._delay)
+            self._delay = min(self._delay * 2, MAX_RECONNECT_DELAY)
+
+    def start(self) -> threading.Thread:
+        """Conecta en un hilo daemon y reconecta con backoff."""
+        self._stopping = False
+        thread = threading.Thread(target=self._run, name="order-reports", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self._stopping = True
+        if self.ws is not None:
+            self.ws.close()
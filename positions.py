@@ -0,0 +1,394 @@
+"""
+Posiciones y poder de compra en memoria para controles pre-trade.
+
+Consultar la Risk API de Primary (``get_positions``, ``get_detailed_positions``,
+``get_portfolio``) antes de cada orden agrega segundos. ``PositionCache`` se
+carga una vez desde esos endpoints y después se mantiene con nuestros propios
+fills (execution reports push o consultas de estado), así que el control antes
+de enviar es una búsqueda en un dict:
+
+- compra: alcanza el efectivo disponible en la moneda del símbolo (pesos o
+  dólares MEP) para ``cantidad × precio``;
+- venta: alcanzan los nominales en cartera.
+
+Cada orden aceptada reserva lo que compromete (efectivo o nominales) hasta que
+termina; así varios arbitrajes en curso no usan dos veces el mismo saldo. Un
+hilo reconcilia periódicamente contra la Risk API cuando no hay órdenes en curso.
+
+Las posiciones se guardan por instrumento: AL30 y AL30D son el mismo bono, el
+símbolo solo define la moneda. Los precios de bonos y ONs son por 100 nominales.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, Mapping, Optional, Tuple
+
+from orderstream import TERMINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+PRICE_UNIT = 100  # nominales a los que refiere el precio (bonos y ONs)
+RECONCILE_INTERVAL = 60.0
+TOLERANCE = 1e-6
+MAX_ORDERS = 10000  # órdenes cuyo ejecutado ya aplicado se recuerda
+
+# Monedas de la Risk API → moneda de la cache
+CURRENCIES = {"ARS": "ARS", "USD D": "USD", "USD": "USD"}
+
+
+def ticker_of(symbol: str) -> str:
+    """``MERV - XMEV - AL30D - 24hs`` → ``AL30D``; un ticker suelto queda igual."""
+    parts = symbol.split(" - ")
+    return parts[2] if len(parts) >= 3 else symbol.strip()
+
+
+def _rows(data: Any) -> Iterator[Dict]:
+    """Filas con símbolo y cantidad de una respuesta de la Risk API, a cualquier
+    nivel; no se baja dentro de una fila para no contar dos veces."""
+    if isinstance(data, dict):
+        if ("symbol" in data or "symbolReference" in data) and _size(data) is not None:
+            yield data
+            return
+        for value in data.values():
+            if isinstance(value, (dict, list)):
+                yield from _rows(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from _rows(value)
+
+
+def _size(row: Dict) -> Optional[float]:
+    for key in ("currentSize", "totalSize", "size"):
+        if row.get(key) is not None:
+            return float(row[key])
+    if row.get("buySize") is not None or row.get("sellSize") is not None:
+        return float(row.get("buySize") or 0) - float(row.get("sellSize") or 0)
+    return None
+
+
+class Hold:
+    """Lo que una orden aceptada tiene reservado hasta terminar."""
+
+    __slots__ = ("ticker", "currency", "side", "quantity", "price", "cl_ord_id")
+
+    def __init__(
+        self, ticker: str, currency: str, side: str, quantity: float, price: float
+    ) -> None:
+        self.ticker = ticker
+        self.currency = currency
+        self.side = side
+        self.quantity = quantity  # nominales pendientes
+        self.price = price  # precio de referencia para la reserva de efectivo
+        self.cl_ord_id: Optional[str] = None
+
+
+class PositionCache:
+    """Nominales por instrumento y efectivo por moneda, con reservas."""
+
+    def __init__(
+        self,
+        client: Any,
+        account: str,
+        aliases: Optional[Mapping[str, str]] = None,
+        price_unit: float = PRICE_UNIT,
+    ) -> None:
+        """
+        Args:
+            client: CocosMatrizClient (get_positions, get_detailed_positions,
+                get_portfolio)
+            account: Cuenta de la Risk API
+            aliases: tickerD → ticker (ej. ``{"AL30D": "AL30"}``); los símbolos
+                de la izquierda operan en dólares
+            price_unit: Nominales a los que refiere el precio
+        """
+        self.client = client
+        self.account = account
+        self.aliases = dict(aliases or {})
+        self.price_unit = price_unit
+        self.ready = False
+        self.positions: Dict[str, float] = {}
+        self.cash: Dict[str, float] = {}
+        self.prices: Dict[str, float] = {}  # último precio conocido por símbolo
+        self.rejected = 0
+        self._held_qty: Dict[str, float] = {}
+        self._held_cash: Dict[str, float] = {}
+        self._holds: Dict[str, Hold] = {}  # clOrdId → reserva
+        self._pending = 0  # reservas aún sin clOrdId
+        # clOrdId → (nominales, monto, terminada) ya aplicados a la cache
+        self._applied: "OrderedDict[str, Tuple[float, float, bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_instruments(
+        cls, client: Any, account: str, instrumentos: Iterable[Mapping]
+    ) -> "PositionCache":
+        """Cache con los alias tickerD → ticker de la lista de instrumentos."""
+        return cls(client, account, {i["tickerD"]: i["ticker"] for i in instrumentos})
+
+    def _instrument(self, symbol: str) -> Tuple[str, str, str]:
+        """(instrumento, moneda, ticker del símbolo)."""
+        ticker = ticker_of(symbol)
+        base = self.aliases.get(ticker)
+        if base is not None:
+            return base, "USD", ticker
+        return ticker, "ARS", ticker
+
+    # ---------- carga y reconciliación ----------
+    def fetch(self) -> Optional[Tuple[Dict[str, float], Dict[str, float]]]:
+        """
+        Posiciones y efectivo según la Risk API.
+
+        Returns:
+            Optional[Tuple[Dict, Dict]]: (nominales por instrumento, efectivo por
+            moneda), o None si falló algún endpoint
+        """
+        try:
+            report = self.client.get_portfolio(self.account)
+            detailed = self.client.get_detailed_positions(self.account)
+            if not isinstance(detailed, dict) or "error" in detailed:
+                detailed = self.client.get_positions(self.account)
+        except Exception as e:
+            logger.error(f"Error consultando la Risk API: {e}")
+            return None
+        if not isinstance(report, dict) or "error" in report or "error" in detailed:
+            logger.error(f"Risk API sin datos: {report} / {detailed}")
+            return None
+
+        positions: Dict[str, float] = {}
+        for row in _rows(detailed):
+            size = _size(row)
+            symbol = row.get("symbol") or row.get("symbolReference")
+            if size is None or not symbol:
+                continue
+            base, _, ticker = self._instrument(symbol)
+            positions[base] = positions.get(base, 0.0) + size
+            price = row.get("lastPrice") or row.get("buyPrice") or row.get("sellPrice")
+            if price:
+                self.prices[ticker] = float(price)
+
+        cash: Dict[str, float] = {}
+        for key, value in self._detailed_cash(report).items():
+            currency = CURRENCIES.get(key)
+            if currency is not None and value is not None:
+                cash[currency] = cash.get(currency, 0.0) + float(value)
+        return positions, cash
+
+    @staticmethod
+    def _detailed_cash(report: Dict) -> Dict[str, Any]:
+        data = report.get("accountData", report)
+        for account_report in (data.get("detailedAccountReports") or {}).values():
+            cash = (account_report.get("availableToOperate") or {}).get("cash") or {}
+            if cash.get("detailedCash"):
+                return cash["detailedCash"]
+        return {}
+
+    def bootstrap(self) -> bool:
+        """Carga inicial desde la Risk API."""
+        fetched = self.fetch()
+        if fetched is None:
+            logger.warning("⚠️ Sin posiciones iniciales: sin controles pre-trade")
+            return False
+        with self._lock:
+            self.positions, self.cash = fetched
+            self.ready = True
+        logger.info(f"Posiciones: {self.positions} | Efectivo: {self.cash}")
+        return True
+
+    def reconcile(self) -> bool:
+        """
+        Reemplaza la cache por la Risk API si no hay órdenes en curso.
+
+        Returns:
+            bool: True si se reconcilió (con o sin diferencias)
+        """
+        if self._holds or self._pending:
+            return False
+        fetched = self.fetch()
+        if fetched is None:
+            return False
+        positions, cash = fetched
+        with self._lock:
+            if self._holds or self._pending:
+                return False  # se envió una orden mientras se consultaba
+            for name, ours, theirs in (
+                ("nominales", self.positions, positions),
+                ("efectivo", self.cash, cash),
+            ):
+                for key in set(ours) | set(theirs):
+                    diff = theirs.get(key, 0.0) - ours.get(key, 0.0)
+                    if abs(diff) > TOLERANCE:
+                        logger.warning(f"Reconciliación {name} {key}: {diff:+,.2f}")
+            self.positions, self.cash = positions, cash
+            self.ready = True
+        return True
+
+    def start_reconciler(
+        self, interval: float = RECONCILE_INTERVAL
+    ) -> threading.Thread:
+        """Reconcilia cada ``interval`` segundos en un hilo daemon."""
+
+        def loop() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    self.reconcile()
+                except Exception as e:
+                    logger.error(f"Error reconciliando posiciones: {e}")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, name="positions", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # ---------- controles pre-trade ----------
+    def available(self, instrument: str) -> float:
+        """Nominales sin reservar de ``instrument``."""
+        return self.positions.get(instrument, 0.0) - self._held_qty.get(instrument, 0.0)
+
+    def buying_power(self, currency: str) -> float:
+        """Efectivo sin reservar en ``currency`` (ARS o USD)."""
+        return self.cash.get(currency, 0.0) - self._held_cash.get(currency, 0.0)
+
+    def reserve(
+        self, symbol: str, side: str, quantity: float, price: Optional[float]
+    ) -> Tuple[Optional[Hold], Optional[str]]:
+        """
+        Control pre-trade de una orden; si pasa, reserva lo que compromete.
+
+        Args:
+            symbol: Símbolo de la orden
+            side: BUY o SELL
+            quantity: Nominales
+            price: Precio límite; en MARKET se usa el último conocido y, sin
+                uno, no se controla el efectivo
+
+        Returns:
+            Tuple[Optional[Hold], Optional[str]]: (reserva, None) si se acepta o
+            (None, motivo) si se rechaza. Sin carga inicial acepta sin reservar.
+        """
+        if not self.ready:
+            return None, None
+        base, currency, ticker = self._instrument(symbol)
+        side = side.upper()
+        with self._lock:
+            if side == "SELL":
+                available = self.available(base)
+                if quantity > available + TOLERANCE:
+                    self.rejected += 1
+                    return None, (
+                        f"venta de {quantity:g} {ticker} con {available:g} disponibles"
+                    )
+                hold = Hold(base, currency, side, quantity, price or 0.0)
+                self._held_qty[base] = self._held_qty.get(base, 0.0) + quantity
+            else:
+                ref = price or self.prices.get(ticker, 0.0)
+                amount = quantity * ref / self.price_unit
+                power = self.buying_power(currency)
+                if amount > power + TOLERANCE:
+                    self.rejected += 1
+                    return None, (
+                        f"compra de {quantity:g} {ticker} por {amount:,.2f} {currency}"
+                        f" con {power:,.2f} disponibles"
+                    )
+                hold = Hold(base, currency, side, quantity, ref)
+                self._held_cash[currency] = self._held_cash.get(currency, 0.0) + amount
+            self._pending += 1
+        return hold, None
+
+    def bind(self, hold: Hold, response: Any) -> None:
+        """Asocia la reserva al clOrdId del envío; si el envío falló, la libera."""
+        ok = isinstance(response, dict) and "error" not in response
+        cl_ord_id = (response.get("order") or {}).get("clientId") if ok else None
+        with self._lock:
+            self._pending -= 1
+            if not cl_ord_id:
+                self._release(hold)
+                return
+            hold.cl_ord_id = cl_ord_id
+            # El report push puede llegar antes que la respuesta del envío
+            done_qty, _, closed = self._applied.get(cl_ord_id, (0.0, 0.0, False))
+            self._unhold(hold, done_qty)
+            if closed:
+                self._release(hold)
+            else:
+                self._holds[cl_ord_id] = hold
+
+    def _unhold(self, hold: Hold, quantity: float) -> None:
+        """Saca de la reserva ``quantity`` nominales ya ejecutados (con lock)."""
+        quantity = min(quantity, hold.quantity)
+        if quantity <= 0:
+            return
+        if hold.side == "SELL":
+            self._held_qty[hold.ticker] -= quantity
+        else:
+            self._held_cash[hold.currency] -= quantity * hold.price / self.price_unit
+        hold.quantity -= quantity
+
+    def _release(self, hold: Hold) -> None:
+        """Libera lo que queda reservado por ``hold`` (con el lock tomado)."""
+        self._unhold(hold, hold.quantity)
+
+    # ---------- fills ----------
+    def on_report(self, report: Dict) -> None:
+        """
+        Aplica el ejecutado nuevo de un report de orden propia.
+
+        Se puede llamar con el mismo report más de una vez (push y consulta de
+        estado): solo se aplica la diferencia contra lo ya registrado.
+        """
+        cl_ord_id = report.get("clOrdId")
+        if not cl_ord_id:
+            return
+        with self._lock:
+            hold = self._holds.get(cl_ord_id)
+            symbol = (report.get("instrumentId") or {}).get("symbol")
+            side = report.get("side") or (hold.side if hold is not None else None)
+            if hold is not None:
+                base, currency = hold.ticker, hold.currency
+            elif symbol:
+                base, currency, _ = self._instrument(symbol)
+            else:
+                base = currency = None
+
+            cum_qty = float(report.get("cumQty") or 0)
+            avg_px = float(report.get("avgPx") or 0)
+            closed = report.get("status") in TERMINAL_STATUSES
+            done_qty, done_amount, _ = self._applied.get(
+                cl_ord_id, (0.0, 0.0, False)
+            )
+            qty = cum_qty - done_qty
+            if qty > TOLERANCE and base is not None and side is not None:
+                amount = cum_qty * avg_px / self.price_unit - done_amount
+                sign = 1 if side.upper() == "BUY" else -1
+                self.positions[base] = self.positions.get(base, 0.0) + sign * qty
+                self.cash[currency] = self.cash.get(currency, 0.0) - sign * amount
+                if symbol and avg_px:
+                    self.prices[ticker_of(symbol)] = avg_px
+                done_qty, done_amount = cum_qty, done_amount + amount
+                if hold is not None:
+                    # Lo ejecutado deja de estar reservado: ya está en la cache
+                    self._unhold(hold, qty)
+            self._applied[cl_ord_id] = (done_qty, done_amount, closed)
+            self._applied.move_to_end(cl_ord_id)
+            if len(self._applied) > MAX_ORDERS:
+                self._applied.popitem(last=False)
+            if hold is not None and closed:
+                self._release(hold)
+                del self._holds[cl_ord_id]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Posiciones, efectivo y reservas, para logs."""
+        with self._lock:
+            return {
+                "positions": dict(self.positions),
+                "cash": dict(self.cash),
+                "held_qty": {k: v for k, v in self._held_qty.items() if v},
+                "held_cash": {k: v for k, v in self._held_cash.items() if v},
+                "open_orders": len(self._holds),
+                "rejected": self.rejected,
+            }
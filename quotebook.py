@@ -0,0 +1,321 @@
+"""
+Libro de cotizaciones columnar sobre arrays de NumPy.
+
+Cada instrumento ocupa una fila fija (id entero) y cada campo (precio o tamaño
+de compra/venta por pata y plazo) una columna de un array float64 preasignado.
+Un tick cuesta un par de asignaciones sobre el array, sin pasar por el
+indexado de pandas.
+
+El hilo del websocket es el único que escribe el array vivo. Al cerrar cada
+lote (``commit``) lo copia a un buffer libre del pool y lo publica como
+snapshot con un número de secuencia. Los lectores fijan el último snapshot
+publicado y trabajan sobre él sin copiarlo; el escritor nunca reutiliza un
+buffer fijado, así que la vista es coherente mientras dure la lectura.
+"""
+
+import threading
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# ====================== COLUMNAS ======================
+PRICE_COLUMNS = [
+    "prCompraPesosCI",
+    "prVentaPesosCI",
+    "prCompraPesos",
+    "prVentaPesos",
+    "prCompraDolarCI",
+    "prVentaDolarCI",
+    "prCompraDolar",
+    "prVentaDolar",
+]
+SIZE_COLUMNS = [
+    "siCompraPesosCI",
+    "siVentaPesosCI",
+    "siCompraPesos",
+    "siVentaPesos",
+    "siCompraDolarCI",
+    "siVentaDolarCI",
+    "siCompraDolar",
+    "siVentaDolar",
+]
+# Los tamaños son nominales enteros: QuoteRow los devuelve como int para que
+# lleguen así al orderQty de las órdenes
+_SIZE_SET = frozenset(SIZE_COLUMNS)
+# Columnas de punta 24hs con tamaños, usadas por los ejecutores de example_v1/v2
+TOP_24HS_COLUMNS = [
+    "prCompraPesos",
+    "prVentaPesos",
+    "prCompraDolar",
+    "prVentaDolar",
+    "siCompraPesos",
+    "siVentaPesos",
+    "siCompraDolar",
+    "siVentaDolar",
+]
+
+
+class Snapshot:
+    """Vista inmutable del libro tal como quedó al publicar la secuencia ``seq``."""
+
+    __slots__ = ("book", "seq", "data", "stamp", "_slot")
+
+    def __init__(
+        self,
+        book: "QuoteBook",
+        seq: int,
+        data: np.ndarray,
+        stamp: np.ndarray,
+        slot: int,
+    ) -> None:
+        self.book = book
+        self.seq = seq
+        self.data = data
+        self.stamp = stamp
+        self._slot = slot
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    def release(self) -> None:
+        """Libera el buffer para que el escritor pueda reutilizarlo."""
+        if self._slot >= 0:
+            self.book._unpin(self._slot)
+            self._slot = -1
+
+    def changed_since(self, seq: int) -> np.ndarray:
+        """Ids de las filas escritas después de la secuencia ``seq``."""
+        return np.flatnonzero(self.stamp > seq)
+
+    def column(self, name: str) -> np.ndarray:
+        """Columna del snapshot (sin copia)."""
+        return self.data[:, self.book.col[name]]
+
+    def frame(self, labels: Optional[Dict[str, Sequence[str]]] = None) -> pd.DataFrame:
+        """DataFrame sobre el snapshot, sin copiar el array."""
+        return _frame(self.data, self.book.columns, labels)
+
+    def records(self, attrs: Sequence[Mapping[str, Any]]) -> List["QuoteRow"]:
+        """
+        Filas del snapshot con interfaz de diccionario.
+
+        Args:
+            attrs: Atributos fijos de cada instrumento (ticker, max_quant, ...)
+
+        Returns:
+            List[QuoteRow]: Una fila por instrumento, en el orden del libro
+        """
+        return [QuoteRow(self, i, a) for i, a in enumerate(attrs)]
+
+
+class QuoteRow(MutableMapping):
+    """
+    Fila de un snapshot vista como diccionario de instrumento.
+
+    Los campos del libro se leen del snapshot (NaN se devuelve como None y los
+    tamaños como int), el resto de la fila sale de ``attrs``, y lo que se
+    asigne (ej. ratios) queda en un diccionario propio sin tocar el libro ni
+    ``attrs``.
+    """
+
+    __slots__ = ("_snap", "_row", "_attrs", "_extra")
+
+    def __init__(self, snap: Snapshot, row: int, attrs: Mapping[str, Any]) -> None:
+        self._snap = snap
+        self._row = row
+        self._attrs = attrs
+        self._extra: Dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._extra:
+            return self._extra[key]
+        j = self._snap.book.col.get(key)
+        if j is not None:
+            v = self._snap.data[self._row, j]
+            if v != v:
+                return None
+            return int(v) if key in _SIZE_SET else float(v)
+        return self._attrs[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self._extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        seen = set(self._extra)
+        yield from self._extra
+        for key in self._snap.book.columns:
+            if key not in seen:
+                seen.add(key)
+                yield key
+        for key in self._attrs:
+            if key not in seen:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+def _frame(
+    data: np.ndarray, columns: List[str], labels: Optional[Dict[str, Sequence[str]]]
+) -> pd.DataFrame:
+    df = pd.DataFrame(data, columns=columns, copy=False)
+    for pos, (name, values) in enumerate((labels or {}).items()):
+        df.insert(pos, name, values)
+    return df
+
+
+class QuoteBook:
+    """Libro de puntas indexado por id entero de instrumento."""
+
+    def __init__(self, keys: Sequence[str], columns: Sequence[str]) -> None:
+        """
+        Inicializa el libro con todas las celdas en NaN.
+
+        Args:
+            keys: Ticker principal de cada instrumento; su posición es el id
+            columns: Nombres de los campos que guarda el libro
+        """
+        self.keys: List[str] = list(keys)
+        self.columns: List[str] = list(columns)
+        self.ids: Dict[str, int] = {k: i for i, k in enumerate(self.keys)}
+        self.col: Dict[str, int] = {c: j for j, c in enumerate(self.columns)}
+        shape = (len(self.keys), len(self.columns))
+        # Estado vivo: solo lo toca el hilo escritor
+        self.data = np.full(shape, np.nan, dtype=np.float64)
+        self.stamp = np.zeros(len(self.keys), dtype=np.int64)
+        self.seq = 1  # secuencia del lote en curso
+
+        # Pool de buffers publicados; arranca con dos (doble buffer)
+        self._lock = threading.Lock()
+        # Avisa cada publicación; wait compara contra la última secuencia vista
+        self._published = threading.Condition(self._lock)
+        self._waited_seq = 0
+        self._buffers: List[np.ndarray] = [np.full(shape, np.nan) for _ in range(2)]
+        self._stamps: List[np.ndarray] = [
+            np.zeros(len(self.keys), dtype=np.int64) for _ in range(2)
+        ]
+        self._pins: List[int] = [0, 0]
+        self._front = 0
+        self._front_seq = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def row(self, key: str) -> Optional[int]:
+        """Devuelve el id entero de un ticker, o None si no está en el libro."""
+        return self.ids.get(key)
+
+    # ====================== ESCRITURA (hilo del websocket) ======================
+    def set_quote(
+        self, row: int, bid_col: int, ask_col: int, bid: float, ask: float
+    ) -> None:
+        """Escribe compra y venta de un instrumento."""
+        data = self.data
+        data[row, bid_col] = bid
+        data[row, ask_col] = ask
+        self.stamp[row] = self.seq
+
+    def set_value(self, row: int, col: int, value: float) -> None:
+        """Escribe un único campo de un instrumento."""
+        self.data[row, col] = value
+        self.stamp[row] = self.seq
+
+    def commit(self) -> int:
+        """
+        Publica el lote en curso como snapshot y avisa a los lectores.
+
+        Returns:
+            int: Secuencia publicada
+        """
+        with self._lock:
+            slot = self._free_slot()
+            self._pins[slot] += 1  # reservado mientras se copia
+        np.copyto(self._buffers[slot], self.data)
+        np.copyto(self._stamps[slot], self.stamp)
+        seq = self.seq
+        with self._lock:
+            self._pins[slot] -= 1
+            self._front, self._front_seq = slot, seq
+            self._published.notify_all()
+        self.seq = seq + 1
+        return seq
+
+    def _free_slot(self) -> int:
+        for slot, pins in enumerate(self._pins):
+            if pins == 0 and slot != self._front:
+                return slot
+        # Todos fijados por lectores: se agrega un buffer al pool
+        self._buffers.append(np.empty_like(self.data))
+        self._stamps.append(np.empty_like(self.stamp))
+        self._pins.append(0)
+        return len(self._pins) - 1
+
+    # ====================== LECTURA ======================
+    def snapshot(self) -> Snapshot:
+        """
+        Fija y devuelve el último snapshot publicado.
+
+        Se usa como context manager (``with book.snapshot() as snap``) o
+        llamando a ``release()`` al terminar.
+        """
+        with self._lock:
+            slot = self._front
+            self._pins[slot] += 1
+            seq = self._front_seq
+        data = self._buffers[slot].view()
+        data.flags.writeable = False
+        stamp = self._stamps[slot].view()
+        stamp.flags.writeable = False
+        return Snapshot(self, seq, data, stamp, slot)
+
+    def _unpin(self, slot: int) -> None:
+        with self._lock:
+            self._pins[slot] -= 1
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Bloquea hasta que haya un lote nuevo o venza el timeout.
+
+        Compara secuencias bajo el mismo lock con que se publican, así que un
+        commit que llega entre dos esperas no se pierde.
+
+        Returns:
+            bool: True si hubo actualizaciones desde la última espera
+        """
+        with self._published:
+            if not self._published.wait_for(
+                lambda: self._front_seq > self._waited_seq, timeout
+            ):
+                return False
+            self._waited_seq = self._front_seq
+        return True
+
+    def view(self) -> np.ndarray:
+        """Vista de solo lectura sobre el array vivo (sin copia ni coherencia)."""
+        v = self.data.view()
+        v.flags.writeable = False
+        return v
+
+    def column(self, name: str) -> np.ndarray:
+        """Vista de solo lectura de una columna del array vivo."""
+        return self.view()[:, self.col[name]]
+
+    def frame(self, labels: Optional[Dict[str, Sequence[str]]] = None) -> pd.DataFrame:
+        """
+        DataFrame que envuelve el array vivo sin copiarlo.
+
+        Args:
+            labels: Columnas de texto a anteponer (ej. {"ticker": [...]})
+
+        Returns:
+            pd.DataFrame: Frame con las columnas de etiquetas y las del libro
+        """
+        return _frame(self.data, self.columns, labels)
@@ -0,0 +1,330 @@
+"""
+Evaluación incremental de ratios de arbitraje sobre un QuoteBook.
+
+En cada refresco solo se recalculan las filas escritas después de la secuencia
+del último snapshot evaluado, y el máximo/mínimo de cada ratio se mantiene sin
+recorrer todo el universo salvo cuando el instrumento que tenía el extremo
+empeora. Los k mejores y peores de cada ratio se mantienen en heaps
+(RatioRanking) para que detectores e impresiones no tengan que ordenar el frame.
+"""
+
+import heapq
+from typing import Container, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from quotebook import QuoteBook, Snapshot
+
+# ====================== DEFINICIÓN DE RATIOS ======================
+# (nombre, numerador, denominador) con los nombres de columnas del libro
+RATIOS: List[Tuple[str, str, str]] = [
+    ("USD_a_pesos", "prCompraPesos", "prVentaDolar"),
+    ("USDCI_a_pesos", "prCompraPesos", "prVentaDolarCI"),
+    ("pesos_a_USD", "prVentaPesos", "prCompraDolar"),
+    ("pesos_a_USDCI", "prVentaPesos", "prCompraDolarCI"),
+    ("USD_a_pesosCI", "prCompraPesosCI", "prVentaDolar"),
+    ("USDCI_a_pesosCI", "prCompraPesosCI", "prVentaDolarCI"),
+    ("pesosCI_a_USD", "prVentaPesosCI", "prCompraDolar"),
+    ("pesosCI_a_USDCI", "prVentaPesosCI", "prCompraDolarCI"),
+]
+
+# Ratios entre plazos de una misma moneda (compra en un plazo, venta en el otro)
+CROSS_RATIOS: List[Tuple[str, str, str]] = [
+    ("USDCI_a_USD", "prCompraDolar", "prVentaDolarCI"),
+    ("pesosCI_a_pesos", "prCompraPesos", "prVentaPesosCI"),
+    ("USD_a_USDCI", "prCompraDolarCI", "prVentaDolar"),
+    ("pesos_a_pesosCI", "prCompraPesosCI", "prVentaPesos"),
+]
+
+
+class RatioRanking:
+    """
+    Top-k y bottom-k de cada ratio con heaps y borrado perezoso.
+
+    Cada valor nuevo se empuja al heap con la versión de su celda; las entradas
+    viejas quedan en el heap y se descartan cuando llegan a la cima. Actualizar
+    un valor cuesta O(log n) y pedir los k primeros O(k log n).
+    """
+
+    def __init__(self, names: Sequence[str], n: int) -> None:
+        """
+        Args:
+            names: Nombres de los ratios (columnas)
+            n: Cantidad de filas (instrumentos)
+        """
+        self.names = list(names)
+        self.idx = {name: j for j, name in enumerate(self.names)}
+        self.n = n
+        k = len(self.names)
+        self.values = np.full((n, k), np.nan)
+        self._ver = [[0] * k for _ in range(n)]
+        # Entradas (clave, fila, versión); en _top la clave es -valor
+        self._top: List[List[Tuple[float, int, int]]] = [[] for _ in range(k)]
+        self._bottom: List[List[Tuple[float, int, int]]] = [[] for _ in range(k)]
+
+    def update(
+        self,
+        rows: np.ndarray,
+        values: np.ndarray,
+        top_ok: np.ndarray,
+        bottom_ok: np.ndarray,
+    ) -> None:
+        """
+        Registra los valores nuevos de algunas filas.
+
+        Args:
+            rows: Ids de las filas
+            values: Valores (len(rows), k)
+            top_ok: Máscara de valores que compiten por el top
+            bottom_ok: Máscara de valores que compiten por el bottom
+        """
+        old = self.values[rows]
+        same = (values == old) | (np.isnan(values) & np.isnan(old))
+        self.values[rows] = values
+        for i, vals, same_i, hi, lo in zip(
+            rows.tolist(),
+            values.tolist(),
+            same.tolist(),
+            top_ok.tolist(),
+            bottom_ok.tolist(),
+        ):
+            ver = self._ver[i]
+            for j, v in enumerate(vals):
+                if same_i[j]:
+                    continue
+                ver[j] += 1
+                if hi[j]:
+                    heapq.heappush(self._top[j], (-v, i, ver[j]))
+                if lo[j]:
+                    heapq.heappush(self._bottom[j], (v, i, ver[j]))
+        for j in range(len(self.names)):
+            self._compact(self._top, j)
+            self._compact(self._bottom, j)
+
+    def update_values(self, values: np.ndarray) -> None:
+        """
+        Compara la matriz completa con la anterior y registra solo lo que cambió.
+
+        El top considera los valores finitos y el bottom los finitos mayores a 1,
+        igual que los detectores.
+        """
+        with np.errstate(invalid="ignore"):
+            changed = ~(
+                (values == self.values) | (np.isnan(values) & np.isnan(self.values))
+            ).all(axis=1)
+            rows = np.flatnonzero(changed)
+            new = values[rows]
+            finite = np.isfinite(new)
+            self.update(rows, new, finite, finite & (new > 1))
+
+    def _compact(self, heaps: List[List[Tuple[float, int, int]]], j: int) -> None:
+        heap = heaps[j]
+        if len(heap) > 4 * self.n + 16:
+            heap[:] = [e for e in heap if e[2] == self._ver[e[1]][j]]
+            heapq.heapify(heap)
+
+    def _collect(
+        self,
+        heap: List[Tuple[float, int, int]],
+        j: int,
+        k: int,
+        limit: float,
+        rows: Optional[Container[int]],
+    ) -> List[int]:
+        out: List[int] = []
+        taken = []
+        while heap and len(out) < k:
+            key, i, ver = heap[0]
+            if ver != self._ver[i][j]:
+                heapq.heappop(heap)  # entrada vieja
+                continue
+            if not key < limit:
+                break
+            taken.append(heapq.heappop(heap))
+            if rows is None or i in rows:
+                out.append(i)
+        for entry in taken:
+            heapq.heappush(heap, entry)
+        return out
+
+    def top(
+        self,
+        name: str,
+        k: int,
+        above: float = -np.inf,
+        rows: Optional[Container[int]] = None,
+    ) -> List[int]:
+        """
+        Filas con los k valores más altos del ratio, de mayor a menor.
+
+        Args:
+            name: Ratio
+            k: Cantidad máxima de filas
+            above: Solo valores estrictamente mayores (NaN no deja ninguno)
+            rows: Solo estas filas (ej. ids de mis_activos)
+        """
+        j = self.idx[name]
+        return self._collect(self._top[j], j, k, -above, rows)
+
+    def bottom(
+        self,
+        name: str,
+        k: int,
+        below: float = np.inf,
+        rows: Optional[Container[int]] = None,
+    ) -> List[int]:
+        """Filas con los k valores más bajos del ratio, de menor a mayor (ver top)."""
+        j = self.idx[name]
+        return self._collect(self._bottom[j], j, k, below, rows)
+
+
+class RatioEvaluator:
+    """Mantiene los ratios y sus extremos actualizados de forma incremental."""
+
+    def __init__(
+        self,
+        book: QuoteBook,
+        ratios: Sequence[Tuple[str, str, str]] = RATIOS + CROSS_RATIOS,
+        restricted: Optional[Dict[str, Sequence[int]]] = None,
+    ) -> None:
+        """
+        Args:
+            book: Libro del que se leen los precios
+            ratios: Definiciones (nombre, numerador, denominador)
+            restricted: Ratios cuyos extremos solo consideran ciertas filas
+                (ej. {"USD_a_pesosCI": ids de mis_activos})
+        """
+        self.book = book
+        self.seq = 0  # última secuencia del libro ya evaluada
+        self.names = [r[0] for r in ratios]
+        self.idx = {name: j for j, name in enumerate(self.names)}
+        self.num = np.array([book.col[r[1]] for r in ratios], dtype=np.intp)
+        self.den = np.array([book.col[r[2]] for r in ratios], dtype=np.intp)
+
+        n, k = len(book), len(self.names)
+        self.values = np.full((n, k), np.nan)
+        self._cols = np.arange(k)
+        # Copias enmascaradas para argmax/argmin: -inf/+inf donde no aplica
+        self._hi = np.full((n, k), -np.inf)
+        self._lo = np.full((n, k), np.inf)
+        self._allowed = np.ones((n, k), dtype=bool)
+        for name, rows in (restricted or {}).items():
+            j = self.idx[name]
+            self._allowed[:, j] = False
+            self._allowed[list(rows), j] = True
+
+        self.best = np.zeros(k, dtype=np.intp)
+        self.best_val = np.full(k, -np.inf)
+        self.worst = np.zeros(k, dtype=np.intp)
+        self.worst_val = np.full(k, np.inf)
+        self.ranking = RatioRanking(self.names, n)
+
+    def refresh(self, snapshot: Optional[Snapshot] = None) -> bool:
+        """
+        Recalcula los ratios de las filas escritas desde el último refresco.
+
+        Args:
+            snapshot: Snapshot fijado del libro; si no se pasa se toma el último
+
+        Returns:
+            bool: True si cambió algún extremo (fila o valor)
+        """
+        if snapshot is None:
+            with self.book.snapshot() as snap:
+                return self.refresh(snap)
+        rows = snapshot.changed_since(self.seq)
+        self.seq = snapshot.seq
+        if rows.size == 0:
+            return False
+        return self.update_rows(rows, snapshot.data)
+
+    def update_rows(self, rows: np.ndarray, data: np.ndarray) -> bool:
+        """Recalcula las filas indicadas; devuelve True si cambió algún extremo."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            new = data[np.ix_(rows, self.num)] / data[np.ix_(rows, self.den)]
+        self.values[rows] = new
+
+        allowed = self._allowed[rows]
+        finite = np.isfinite(new) & allowed
+        # Los mínimos siguen el criterio de los detectores: solo ratios > 1
+        self._hi[rows] = np.where(finite, new, -np.inf)
+        self._lo[rows] = np.where(finite & (new > 1), new, np.inf)
+        self.ranking.update(rows, new, finite, finite & (new > 1))
+
+        prev = (self.best.copy(), self.best_val.copy())
+        prev_w = (self.worst.copy(), self.worst_val.copy())
+        self._update_best(rows)
+        self._update_worst(rows)
+        return not (
+            np.array_equal(prev[0], self.best)
+            and np.array_equal(prev[1], self.best_val)
+            and np.array_equal(prev_w[0], self.worst)
+            and np.array_equal(prev_w[1], self.worst_val)
+        )
+
+    def _update_best(self, rows: np.ndarray) -> None:
+        hi = self._hi[rows]
+        pos = hi.argmax(axis=0)
+        cand_val = hi[pos, self._cols]
+        improved = cand_val >= self.best_val
+        self.best = np.where(improved, rows[pos], self.best)
+        self.best_val = np.where(improved, cand_val, self.best_val)
+        # Si empeoró la fila que tenía el máximo, hay que buscarlo de nuevo
+        for j in np.flatnonzero(~improved & np.isin(self.best, rows)):
+            i = int(self._hi[:, j].argmax())
+            self.best[j], self.best_val[j] = i, self._hi[i, j]
+
+    def _update_worst(self, rows: np.ndarray) -> None:
+        lo = self._lo[rows]
+        pos = lo.argmin(axis=0)
+        cand_val = lo[pos, self._cols]
+        improved = cand_val <= self.worst_val
+        self.worst = np.where(improved, rows[pos], self.worst)
+        self.worst_val = np.where(improved, cand_val, self.worst_val)
+        for j in np.flatnonzero(~improved & np.isin(self.worst, rows)):
+            i = int(self._lo[:, j].argmin())
+            self.worst[j], self.worst_val[j] = i, self._lo[i, j]
+
+    def column(self, name: str) -> np.ndarray:
+        """Valores actuales de un ratio para todo el universo (sin copia)."""
+        return self.values[:, self.idx[name]]
+
+    def best_value(self, name: str) -> float:
+        """Máximo actual del ratio, o NaN si no hay ningún valor válido."""
+        v = self.best_val[self.idx[name]]
+        return float(v) if np.isfinite(v) else np.nan
+
+    def worst_value(self, name: str) -> float:
+        """Mínimo actual del ratio entre los valores > 1, o NaN si no hay."""
+        v = self.worst_val[self.idx[name]]
+        return float(v) if np.isfinite(v) else np.nan
+
+    def best_key(self, name: str) -> Optional[str]:
+        """Ticker con el máximo actual del ratio."""
+        j = self.idx[name]
+        return self.book.keys[self.best[j]] if np.isfinite(self.best_val[j]) else None
+
+    def worst_key(self, name: str) -> Optional[str]:
+        """Ticker con el mínimo actual del ratio."""
+        j = self.idx[name]
+        return self.book.keys[self.worst[j]] if np.isfinite(self.worst_val[j]) else None
+
+    def top(
+        self,
+        name: str,
+        k: int,
+        above: float = -np.inf,
+        rows: Optional[Container[int]] = None,
+    ) -> List[int]:
+        """Ids de las k filas con mayor ratio (ver RatioRanking.top)."""
+        return self.ranking.top(name, k, above, rows)
+
+    def bottom(
+        self,
+        name: str,
+        k: int,
+        below: float = np.inf,
+        rows: Optional[Container[int]] = None,
+    ) -> List[int]:
+        """Ids de las k filas con menor ratio > 1 (ver RatioRanking.bottom)."""
+        return self.ranking.bottom(name, k, below, rows)
@@ -0,0 +1,341 @@
+"""
+Calendario de rueda de BYMA y cadencia adaptativa de evaluación.
+
+Los loops de los scripts evalúan a intervalo fijo (dolarMEP cada 15 s, los
+ejemplos cada 3 s) a cualquier hora, aunque la rueda esté cerrada o el libro no
+haya cambiado. ``AdaptiveScheduler`` decide cuánto esperar antes de la próxima
+evaluación:
+
+- Fuera de rueda (fines de semana, feriados o fuera de las ventanas de CI y
+  24hs) duerme hasta la próxima apertura, en tramos de a lo sumo
+  OFF_HOURS_CHECK segundos.
+- En rueda parte del intervalo base del script y lo divide por la "presión"
+  del mercado: el máximo entre la tasa de actualizaciones y la variación del
+  spread relativo, cada una medida con un promedio exponencial rápido contra
+  uno lento (1 = actividad habitual). Con el mercado quieto el intervalo se
+  estira hasta ``max_interval``; con ráfagas baja hasta ``min_interval``.
+
+Es opcional, como el resto de las secciones de config.ini::
+
+    [schedule]
+    enabled = true
+    ci = 11:00-17:00
+    24hs = 11:00-17:00
+    holidays = 2026-12-24, 2026-12-31   ; se suman a HOLIDAYS
+
+Sin la sección, ``open_scheduler`` devuelve un scheduler de intervalo fijo y
+los scripts se comportan como antes.
+"""
+
+import configparser
+import math
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from datetime import time as clock
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from quotebook import Snapshot
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Argentina no tiene horario de verano: UTC-3 todo el año
+ART = timezone(timedelta(hours=-3))
+# Ventana de negociación continua por plazo
+Window = Tuple[clock, clock]
+SESSIONS: Dict[str, Window] = {
+    "CI": (clock(11, 0), clock(17, 0)),
+    "24hs": (clock(11, 0), clock(17, 0)),
+}
+# Feriados nacionales y días no laborables en que BYMA no opera. Hay que
+# revisarlos cada año (los trasladables y los puentes se fijan por decreto);
+# los que falten se agregan con [schedule] holidays.
+HOLIDAYS = frozenset(
+    date.fromisoformat(d)
+    for d in (
+        # 2025
+        "2025-01-01", "2025-03-03", "2025-03-04", "2025-03-24", "2025-04-02",
+        "2025-04-17", "2025-04-18", "2025-05-01", "2025-05-02", "2025-06-16",
+        "2025-06-20", "2025-07-09", "2025-08-15", "2025-11-21", "2025-11-24",
+        "2025-12-08", "2025-12-25",
+        # 2026
+        "2026-01-01", "2026-02-16", "2026-02-17", "2026-03-23", "2026-03-24",
+        "2026-04-02", "2026-04-03", "2026-05-01", "2026-05-25", "2026-06-15",
+        "2026-07-09", "2026-07-10", "2026-08-17", "2026-10-12", "2026-11-23",
+        "2026-12-07", "2026-12-08", "2026-12-25",
+    )
+)  # fmt: skip
+
+OFF_HOURS_CHECK = 1800.0  # fuera de rueda se revisa el reloj cada media hora
+FAST_ALPHA = 0.3  # peso de cada observación en el promedio rápido
+SLOW_ALPHA = 0.02  # ídem en la línea de base
+MIN_PRESSURE = 1e-3
+
+
+# ====================== CALENDARIO ======================
+class MarketCalendar:
+    """Días hábiles y ventanas de rueda de BYMA en hora de Buenos Aires."""
+
+    def __init__(
+        self,
+        sessions: Optional[Dict[str, Window]] = None,
+        holidays: Iterable[date] = HOLIDAYS,
+    ) -> None:
+        """
+        Args:
+            sessions: Ventana (apertura, cierre) por plazo; por defecto SESSIONS
+            holidays: Fechas sin rueda además de sábados y domingos
+        """
+        self.sessions = dict(SESSIONS if sessions is None else sessions)
+        self.holidays = frozenset(holidays)
+
+    @staticmethod
+    def now() -> datetime:
+        return datetime.now(ART)
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays
+
+    def is_open(
+        self, now: Optional[datetime] = None, plazo: Optional[str] = None
+    ) -> bool:
+        """
+        Indica si hay rueda.
+
+        Args:
+            now: Momento a evaluar (con zona horaria); por defecto ahora
+            plazo: "CI" o "24hs"; sin plazo alcanza con que opere alguno
+        """
+        now = (now or self.now()).astimezone(ART)
+        if not self.is_trading_day(now.date()):
+            return False
+        windows = self.sessions.values() if plazo is None else [self.sessions[plazo]]
+        t = now.time()
+        return any(start <= t < end for start, end in windows)
+
+    def next_open(self, now: Optional[datetime] = None) -> datetime:
+        """Próxima apertura de cualquier plazo (``now`` si ya hay rueda)."""
+        now = (now or self.now()).astimezone(ART)
+        if self.is_open(now):
+            return now
+        day = now.date()
+        for _ in range(366):
+            if self.is_trading_day(day):
+                opens = sorted(
+                    datetime.combine(day, start, ART)
+                    for start, _ in self.sessions.values()
+                )
+                for open_at in opens:
+                    if open_at > now:
+                        return open_at
+            day += timedelta(days=1)
+        raise ValueError("No hay ningún día hábil en el próximo año")
+
+    def seconds_to_open(self, now: Optional[datetime] = None) -> float:
+        """Segundos hasta la próxima apertura (0 si hay rueda)."""
+        now = (now or self.now()).astimezone(ART)
+        return max((self.next_open(now) - now).total_seconds(), 0.0)
+
+
+def relative_spread(bid: np.ndarray, ask: np.ndarray) -> float:
+    """Mediana de (venta - compra) / punto medio entre las puntas completas."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        spread = (ask - bid) / ((ask + bid) / 2)
+    spread = spread[np.isfinite(spread) & (bid > 0) & (ask > 0)]
+    return float(np.median(spread)) if spread.size else math.nan
+
+
+# ====================== CADENCIA ======================
+class _Ewma:
+    """Promedio exponencial rápido contra su línea de base lenta."""
+
+    __slots__ = ("fast", "slow")
+
+    def __init__(self) -> None:
+        self.fast = math.nan
+        self.slow = math.nan
+
+    def update(self, x: float) -> None:
+        if self.fast != self.fast:
+            self.fast = self.slow = x
+            return
+        self.fast += FAST_ALPHA * (x - self.fast)
+        self.slow += SLOW_ALPHA * (x - self.slow)
+
+    def ratio(self) -> float:
+        """Rápido / lento; NaN sin observaciones, inf si la base es 0."""
+        if self.fast != self.fast:
+            return math.nan
+        if self.slow <= 0:
+            return math.inf if self.fast > 0 else 0.0
+        return self.fast / self.slow
+
+
+class AdaptiveScheduler:
+    """Intervalo entre evaluaciones según el calendario y la actividad."""
+
+    def __init__(
+        self,
+        base: float,
+        min_interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+        calendar: Optional[MarketCalendar] = None,
+        adaptive: bool = True,
+    ) -> None:
+        """
+        Args:
+            base: Intervalo con actividad habitual (el fijo que usaba el script)
+            min_interval: Piso con mucha actividad; por defecto base / 6
+            max_interval: Techo con el mercado quieto; por defecto base × 5
+            calendar: Calendario de rueda; por defecto el de BYMA
+            adaptive: False = siempre ``base``, a cualquier hora
+        """
+        self.base = base
+        self.min_interval = base / 6 if min_interval is None else min_interval
+        self.max_interval = base * 5 if max_interval is None else max_interval
+        self.calendar = calendar or MarketCalendar()
+        self.adaptive = adaptive
+        self.rate = _Ewma()  # actualizaciones por segundo
+        self.volatility = _Ewma()  # |Δ spread relativo| por segundo
+        self.sleeps = 0
+        self.slept = 0.0
+        self.off_hours = 0.0  # segundos dormidos con la rueda cerrada
+        self._spread = math.nan
+        self._last: Optional[float] = None  # monotonic de la última observación
+        self._seq = 0
+
+    # ---------- observaciones ----------
+    def observe(self, updates: int, spread: float = math.nan) -> None:
+        """
+        Registra la actividad desde la observación anterior.
+
+        Args:
+            updates: Instrumentos (o paneles) que cambiaron
+            spread: Spread relativo representativo del libro (ver relative_spread)
+        """
+        now = time.monotonic()
+        last, self._last = self._last, now
+        if last is None:
+            # La primera observación solo fija el punto de partida
+            self._spread = spread
+            return
+        elapsed = max(now - last, 1e-3)
+        self.rate.update(updates / elapsed)
+        if spread == spread:
+            if self._spread == self._spread:
+                self.volatility.update(abs(spread - self._spread) / elapsed)
+            self._spread = spread
+
+    def observe_snapshot(
+        self,
+        snap: Snapshot,
+        bid: str = "prCompraPesos",
+        ask: str = "prVentaPesos",
+    ) -> None:
+        """Observa las filas escritas desde el snapshot anterior y su spread."""
+        updates = snap.changed_since(self._seq).size
+        self._seq = snap.seq
+        self.observe(updates, relative_spread(snap.column(bid), snap.column(ask)))
+
+    # ---------- cadencia ----------
+    def is_open(self) -> bool:
+        """False solo si es adaptativo y la rueda está cerrada."""
+        return not self.adaptive or self.calendar.is_open()
+
+    def pressure(self) -> float:
+        """Actividad relativa a la habitual (1 = normal, NaN sin datos)."""
+        rate, vol = self.rate.ratio(), self.volatility.ratio()
+        values = [v for v in (rate, vol) if v == v]
+        return max(values) if values else math.nan
+
+    def interval(self, now: Optional[datetime] = None) -> float:
+        """Segundos a esperar antes de la próxima evaluación."""
+        if not self.adaptive:
+            return self.base
+        if not self.calendar.is_open(now):
+            return min(self.calendar.seconds_to_open(now), OFF_HOURS_CHECK)
+        pressure = self.pressure()
+        if pressure != pressure:
+            return self.base
+        interval = self.base / max(pressure, MIN_PRESSURE)
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def sleep(self, stop: Optional[threading.Event] = None) -> float:
+        """
+        Espera el intervalo actual.
+
+        Args:
+            stop: Evento que corta la espera antes de tiempo
+
+        Returns:
+            float: Segundos esperados
+        """
+        closed = self.adaptive and not self.calendar.is_open()
+        interval = self.interval()
+        if stop is not None:
+            stop.wait(interval)
+        else:
+            time.sleep(interval)
+        self.sleeps += 1
+        self.slept += interval
+        if closed:
+            self.off_hours += interval
+        return interval
+
+    def stats(self) -> Dict[str, float]:
+        """Contadores para logs."""
+        return {
+            "sleeps": self.sleeps,
+            "avg_interval": self.slept / self.sleeps if self.sleeps else 0.0,
+            "off_hours": self.off_hours,
+            "pressure": self.pressure(),
+        }
+
+
+def _window(text: str) -> Window:
+    start, end = (clock.fromisoformat(t.strip()) for t in text.split("-"))
+    return start, end
+
+
+def open_scheduler(
+    base: float,
+    min_interval: Optional[float] = None,
+    max_interval: Optional[float] = None,
+    config_path: Optional[str] = None,
+) -> AdaptiveScheduler:
+    """
+    Scheduler de un script según la sección ``[schedule]`` de config.ini.
+
+    Args:
+        base: Intervalo fijo que usaba el script
+        min_interval: Piso del script (ej. cuota de la API); se puede pisar con
+            ``[schedule] min_interval``
+        max_interval: Techo del script; ídem ``[schedule] max_interval``
+        config_path: Ruta de config.ini; por defecto la del proyecto
+
+    Returns:
+        AdaptiveScheduler: De intervalo fijo si la sección no está habilitada
+    """
+    config = configparser.ConfigParser()
+    config.read(config_path or os.path.join(PROJECT_ROOT, "config.ini"))
+    if not config.getboolean("schedule", "enabled", fallback=False):
+        return AdaptiveScheduler(base, adaptive=False)
+    sessions = {
+        plazo: _window(config["schedule"][plazo])
+        if plazo in config["schedule"]
+        else window
+        for plazo, window in SESSIONS.items()
+    }
+    extra = config.get("schedule", "holidays", fallback="")
+    holidays = HOLIDAYS | {
+        date.fromisoformat(d.strip()) for d in extra.split(",") if d.strip()
+    }
+    return AdaptiveScheduler(
+        base,
+        config.getfloat("schedule", "min_interval", fallback=min_interval),
+        config.getfloat("schedule", "max_interval", fallback=max_interval),
+        MarketCalendar(sessions, holidays),
+    )
@@ -0,0 +1,554 @@
+"""
+Persistencia en segundo plano de cotizaciones y ratios en archivos columnares.
+
+Los scripts recalculan el libro y los ratios en cada ciclo y los descartan.
+``StoreWriter`` los guarda sin frenar el hilo que decide:
+
+- ``due`` dice si ya pasó ``record_interval`` desde el último lote de una
+  tabla, para no armar ni encolar un frame por cada lote de ticks.
+- ``record`` copia el frame del ciclo y lo deja en una cola acotada; si la cola
+  está llena el lote se descarta y se cuenta (nunca bloquea).
+- Un hilo aparte junta los lotes de cada tabla y, cada ``flush_rows`` filas o
+  ``flush_interval`` segundos, descarta las filas que no cambiaron desde la
+  última guardada del mismo instrumento y escribe un archivo por partición.
+- Cada ``compact_interval`` segundos, y al cerrar, une los archivos de cada
+  partición escrita en uno solo, para que un día no quede repartido en
+  cientos de archivos chicos.
+
+Cada tabla queda particionada al estilo Hive por fecha de rueda (hora de
+Buenos Aires) e instrumento, en Parquet o Arrow IPC::
+
+    store/dolarMEP/ratios/date=2026-10-16/ticker=YMCIO/part-....parquet
+
+``scan``/``read`` filtran por fecha, ticker y horario leyendo solo las
+particiones y columnas pedidas, de a lotes, sin cargar días enteros.
+
+Requiere pyarrow (en requirements.txt) y es opcional, como el resto de las
+secciones de config.ini::
+
+    [store]
+    dir = store
+    format = parquet        ; o arrow
+    flush_rows = 100000
+    flush_interval = 60
+    queue = 1024
+    record_interval = 1     ; segundos mínimos entre lotes de una tabla
+    compact = true
+    compact_interval = 600  ; 0 = compactar solo al cerrar
+"""
+
+import configparser
+import os
+import queue
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from scheduler import ART
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # solo hace falta con [store] configurado
+    pa = ds = pq = None
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+FORMATS = {"parquet": ("parquet", "parquet"), "arrow": ("ipc", "arrow")}
+QUEUE_SIZE = 1024
+FLUSH_ROWS = 100_000
+FLUSH_INTERVAL = 60.0
+RECORD_INTERVAL = 1.0
+COMPACT_INTERVAL = 600.0
+DATE_FIELD = "date"
+TS_FIELD = "ts"
+_STOP = object()
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("store.py necesita pyarrow: pip install pyarrow")
+
+
+def _partitioning(key: str):
+    return ds.partitioning(
+        pa.schema([(DATE_FIELD, pa.string()), (key, pa.string())]), flavor="hive"
+    )
+
+
+def _same_as_previous(values: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Filas iguales (NaN incluido) a la anterior del mismo instrumento."""
+    same = np.zeros(len(keys), dtype=bool)
+    if len(keys) > 1:
+        cur, prev = values[1:], values[:-1]
+        equal = (cur == prev) | (np.isnan(cur) & np.isnan(prev))
+        same[1:] = equal.all(axis=1) & (keys[1:] == keys[:-1])
+    return same
+
+
+class StoreWriter:
+    """Lotes de frames por tabla, escritos en particiones desde un hilo aparte."""
+
+    def __init__(
+        self,
+        directory: str,
+        fmt: str = "parquet",
+        queue_size: int = QUEUE_SIZE,
+        flush_rows: int = FLUSH_ROWS,
+        flush_interval: float = FLUSH_INTERVAL,
+        compact: bool = True,
+        record_interval: float = RECORD_INTERVAL,
+        compact_interval: float = COMPACT_INTERVAL,
+    ) -> None:
+        """
+        Args:
+            directory: Carpeta del script; cada tabla va en una subcarpeta
+            fmt: "parquet" o "arrow" (Arrow IPC)
+            queue_size: Lotes que pueden esperar al hilo de escritura
+            flush_rows: Filas pendientes de una tabla que disparan la escritura
+            flush_interval: Segundos máximos que una fila espera en memoria
+            compact: Unir los archivos de cada partición escrita
+            record_interval: Segundos mínimos entre lotes de una tabla (ver due)
+            compact_interval: Segundos entre compactaciones; 0 = solo al cerrar
+
+        Raises:
+            ImportError: Si pyarrow no está instalado
+            ValueError: Si el formato no es parquet ni arrow
+        """
+        _require_pyarrow()
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato {fmt!r} no soportado: {', '.join(FORMATS)}")
+        self.directory = directory
+        self.fmt = fmt
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.compact = compact
+        self.record_interval = record_interval
+        self.compact_interval = compact_interval
+        self._recorded_at: Dict[str, float] = {}
+        self._compacted_at = time.monotonic()
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        # Estado del hilo de escritura, por tabla
+        self._pending: Dict[str, List[pd.DataFrame]] = defaultdict(list)
+        self._pending_rows: Dict[str, int] = defaultdict(int)
+        self._pending_since: Dict[str, float] = {}
+        self._keys: Dict[str, str] = {}
+        self._last: Dict[str, pd.DataFrame] = {}
+        self._written: Dict[str, Set[Tuple[str, str]]] = defaultdict(set)
+        self._seq = 0
+        self._thread = threading.Thread(target=self._run, name="store", daemon=True)
+        self._closed = False
+        # Estadísticas
+        self.recorded = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.rows = 0
+        self.unchanged = 0
+        self.files = 0
+        self.compactions = 0
+        self.errors = 0
+        self.write_time = 0.0
+        self._thread.start()
+
+    # ---------- hilo de decisión ----------
+    def due(self, table: str, interval: Optional[float] = None) -> bool:
+        """
+        True si ya corresponde otro lote de ``table``; si no, cuenta el salteo.
+
+        Se consulta antes de armar el frame, para no copiar el libro en cada
+        lote de ticks.
+
+        Args:
+            table: Nombre de la tabla
+            interval: Segundos mínimos desde el último lote; por defecto
+                ``record_interval``
+        """
+        if interval is None:
+            interval = self.record_interval
+        last = self._recorded_at.get(table)
+        if last is not None and time.monotonic() - last < interval:
+            self.skipped += 1
+            return False
+        return True
+
+    def record(
+        self,
+        table: str,
+        frame: pd.DataFrame,
+        columns: Optional[Sequence[str]] = None,
+        key: str = "ticker",
+        ts_ns: Optional[int] = None,
+    ) -> bool:
+        """
+        Encola una copia de las filas del ciclo, sin esperar al disco.
+
+        Args:
+            table: Nombre de la tabla (ej. "quotes", "ratios")
+            frame: Una fila por instrumento; puede ser una vista del libro
+            columns: Columnas a guardar; por defecto todas (``key`` se agrega)
+            key: Columna del instrumento, que define la partición
+            ts_ns: Hora del ciclo (time.time_ns()); por defecto, ahora
+
+        Returns:
+            bool: False si la cola estaba llena y el lote se descartó
+        """
+        if self._closed:
+            return False
+        ts = time.time_ns() if ts_ns is None else ts_ns
+        if columns is None:
+            columns = list(frame.columns)
+        names = [key, *(c for c in columns if c != key)]
+        # Copia columna a columna: mucho más barata que armar otro DataFrame
+        batch = {name: frame[name].to_numpy(copy=True) for name in names}
+        try:
+            self._queue.put_nowait((table, key, ts, batch))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self._recorded_at[table] = time.monotonic()
+        self.recorded += 1
+        return True
+
+    # ---------- hilo de escritura ----------
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self._wait())
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                break
+            if item is not None:
+                self._add(*item)
+            now = time.monotonic()
+            for table in list(self._pending):
+                if (
+                    self._pending_rows[table] >= self.flush_rows
+                    or now - self._pending_since[table] >= self.flush_interval
+                ):
+                    self._flush(table)
+            if (
+                self.compact
+                and self.compact_interval > 0
+                and now - self._compacted_at >= self.compact_interval
+            ):
+                self._compact()
+        for table in list(self._pending):
+            self._flush(table)
+        if self.compact:
+            self._compact()
+
+    def _wait(self) -> Optional[float]:
+        deadlines = [t + self.flush_interval for t in self._pending_since.values()]
+        if self.compact and self.compact_interval > 0 and self._written:
+            deadlines.append(self._compacted_at + self.compact_interval)
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+
+    def _add(
+        self, table: str, key: str, ts: int, columns: Dict[str, np.ndarray]
+    ) -> None:
+        batch = pd.DataFrame(columns)
+        batch.insert(0, TS_FIELD, pd.Timestamp(ts, unit="ns", tz="UTC"))
+        batch[DATE_FIELD] = datetime.fromtimestamp(ts / 1e9, ART).date().isoformat()
+        self._keys.setdefault(table, key)
+        self._pending[table].append(batch)
+        self._pending_rows[table] += len(batch)
+        self._pending_since.setdefault(table, time.monotonic())
+
+    def _flush(self, table: str) -> None:
+        batches = self._pending.pop(table, [])
+        self._pending_rows.pop(table, None)
+        self._pending_since.pop(table, None)
+        if not batches:
+            return
+        start = time.perf_counter()
+        key = self._keys[table]
+        try:
+            df = self._changed(table, key, pd.concat(batches, ignore_index=True))
+            if not df.empty:
+                self._write(table, key, df)
+        except Exception as e:  # un lote que no se pudo escribir no frena al resto
+            self.errors += 1
+            print(f"store: no se pudo escribir {table}: {e}", file=sys.stderr)
+        self.write_time += time.perf_counter() - start
+
+    def _changed(self, table: str, key: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Descarta las filas iguales a la anterior guardada del instrumento."""
+        fresh = np.ones(len(df), dtype=bool)
+        last = self._last.get(table)
+        if last is not None:
+            fresh = np.concatenate([np.zeros(len(last), dtype=bool), fresh])
+            df = pd.concat([last, df], ignore_index=True)
+        # Orden estable: dentro de cada instrumento las filas siguen por hora
+        order = np.argsort(df[key].to_numpy(), kind="stable")
+        df = df.iloc[order].reset_index(drop=True)
+        fresh = fresh[order]
+        numeric = [c for c in df.select_dtypes("number").columns if c != TS_FIELD]
+        values = df[numeric].to_numpy(dtype=float)
+        keep = fresh & ~_same_as_previous(values, df[key].to_numpy())
+        self._last[table] = df.groupby(key, sort=False).tail(1)
+        self.unchanged += int((fresh & ~keep).sum())
+        return df[keep]
+
+    def _write(self, table: str, key: str, df: pd.DataFrame) -> None:
+        fmt, ext = FORMATS[self.fmt]
+        self._seq += 1
+        stamp = f"{datetime.now():%Y%m%d_%H%M%S}_{self._seq:06d}"
+        data = pa.Table.from_pandas(df, preserve_index=False)
+        ds.write_dataset(
+            data,
+            os.path.join(self.directory, table),
+            format=fmt,
+            partitioning=_partitioning(key),
+            basename_template=f"part-{stamp}-{{i}}.{ext}",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        partitions = set(zip(df[DATE_FIELD], df[key].astype(str)))
+        self._written[table].update(partitions)
+        self.rows += len(df)
+        self.files += len(partitions)
+
+    def _compact(self) -> None:
+        self._compacted_at = time.monotonic()
+        if self._written:
+            self.compactions += 1
+        for table, partitions in self._written.items():
+            key = self._keys[table]
+            for date, value in sorted(partitions):
+                path = os.path.join(
+                    self.directory, table, f"{DATE_FIELD}={date}", f"{key}={value}"
+                )
+                try:
+                    compact_partition(path, self.fmt)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"store: no se pudo compactar {path}: {e}", file=sys.stderr)
+        self._written.clear()
+
+    def close(self) -> None:
+        """Escribe lo pendiente y frena el hilo."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self) -> Dict[str, float]:
+        """Contadores para logs."""
+        return {
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "skipped": self.skipped,
+            "rows": self.rows,
+            "unchanged": self.unchanged,
+            "files": self.files,
+            "compactions": self.compactions,
+            "errors": self.errors,
+            "write_ms": 1e3 * self.write_time,
+        }
+
+    def __enter__(self) -> "StoreWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def compact_partition(path: str, fmt: str = "parquet") -> int:
+    """
+    Une los archivos de una partición (un instrumento en un día) en uno solo,
+    ordenado por hora. Solo se lee esa partición.
+
+    Returns:
+        int: Archivos que había en la partición
+    """
+    _require_pyarrow()
+    fmt_name, ext = FORMATS[fmt]
+    parts = sorted(
+        f for f in os.listdir(path) if f.startswith("part-") and f.endswith(ext)
+    )
+    if len(parts) < 2:
+        return len(parts)
+    files = [os.path.join(path, f) for f in parts]
+    data = ds.dataset(files, format=fmt_name).to_table().sort_by(TS_FIELD)
+    # Los lectores ignoran los archivos que empiezan con "_" mientras se escribe
+    tmp = os.path.join(path, f"_compact.{ext}")
+    if fmt == "parquet":
+        pq.write_table(data, tmp)
+    else:
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, data.schema) as w:
+            w.write_table(data)
+    # Nombre del primer archivo, marcado como compactado una sola vez
+    stem = parts[0][: -len(ext) - 1]
+    target = os.path.join(path, f"{stem.removesuffix('-c')}-c.{ext}")
+    os.replace(tmp, target)
+    for file in files:
+        if file != target:
+            os.remove(file)
+    return len(parts)
+
+
+# ====================== LECTURA ======================
+def open_dataset(
+    directory: str, table: str, fmt: str = "parquet", key: str = "ticker"
+) -> "ds.Dataset":
+    """
+    Tabla guardada por StoreWriter, sin leer ningún archivo todavía.
+
+    Raises:
+        ImportError: Si pyarrow no está instalado
+    """
+    _require_pyarrow()
+    return ds.dataset(
+        os.path.join(directory, table),
+        format=FORMATS[fmt][0],
+        partitioning=_partitioning(key),
+    )
+
+
+def _filter(
+    key: str,
+    dates: Union[str, Sequence[str], None],
+    tickers: Optional[Sequence[str]],
+    start: Optional[datetime],
+    end: Optional[datetime],
+):
+    conditions = []
+    if dates is not None:
+        dates = [dates] if isinstance(dates, str) else list(dates)
+        conditions.append(ds.field(DATE_FIELD).isin(dates))
+    if tickers is not None:
+        conditions.append(ds.field(key).isin(list(tickers)))
+    if start is not None:
+        conditions.append(ds.field(TS_FIELD) >= pd.Timestamp(start).tz_convert("UTC"))
+    if end is not None:
+        conditions.append(ds.field(TS_FIELD) < pd.Timestamp(end).tz_convert("UTC"))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def scan(
+    directory: str,
+    table: str,
+    dates: Union[str, Sequence[str], None] = None,
+    tickers: Optional[Sequence[str]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    columns: Optional[Sequence[str]] = None,
+    fmt: str = "parquet",
+    key: str = "ticker",
+) -> Iterator[pd.DataFrame]:
+    """
+    Recorre una tabla de a lotes, leyendo solo las particiones y columnas
+    pedidas.
+
+    Args:
+        directory: Carpeta del script (``[store] dir``/nombre)
+        table: Nombre de la tabla
+        dates: Fecha de rueda "AAAA-MM-DD" o lista de fechas
+        tickers: Instrumentos (valores de ``key``)
+        start: Desde esta hora inclusive (con zona horaria)
+        end: Hasta esta hora exclusive (con zona horaria)
+        columns: Columnas a leer; por defecto todas
+        fmt: "parquet" o "arrow", el mismo con que se escribió
+        key: Columna de partición del instrumento
+
+    Yields:
+        pd.DataFrame: Un lote de filas
+    """
+    dataset = open_dataset(directory, table, fmt, key)
+    batches = dataset.to_batches(
+        columns=list(columns) if columns is not None else None,
+        filter=_filter(key, dates, tickers, start, end),
+    )
+    for batch in batches:
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def read(directory: str, table: str, **query) -> pd.DataFrame:
+    """Resultado de ``scan`` en un solo DataFrame, ordenado por hora."""
+    frames = list(scan(directory, table, **query))
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    if TS_FIELD in df:
+        df = df.sort_values(TS_FIELD, kind="stable", ignore_index=True)
+    return df
+
+
+def open_store(name: str, config_path: Optional[str] = None) -> Optional[StoreWriter]:
+    """
+    Abre el almacenamiento del script si config.ini tiene la sección ``[store]``.
+
+    Args:
+        name: Subcarpeta del script (nombre del script)
+        config_path: Ruta de config.ini; por defecto la del proyecto
+
+    Returns:
+        Optional[StoreWriter]: None si no está configurado
+
+    Raises:
+        ImportError: Si está configurado y pyarrow no está instalado
+    """
+    config = configparser.ConfigParser()
+    config.read(config_path or os.path.join(PROJECT_ROOT, "config.ini"))
+    directory = config.get("store", "dir", fallback=None)
+    if not directory:
+        return None
+    if not os.path.isabs(directory):
+        directory = os.path.join(PROJECT_ROOT, directory)
+    return StoreWriter(
+        os.path.join(directory, name),
+        fmt=config.get("store", "format", fallback="parquet"),
+        queue_size=config.getint("store", "queue", fallback=QUEUE_SIZE),
+        flush_rows=config.getint("store", "flush_rows", fallback=FLUSH_ROWS),
+        flush_interval=config.getfloat(
+            "store", "flush_interval", fallback=FLUSH_INTERVAL
+        ),
+        compact=config.getboolean("store", "compact", fallback=True),
+        record_interval=config.getfloat(
+            "store", "record_interval", fallback=RECORD_INTERVAL
+        ),
+        compact_interval=config.getfloat(
+            "store", "compact_interval", fallback=COMPACT_INTERVAL
+        ),
+    )
+
+
+if __name__ == "__main__":
+    # Resumen de una tabla: python store.py store/dolarMEP ratios [fecha] [ticker...]
+    args = sys.argv[1:]
+    if len(args) < 2:
+        sys.exit("uso: python store.py carpeta tabla [fecha] [ticker ...]")
+    rows = 0
+    first = last = None
+    per_ticker: Dict[str, int] = defaultdict(int)
+    for chunk in scan(
+        args[0],
+        args[1],
+        dates=args[2] if len(args) > 2 else None,
+        tickers=args[3:] or None,
+        columns=[TS_FIELD, "ticker"],
+    ):
+        rows += len(chunk)
+        lo, hi = chunk[TS_FIELD].min(), chunk[TS_FIELD].max()
+        first = lo if first is None else min(first, lo)
+        last = hi if last is None else max(last, hi)
+        for ticker, n in chunk["ticker"].value_counts().items():
+            per_ticker[ticker] += n
+    print(f"{args[1]}: {rows} filas, {len(per_ticker)} instrumentos")
+    print(f"desde {first} hasta {last}")
+    for ticker, n in sorted(per_ticker.items(), key=lambda kv: -kv[1])[:20]:
+        print(f"  {ticker:<8} {n}")
@@ -0,0 +1,266 @@
+"""
+Grabación y reproducción de frames crudos del websocket de market data.
+
+Cada frame se guarda tal como llegó, con la hora de recepción en nanosegundos,
+en un log binario mapeado en memoria:
+
+    cabecera: MAGIC (8 bytes) + hora de apertura (int64)
+    registro: hora de recepción (int64) + largo (uint32) + payload UTF-8
+
+El archivo se agranda de a bloques preasignados y se trunca al cerrarlo; si el
+proceso muere sin cerrar, el lector se detiene en la cola sin escribir (ceros).
+
+La reproducción entrega los frames a cualquier función que reciba el mensaje
+crudo: ``DataFrameHandler.update_frame``/``DataManager.update_frame`` para el
+dialecto con pipes, o ``md_sink(handler.update_df)`` para el JSON de Primary.
+"""
+
+import configparser
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Union
+
+MAGIC = b"MDTAPE\x01\x00"
+HEADER = struct.Struct("<8sq")
+RECORD = struct.Struct("<qI")
+CHUNK_SIZE = 16 * 1024 * 1024
+# Tipos de mensaje JSON que los on_message de Primary tratan como market data
+MD_TYPES = ("Md", "smd_update", "md", "update")
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class TapeWriter:
+    """Agrega frames con su hora de recepción a un log mapeado en memoria."""
+
+    def __init__(self, path: str, chunk_size: int = CHUNK_SIZE) -> None:
+        """
+        Crea (o pisa) el archivo de grabación.
+
+        Args:
+            path: Ruta del archivo .tape
+            chunk_size: Bytes que se preasignan cada vez que el archivo se llena
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "w+b")
+        self._mm: Optional[mmap.mmap] = None
+        self._size = 0
+        self._grow(HEADER.size)
+        HEADER.pack_into(self._mm, 0, MAGIC, time.time_ns())  # type: ignore
+        self.offset = HEADER.size
+
+    def _grow(self, needed: int) -> None:
+        size = self._size
+        while size < needed:
+            size += self.chunk_size
+        if self._mm is not None:
+            self._mm.close()
+        self._file.truncate(size)
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        self._size = size
+
+    def write(self, message: Union[str, bytes], ts_ns: Optional[int] = None) -> None:
+        """
+        Agrega un frame.
+
+        Args:
+            message: Frame tal como lo entregó el websocket
+            ts_ns: Hora de recepción (time.time_ns()); por defecto, ahora
+        """
+        ts = time.time_ns() if ts_ns is None else ts_ns
+        data = message.encode() if isinstance(message, str) else message
+        with self._lock:
+            if self._mm is None:
+                return  # ya cerrado
+            start = self.offset + RECORD.size
+            end = start + len(data)
+            if end > self._size:
+                self._grow(end)
+            RECORD.pack_into(self._mm, self.offset, ts, len(data))
+            self._mm[start:end] = data
+            self.offset = end
+            self.count += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._mm is not None:
+                self._mm.flush()
+
+    def close(self) -> None:
+        """Baja a disco, recorta la cola preasignada y cierra el archivo."""
+        with self._lock:
+            if self._mm is None:
+                return
+            self._mm.flush()
+            self._mm.close()
+            self._mm = None
+            self._file.truncate(self.offset)
+            self._file.close()
+
+    def __enter__(self) -> "TapeWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class TapeReader:
+    """Recorre un archivo .tape sin cargarlo entero en memoria."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.opened_ns = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} no es un archivo de grabación de market data")
+
+    def __iter__(self) -> Iterator[Tuple[int, str]]:
+        """Frames en orden como (hora de recepción en ns, mensaje)."""
+        mm = self._mm
+        size = len(mm)
+        offset = HEADER.size
+        while offset + RECORD.size <= size:
+            ts, length = RECORD.unpack_from(mm, offset)
+            if ts == 0:
+                break  # cola preasignada de una grabación sin cerrar
+            start = offset + RECORD.size
+            end = start + length
+            if end > size:
+                break
+            yield ts, mm[start:end].decode()
+            offset = end
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self) -> "TapeReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def md_sink(callback: Callable[[Dict], Any]) -> Callable[[str], None]:
+    """
+    Adapta un callback de market data JSON (ej. ``DataFrameHandler.update_df``)
+    para recibir frames crudos, filtrando igual que el on_message de Primary.
+    """
+
+    def sink(message: str) -> None:
+        try:
+            data = json.loads(message)
+        except json.JSONDecodeError:
+            return
+        if data.get("type") in MD_TYPES:
+            callback(data)
+
+    return sink
+
+
+def replay(
+    path: str,
+    sink: Callable[[str], Any],
+    speed: Optional[float] = 1.0,
+    after: Optional[Callable[[], Any]] = None,
+) -> int:
+    """
+    Reproduce una grabación respetando (o acelerando) los tiempos originales.
+
+    Args:
+        path: Archivo .tape
+        sink: Recibe cada frame crudo (ej. ``handler.update_frame``)
+        speed: 1 = tiempo real, N = N veces más rápido, None o 0 = sin pausas
+        after: Se llama después de cada frame (ej. refrescar ratios y correr
+            el Executer en el mismo hilo)
+
+    Returns:
+        int: Cantidad de frames reproducidos
+    """
+    n = 0
+    first: Optional[int] = None
+    start = time.perf_counter()
+    with TapeReader(path) as reader:
+        for ts, message in reader:
+            if speed:
+                if first is None:
+                    first = ts
+                delay = (ts - first) / 1e9 / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            sink(message)
+            if after is not None:
+                after()
+            n += 1
+    return n
+
+
+def start_replay(
+    path: str, sink: Callable[[str], Any], speed: Optional[float] = 1.0
+) -> threading.Thread:
+    """
+    Reproduce en un hilo aparte, como si fuera el hilo del websocket, para que
+    el loop principal de cada script siga leyendo snapshots del libro.
+    """
+    thread = threading.Thread(
+        target=replay, args=(path, sink, speed), name="tape-replay", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def open_recorder(name: str, config_path: Optional[str] = None) -> Optional[TapeWriter]:
+    """
+    Abre una grabación nueva si config.ini tiene la sección ``[tape]``.
+
+    Ejemplo de config.ini::
+
+        [tape]
+        dir = tapes
+
+    Args:
+        name: Prefijo del archivo (nombre del script)
+        config_path: Ruta de config.ini; por defecto la del proyecto
+
+    Returns:
+        Optional[TapeWriter]: None si no está configurado
+    """
+    config = configparser.ConfigParser()
+    config.read(config_path or os.path.join(PROJECT_ROOT, "config.ini"))
+    directory = config.get("tape", "dir", fallback=None)
+    if not directory:
+        return None
+    if not os.path.isabs(directory):
+        directory = os.path.join(PROJECT_ROOT, directory)
+    os.makedirs(directory, exist_ok=True)
+    filename = f"{name}_{datetime.now():%Y%m%d_%H%M%S}.tape"
+    return TapeWriter(os.path.join(directory, filename))
+
+
+if __name__ == "__main__":
+    # Resumen de una grabación: python tape.py archivo.tape
+    for tape_path in sys.argv[1:]:
+        count = size = 0
+        first_ts = last_ts = 0
+        with TapeReader(tape_path) as tape:
+            for ts, msg in tape:
+                first_ts = first_ts or ts
+                last_ts = ts
+                count += 1
+                size += len(msg)
+        duration = (last_ts - first_ts) / 1e9
+        print(
+            f"{tape_path}: {count} frames, {size / 1e6:.1f} MB, {duration:.1f} s"
+            + (f", {count / duration:.0f} frames/s" if duration > 0 else "")
+        )
@@ -0,0 +1,161 @@
+"""
+Tokens de autenticación en memoria, renovados antes de que venzan.
+
+El token de la API Primary vale 24 h y nadie lo renovaba: un proceso largo
+empezaba a fallar órdenes a mitad de la rueda. Del lado de Balanz, dolarMEP
+leía token.csv y hacía un request a ``/notificaciones`` en cada ciclo solo
+para saber si el token seguía sirviendo. Un ``TokenManager`` por proveedor:
+
+- guarda el token y su vencimiento en memoria (``get`` no hace I/O mientras
+  el token es válido);
+- lo renueva en un hilo daemon un margen antes de vencer, con reintentos;
+- ``refresh(stale)`` renueva una sola vez aunque varios hilos reciban 401 a la
+  vez con el mismo token viejo;
+- opcionalmente lo persiste en un archivo para que un reinicio no pida otro.
+
+``PooledSession.request(..., tokens=manager)`` (httppool.py) pone el header y
+reintenta una vez con un token nuevo si la respuesta es 401/403.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_TOKEN_TTL = 24 * 3600.0  # documentado por Primary
+# Balanz no documenta la duración; si vence antes, el primer 401 lo renueva
+BALANZ_TOKEN_TTL = 4 * 3600.0
+AUTH_ERRORS = (401, 403)
+MAX_MARGIN = 3600.0  # renovación como mucho una hora antes de vencer
+RETRY_DELAYS = (1, 2, 5, 10, 30, 60)  # segundos entre intentos fallidos
+
+
+class TokenManager:
+    """Token de un proveedor con vencimiento, renovación y persistencia."""
+
+    def __init__(
+        self,
+        fetch: Callable[[], str],
+        header: str,
+        ttl: float,
+        name: str = "token",
+        path: Optional[str] = None,
+        margin: Optional[float] = None,
+    ) -> None:
+        """
+        Args:
+            fetch: Pide un token nuevo al proveedor; lanza una excepción si falla
+            header: Header HTTP donde va el token (``X-Auth-Token``,
+                ``Authorization``)
+            ttl: Segundos de validez de un token recién emitido
+            name: Nombre para los logs
+            path: Archivo donde se persiste; si existe, su contenido se usa como
+                token inicial con vencimiento según la fecha del archivo
+            margin: Segundos antes del vencimiento en que se renueva; por defecto
+                el 10 % del ttl, hasta MAX_MARGIN
+        """
+        self.fetch = fetch
+        self.header = header
+        self.ttl = ttl
+        self.name = name
+        self.path = path
+        self.margin = min(ttl * 0.1, MAX_MARGIN) if margin is None else margin
+        self.refreshes = 0
+        self.listeners: List[Callable[[str], None]] = []  # reciben cada token nuevo
+        self._token: Optional[str] = None
+        self._expires = 0.0  # time.time() de vencimiento
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if path is not None:
+            self._load(path)
+
+    def _load(self, path: str) -> None:
+        try:
+            with open(path, "r") as f:
+                token = f.read().strip()
+            issued = os.path.getmtime(path)
+        except OSError:
+            return
+        if token:
+            self._token, self._expires = token, issued + self.ttl
+
+    @property
+    def token(self) -> Optional[str]:
+        return self._token
+
+    @property
+    def expires_in(self) -> float:
+        """Segundos hasta el vencimiento (negativo si ya venció)."""
+        return self._expires - time.time()
+
+    def get(self) -> str:
+        """Token vigente; lo pide solo si no hay o ya venció."""
+        token = self._token
+        if token is not None and time.time() < self._expires:
+            return token
+        return self.refresh(stale=token)
+
+    def refresh(self, stale: Optional[str] = None) -> str:
+        """
+        Pide un token nuevo.
+
+        Args:
+            stale: Token que se sabe inválido; si otro hilo ya lo reemplazó, se
+                devuelve el actual sin volver a pedir
+
+        Raises:
+            Exception: Lo que lance ``fetch``
+        """
+        with self._lock:
+            if stale is not None and self._token not in (None, stale):
+                return self._token  # type: ignore
+            token = self.fetch()
+            self._token, self._expires = token, time.time() + self.ttl
+            self.refreshes += 1
+        logger.info(f"Token {self.name} renovado, vence en {self.ttl / 3600:.1f} h")
+        if self.path is not None:
+            try:
+                with open(self.path, "w") as f:
+                    f.write(token)
+            except OSError as e:
+                logger.warning(f"No se pudo guardar el token {self.name}: {e}")
+        for listener in self.listeners:
+            listener(token)
+        return token
+
+    # ---------- renovación en segundo plano ----------
+    def start(self) -> None:
+        """Renueva el token en un hilo daemon ``margin`` segundos antes de vencer."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"token-{self.name}", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        failures = 0
+        while not self._stop.wait(max(self.expires_in - self.margin, 0)):
+            try:
+                self.refresh()
+                failures = 0
+            except Exception as e:
+                delay = RETRY_DELAYS[min(failures, len(RETRY_DELAYS) - 1)]
+                failures += 1
+                logger.warning(
+                    f"No se pudo renovar el token {self.name} ({e}); "
+                    f"reintento en {delay}s"
+                )
+                if self._stop.wait(delay):
+                    return
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -1,15 +1,22 @@
 import configparser
 from datetime import date, timedelta
 from pyxirr import xirr
-import requests
 import simplejson
-import pandas as pd
+import numpy as np
 from tabulate import tabulate
 from dash import dcc
 import plotly.express as px
 from dash import Dash, dash_table, html, Input, Output, callback
 from dash.dash_table import FormatTemplate
 
+from cotizaciones import join_pairs, quote_table
+from httppool import BALANZ_TIMEOUTS, get_session
+from tokens import BALANZ_TOKEN_TTL, TokenManager
+
+BULLMARKET_URL = "https://www.bullmarketbrokers.com"
+# Sesión keep-alive compartida por get_token y get_data_* (ver httppool.py)
+balanz = get_session("https://clientes.balanz.com", BALANZ_TIMEOUTS)
+
 
 ymcio = {
     "tickerPesos": "YMCIO",
@@ -1187,8 +1194,9 @@ def modified_duration(dates, amounts, xirr):
 
 
 def get_dolar():
-    r = requests.post(
+    r = get_session(BULLMARKET_URL).post(
         "https://www.bullmarketbrokers.com/Information/StockPrice/GetDollarPrice",
+        endpoint="dolar",
         headers={"Accept": "application/json"},
     )
     data = simplejson.loads(r.text)
@@ -1201,16 +1209,18 @@ def get_token():
     usuario = config["credentials"]["balanz_username"]
     password = config["credentials"]["balanz_password"]
 
-    r = requests.post(
+    r = balanz.post(
         "https://clientes.balanz.com/api/v1/auth/init?avoidAuthRedirect=true",
+        endpoint="auth",
         headers={"Accept": "application/json"},
         json={"user": usuario, "source": "WebV2"},
     )
     data = simplejson.loads(r.text)
     nonce = data["nonce"]
 
-    r = requests.post(
+    r = balanz.post(
         "https://clientes.balanz.com/api/v1/auth/login?avoidAuthRedirect=true",
+        endpoint="auth",
         headers={"Accept": "application/json"},
         json={
             "user": usuario,
@@ -1230,26 +1240,34 @@ def get_token():
     return data["AccessToken"]
 
 
-def get_data_ons(token):
-    r = requests.get(
+# Token en memoria; token.csv solo se lee al arrancar (ver tokens.py)
+balanz_tokens = TokenManager(
+    get_token, "Authorization", BALANZ_TOKEN_TTL, name="Balanz", path="token.csv"
+)
+
+
+def get_data_ons():
+    r = balanz.get(
         "https://clientes.balanz.com/api/v1/cotizaciones/panel/27?token=0&tokenindice=0",
+        endpoint="panel",
+        tokens=balanz_tokens,
         headers={
             "Content-Type": "application/json",
             "Accept": "application/json",
-            "Authorization": token,
         },
     )
     data = simplejson.loads(r.text)
     return data["cotizaciones"]
 
 
-def get_data_provs(token):
-    r = requests.get(
+def get_data_provs():
+    r = balanz.get(
         "https://clientes.balanz.com/api/v1/cotizaciones/panel/24?token=0&tokenindice=0",
+        endpoint="panel",
+        tokens=balanz_tokens,
         headers={
             "Content-Type": "application/json",
             "Accept": "application/json",
-            "Authorization": token,
         },
     )
     data = simplejson.loads(r.text)
@@ -1279,117 +1297,76 @@ def get_dates_amounts(instrumento):
     return dates, amounts
 
 
+def get_tir(instrumento, precio):
+    """TIR comprando a ``precio`` (por 100 nominales, en la moneda del flujo)."""
+    dates, amounts = get_dates_amounts(instrumento)
+    dates.insert(0, get_24hs_date())
+    amounts.insert(0, -1 * precio)
+    return xirr(dates, amounts)  # type: ignore
+
+
+# Columnas de precio de create_df → (pata, campo, plazo) (ver cotizaciones.py)
+PRICE_COLUMNS = {
+    "Pr Compra Pesos": (0, "pc", "24hs"),
+    "Pr Venta Pesos": (0, "pv", "24hs"),
+    "Pr Compra Dolar": (1, "pc", "24hs"),
+    "Pr Venta Dolar": (1, "pv", "24hs"),
+}
+
+
 def create_df():
     dolar = get_dolar()
 
-    try:
-        token = open("token.csv", "r").read()
-        data = get_data_ons(token)
-        data += get_data_provs(token)
-    except:
-        token = get_token()
-        open("token.csv", "w").write(token)
-        data = get_data_ons(token)
-        data += get_data_provs(token)
-
-    for_df = []
-    for instrumento in calendar:
+    table = quote_table(get_data_ons() + get_data_provs())
+    df = join_pairs(
+        table,
+        [(inst["tickerPesos"], inst["tickerDolar"]) for inst in calendar],
+        PRICE_COLUMNS,
+        keys=("tickerPesos", "tickerDolar"),
+    )
+
+    tirs = []
+    for instrumento, pc_pesos, pv_pesos, pc_dolar, pv_dolar in zip(
+        calendar,
+        df["Pr Compra Pesos"].to_numpy(),
+        df["Pr Venta Pesos"].to_numpy(),
+        df["Pr Compra Dolar"].to_numpy(),
+        df["Pr Venta Dolar"].to_numpy(),
+    ):
         tir_ask_pesos = 0
         tir_bid_pesos = 0
         tir_ask_dolar = 0
         tir_bid_dolar = 0
 
+        # Sin cotización el precio es NaN y las comparaciones dan False
         try:
-            result = list(
-                filter(
-                    lambda x: (
-                        x["ticker"] == instrumento["tickerPesos"]
-                        and x["plazo"] == "24hs"
-                    ),
-                    data,
-                )
-            )
-            prCompraPesos = result[0]["pc"] * 100
-            prVentaPesos = result[0]["pv"] * 100
-
-            if prCompraPesos > 0:
-                dates, amounts = get_dates_amounts(instrumento)
-                dates.insert(0, get_24hs_date())
-                amounts.insert(0, -1 * prCompraPesos / dolar)
-                tir_ask_pesos = xirr(dates, amounts)  # type: ignore
-
-            if prVentaPesos > 0:
-                dates, amounts = get_dates_amounts(instrumento)
-                dates.insert(0, get_24hs_date())
-                amounts.insert(0, -1 * prVentaPesos / dolar)
-                tir_bid_pesos = xirr(dates, amounts)  # type: ignore
-
+            if pc_pesos != pc_pesos or pv_pesos != pv_pesos:
+                raise ValueError("sin cotización")
+            if pc_pesos > 0:
+                tir_ask_pesos = get_tir(instrumento, pc_pesos / dolar)
+            if pv_pesos > 0:
+                tir_bid_pesos = get_tir(instrumento, pv_pesos / dolar)
         except:
             print("Error con intrumento: ", instrumento["tickerPesos"])
 
         try:
-            result = list(
-                filter(
-                    lambda x: (
-                        x["ticker"] == instrumento["tickerDolar"]
-                        and x["plazo"] == "24hs"
-                    ),
-                    data,
-                )
-            )
-            prCompraDolar = result[0]["pc"] * 100
-            prVentaDolar = result[0]["pv"] * 100
-
-            if prCompraDolar > 0:
-                dates, amounts = get_dates_amounts(instrumento)
-                dates.insert(0, get_24hs_date())
-                amounts.insert(0, -1 * prCompraDolar)
-                tir_ask_dolar = xirr(dates, amounts)  # type: ignore
-
-            if prVentaDolar > 0:
-                dates, amounts = get_dates_amounts(instrumento)
-                dates.insert(0, get_24hs_date())
-                amounts.insert(0, -1 * prVentaDolar)
-                tir_bid_dolar = xirr(dates, amounts)  # type: ignore
-
+            if pc_dolar != pc_dolar or pv_dolar != pv_dolar:
+                raise ValueError("sin cotización")
+            if pc_dolar > 0:
+                tir_ask_dolar = get_tir(instrumento, pc_dolar)
+            if pv_dolar > 0:
+                tir_bid_dolar = get_tir(instrumento, pv_dolar)
         except:
             print("Error con intrumento: ", instrumento["tickerDolar"])
 
         md = modified_duration(
             instrumento["dates"][:], instrumento["amounts"][:], tir_bid_dolar
         )
-        for_df.append(
-            [
-                instrumento["tickerPesos"],
-                instrumento["tickerDolar"],
-                prCompraPesos,
-                prVentaPesos,
-                prCompraDolar,
-                prVentaDolar,
-                tir_ask_pesos,  # type: ignore
-                tir_bid_pesos,  # type: ignore
-                tir_ask_dolar,  # type: ignore
-                tir_bid_dolar,  # type: ignore
-                md,
-            ]
-        )
+        tirs.append([tir_ask_pesos, tir_bid_pesos, tir_ask_dolar, tir_bid_dolar, md])
 
-    df = pd.DataFrame(
-        data=for_df,
-        columns=[
-            "tickerPesos",
-            "tickerDolar",
-            "Pr Compra Pesos",
-            "Pr Venta Pesos",
-            "Pr Compra Dolar",
-            "Pr Venta Dolar",
-            "TIR Ask Pesos",
-            "TIR Bid Pesos",
-            "TIR Ask Dolar",
-            "TIR Bid Dolar",
-            "Mod. Dur.",
-        ],
-    )
+    df[
+        ["TIR Ask Pesos", "TIR Bid Pesos", "TIR Ask Dolar", "TIR Bid Dolar", "Mod. Dur."]
+    ] = np.array(tirs, dtype=float).reshape(len(tirs), 5)
     # print(
     #     tabulate(
     #         df,  # type: ignore
@@ -1430,6 +1407,7 @@ def create_df():
 
 app = Dash(__name__)
 
+balanz_tokens.start()
 df = create_df()
 
 app.layout = html.Div(